@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from dataclasses import dataclass, field
+
+# Lower value = served first.
+PRIORITY_CLASSES: dict[str, int] = {"interactive": 0, "default": 1, "batch": 2}
+
+
+class AdmissionRejected(Exception):
+    """The request could not be admitted; map to an HTTP error with `Retry-After`."""
+
+    def __init__(self, status_code: int, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionSlot:
+    """A granted execution slot. `release()` is idempotent."""
+
+    controller: AdmissionController | None
+    started: float = field(default_factory=time.monotonic)
+
+    def release(self) -> None:
+        controller, self.controller = self.controller, None
+        if controller is not None:
+            controller._release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """Per-engine concurrency limit with a bounded, prioritised wait queue.
+
+    At most `max_in_flight` requests run at once (`<= 0` means unlimited). Up to
+    `max_queue` more wait, highest priority class first and FIFO within a
+    class; a full queue rejects with 429 and waiting longer than `queue_timeout`
+    seconds with 503. Must be used from a single event loop.
+    """
+
+    def __init__(self, *, max_in_flight: int, max_queue: int = 64, queue_timeout: float = 30.0) -> None:
+        self.max_in_flight = int(max_in_flight)
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+
+        self.in_flight = 0
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._seq = itertools.count()
+
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        # Moving average of how long a slot is held; used for Retry-After hints.
+        self._service_seconds = 1.0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        lanes = max(1, self.max_in_flight)
+        return max(1, math.ceil(self._service_seconds * (self.queued + 1) / lanes))
+
+    async def acquire(self, priority: int = PRIORITY_CLASSES["default"]) -> AdmissionSlot:
+        if self.max_in_flight <= 0 or (self.in_flight < self.max_in_flight and not self.queued):
+            self.in_flight += 1
+            self._record_wait(0.0)
+            return AdmissionSlot(self)
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(429, "Too many requests queued for this model", self.retry_after())
+
+        fut: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        entry = (int(priority), next(self._seq), fut)
+        heapq.heappush(self._waiters, entry)
+        t0 = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), timeout=self.queue_timeout)
+        except BaseException as e:
+            if fut.done() and not fut.cancelled():
+                # Granted just as we gave up: hand the slot on.
+                self._release(None)
+            else:
+                fut.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected(503, "Timed out waiting for a free slot", self.retry_after()) from None
+            raise
+        self._record_wait(time.monotonic() - t0)
+        return AdmissionSlot(self)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+        }
+
+    def _record_wait(self, seconds: float) -> None:
+        self.admitted += 1
+        self.wait_seconds_total += seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def _release(self, held_seconds: float | None) -> None:
+        if held_seconds is not None:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * held_seconds
+        while self._waiters:
+            _, _, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                # The slot moves to the waiter; in_flight stays the same.
+                fut.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def parse_priority(value: str | None) -> int | None:
+    if not value:
+        return None
+    return PRIORITY_CLASSES.get(value.strip().lower())
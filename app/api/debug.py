@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..utils.timing import collect_timings
+
+router = APIRouter()
+
+_sampling = threading.Lock()
+
+
+class ProfileLog:
+    """Ring buffer of per-request phase breakdowns."""
+
+    def __init__(self, maxlen: int) -> None:
+        self._entries: deque[dict[str, Any]] = deque(maxlen=max(1, int(maxlen)))
+
+    def append(self, entry: dict[str, Any]) -> None:
+        self._entries.append(entry)
+
+    def recent(self, limit: int | None = None) -> list[dict[str, Any]]:
+        entries = list(self._entries)
+        if limit is not None:
+            entries = entries[-limit:]
+        return entries[::-1]
+
+
+class ServerTimingMiddleware:
+    """Collect `span()` timings for each HTTP request.
+
+    Spans finished before the response starts go into a `Server-Timing` header
+    (for streamed responses that is everything up to the first byte); the full
+    breakdown is appended to `log` once the response is complete.
+    """
+
+    def __init__(self, app: ASGIApp, *, log: ProfileLog | None = None, header: bool = True) -> None:
+        self.app = app
+        self.log = log
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        status = 0
+
+        with collect_timings() as timings:
+
+            async def _send(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if self.header and timings.spans:
+                        headers = MutableHeaders(scope=message)
+                        headers.append("Server-Timing", timings.server_timing(total=time.perf_counter() - t0))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, _send)
+            finally:
+                if self.log is not None and timings.spans:
+                    self.log.append(
+                        {
+                            "method": scope.get("method"),
+                            "path": scope.get("path"),
+                            "status": status,
+                            "time": time.time(),
+                            "total_ms": round((time.perf_counter() - t0) * 1000, 3),
+                            "spans_ms": timings.as_ms(),
+                        }
+                    )
+
+
+def sample_stacks(seconds: float, *, interval: float = 0.01, top: int = 50) -> dict[str, Any]:
+    """Poor man's sampling profiler: sample every thread's stack for `seconds`.
+
+    Returns the most frequent stacks in collapsed ("flamegraph") form,
+    outermost frame first.
+    """
+    me = threading.get_ident()
+    names = {t.ident: t.name for t in threading.enumerate()}
+    stacks: Counter[str] = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            parts: list[str] = []
+            f = frame
+            while f is not None:
+                code = f.f_code
+                parts.append(f"{code.co_name} ({code.co_filename}:{f.f_lineno})")
+                f = f.f_back
+            parts.append(names.get(ident, str(ident)))
+            stacks[";".join(reversed(parts))] += 1
+        samples += 1
+        time.sleep(interval)
+    return {
+        "seconds": seconds,
+        "interval": interval,
+        "samples": samples,
+        "stacks": [{"stack": s, "count": n} for s, n in stacks.most_common(top)],
+    }
+
+
+@router.get("/debug/profile")
+async def debug_profile(
+    request: Request,
+    limit: int = Query(default=50, ge=1),
+    sample_seconds: float = Query(default=0.0, ge=0.0, le=30.0),
+):
+    """Recent request breakdowns; `sample_seconds > 0` also captures a stack profile.
+
+    Sampling is off unless PROFILE_SAMPLE_MAX_SECONDS allows it, and only one
+    sampler runs at a time.
+    """
+    log: ProfileLog = request.app.state.profile_log
+    out: dict[str, Any] = {"requests": log.recent(limit)}
+    if sample_seconds > 0:
+        max_seconds = request.app.state.settings.profile_sample_max_seconds
+        if max_seconds <= 0:
+            raise HTTPException(status_code=403, detail="Stack sampling is disabled")
+        if sample_seconds > max_seconds:
+            raise HTTPException(status_code=400, detail=f"sample_seconds must be at most {max_seconds:g}")
+        if not _sampling.acquire(blocking=False):
+            raise HTTPException(status_code=409, detail="A stack sample is already running")
+        try:
+            # Own thread (not the engine pool) so a busy pool can still be profiled.
+            out["profile"] = await asyncio.to_thread(sample_stacks, sample_seconds)
+        finally:
+            _sampling.release()
+    return out
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+# States in which a model can't serve yet (or is broken); "unloaded" models load on demand.
+_NOT_READY = {"queued", "loading", "warming", "failed"}
+
+
+@router.get("/health/live")
+async def live():
+    """The process is up and serving HTTP, whether or not its models are loaded."""
+    return {"status": "ok"}
+
+
+@router.get("/health/ready")
+async def ready(request: Request):
+    """200 once no model is waiting for, in the middle of, or failed its load/warmup; else 503."""
+    models = request.app.state.registry.load_states()
+    pending = sorted(m for m, info in models.items() if info["state"] in _NOT_READY)
+    failed = [m for m in pending if models[m]["state"] == "failed"]
+    status = "failed" if failed else "loading" if pending else "ready"
+    return JSONResponse(
+        {"status": status, "models": models},
+        status_code=200 if status == "ready" else 503,
+    )
@@ -1,34 +1,58 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import binascii
 import os
-import tempfile
-from pathlib import Path
+import time
+import traceback
+from collections.abc import AsyncIterator
 
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
 
+from ...admission import AdmissionSlot
+from ...engine.async_engine import AsyncTTSEngine
+from ...engine.cancellation import DeadlineExceeded, GenerationCancelled
 from ...engine.tts_base import TTSParams
+from ...metrics import ServerMetrics
+from ...registry import ModelLoadError
 from ...schemas.openai import AudioSpeechRequest
+from ...tts_cache import TTSResponseCache, speech_cache_key
+from ...utils.audio_buffer import PCM_FORMATS
+from ...utils.audio_wav import wav_duration_seconds
+from .disconnect import cancel_on_disconnect, request_cancel_token
+from .limits import admit
+from .ranges import buffer_response
+from ...utils.timing import span
 
 router = APIRouter()
 
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "pcm": "audio/pcm",
+    "mp3": "audio/mpeg",
+    "aiff": "audio/aiff",
+}
 
-def _maybe_write_base64_audio_to_tmp(val: str | None, *, suffix: str = ".wav") -> tuple[str | None, list[Path]]:
-    """If val looks like base64 audio bytes, write to a temp file and return that path.
+# Formats `stream=true` can produce incrementally (PCM16 mono).
+STREAM_FORMATS = PCM_FORMATS
 
-    Otherwise treat it as a normal path and return as-is.
 
-    Returns: (path_or_original, tmp_files_to_cleanup)
+def _maybe_decode_base64_audio(val: str | None) -> str | bytes | None:
+    """If val looks like base64 audio, return the decoded bytes.
+
+    Otherwise treat it as a normal path and return as-is. Engines get the bytes
+    directly (no temp file), so they can cache the decoded clip by content hash.
     """
     if val is None:
-        return None, []
+        return None
 
     # Heuristic: if it's a file that exists, keep as path.
     try:
         if os.path.exists(val):
-            return val, []
+            return val
     except Exception:
         pass
 
@@ -38,30 +62,27 @@ def _maybe_write_base64_audio_to_tmp(val: str | None, *, suffix: str = ".wav") -
 
     # Try base64 decode. If it fails, keep original string.
     try:
-        data = base64.b64decode(val, validate=True)
+        return base64.b64decode(val, validate=True)
     except (binascii.Error, ValueError):
-        return val, []
-
-    fd, p = tempfile.mkstemp(suffix=suffix)
-    os.close(fd)
-    path = Path(p)
-    path.write_bytes(data)
-    return str(path), [path]
+        return val
 
 
 @router.post("/audio/speech")
 async def audio_speech(request: Request, body: AudioSpeechRequest):
     registry = request.app.state.registry
     settings = request.app.state.settings
+    metrics: ServerMetrics = request.app.state.metrics
 
-    try:
-        engine = registry.get_tts(body.model)
-    except KeyError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+    model = registry.resolve(body.model)
+    # The engine itself is only loaded once the response cache has missed.
+    if registry.kind(model) != "tts":
+        raise HTTPException(status_code=404, detail=f"Unknown tts model: {model}")
 
     fmt = (body.format or "wav").lower()
-    voice = body.voice or "default"
-    speed = float(body.speed) if body.speed is not None else 1.0
+    defaults = registry.defaults.get(model, {})
+    voice = body.voice or defaults.get("voice") or "default"
+    speed = body.speed if "speed" in body.model_fields_set else None
+    speed = float(speed if speed is not None else defaults.get("speed", 1.0))
 
     # Collect extra params for backend-specific features
     extra = body.model_dump(exclude_none=True)
@@ -70,8 +91,12 @@ async def audio_speech(request: Request, body: AudioSpeechRequest):
     extra.pop("voice", None)
     extra.pop("format", None)
     extra.pop("speed", None)
+    cancel = request_cancel_token(request, extra.pop("timeout", None))
 
-    # Apply defaults from env if not provided
+    # Apply the model's manifest defaults, then those from env, if not provided
+    for key, value in defaults.items():
+        if key not in {"voice", "speed"}:
+            extra.setdefault(key, value)
     if "ref_audio" not in extra and getattr(settings, "audio_ref_audio", None):
         extra["ref_audio"] = settings.audio_ref_audio
     if "ref_text" not in extra and getattr(settings, "audio_ref_text", None):
@@ -89,66 +114,178 @@ async def audio_speech(request: Request, body: AudioSpeechRequest):
         except Exception:
             speaker_id = None
 
+    audio: bytes | None = None
+    params = TTSParams(voice=voice, speed=speed, speaker_id=speaker_id, cancel=cancel)
+    stream = bool(extra.pop("stream", False))
+    if stream and fmt not in STREAM_FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"stream=true supports format {sorted(STREAM_FORMATS)}, got {fmt!r}"
+        )
+
     # Support base64 audio payloads for ref_audio/source_audio
-    tmp_files: list[Path] = []
-    if "ref_audio" in extra:
-        ref_audio_path, created = _maybe_write_base64_audio_to_tmp(extra.get("ref_audio"))
-        extra["ref_audio"] = ref_audio_path
-        tmp_files.extend(created)
-    if "source_audio" in extra:
-        src_audio_path, created = _maybe_write_base64_audio_to_tmp(extra.get("source_audio"))
-        extra["source_audio"] = src_audio_path
-        tmp_files.extend(created)
+    with span("tts-decode-ref"):
+        for key in ("ref_audio", "source_audio"):
+            if key in extra:
+                extra[key] = _maybe_decode_base64_audio(extra.get(key))
 
-    audio: bytes | None = None
+    metrics.requests.inc(model, "audio.speech")
+    media_type = MEDIA_TYPES.get(fmt, "application/octet-stream")
 
-    try:
-        try:
-            audio = engine.synthesize(
+    # Identical requests are answered from the on-disk cache without an engine slot.
+    cache: TTSResponseCache | None = getattr(request.app.state, "tts_cache", None)
+    cache_key = None
+    if cache is not None and not stream:
+        with span("tts-cache"):
+            cache_key = speech_cache_key(
+                model,
                 text,
-                TTSParams(voice=voice, speed=speed, speaker_id=speaker_id),
+                voice=voice,
+                speed=speed,
+                speaker_id=speaker_id,
                 format=fmt,
-                **extra,
+                extra=extra,
+                source=registry.sources.get(model),
             )
-        except TypeError:
-            # Backward compatible for engines that don't accept **extra
-            audio = engine.synthesize(
-                text,
-                TTSParams(voice=voice, speed=speed, speaker_id=speaker_id),
-                format=fmt,
-            )
-    except ValueError as e:
-        # Surface common user input errors as 400
-        msg = str(e)
-        if "ref_audio" in msg and "required" in msg:
-            msg += (
-                " (提示：当前 MLX TTS 模型需要 ref_audio 用于音色/说话人条件。"
-                "你可以传本地路径 ref_audio=\"/path/to.wav\" 或 base64 字符串。)"
-            )
-        raise HTTPException(status_code=400, detail=msg)
+            cached = await asyncio.to_thread(cache.get, cache_key)
+        if cached is not None:
+            metrics.tts_cache_requests.inc(model, "hit")
+            metrics.tts_cache_bytes_saved.inc(model, amount=len(cached))
+            return buffer_response(request, cached, etag=f'"{cache_key}"', media_type=media_type)
+        metrics.tts_cache_requests.inc(model, "miss")
+
+    # Admit before fetching the engine: a model with requests in flight is never evicted.
+    with span("admission"):
+        slot = await admit(request, model)
+    try:
+        with span("load"):
+            engine = AsyncTTSEngine(await registry.get_tts_async(model), request.app.state.executor)
+    except (KeyError, ModelLoadError) as e:
+        slot.release()
+        raise HTTPException(status_code=404 if isinstance(e, KeyError) else 503, detail=str(e))
+
+    if stream:
+        return await _stream_speech(request, engine, model, text, params, fmt, extra, slot)
+
+    try:
+        async with cancel_on_disconnect(request, cancel):
+            t0 = time.perf_counter()
+            if fmt in PCM_FORMATS and engine.native_audio:
+                # Engine hands back PCM: encode the container exactly once, here.
+                buf = await engine.synthesize_audio(text, params, **extra)
+                duration: float | None = buf.duration
+                with span("tts-encode"):
+                    audio = buf.encode(fmt)
+            else:
+                try:
+                    audio = await engine.synthesize(text, params, format=fmt, **extra)
+                except TypeError:
+                    # Backward compatible for engines that don't accept **extra
+                    audio = await engine.synthesize(text, params, format=fmt)
+                duration = wav_duration_seconds(audio) if fmt == "wav" else None
+            elapsed = time.perf_counter() - t0
     except Exception as e:
-        # Treat common missing-parameter errors as 400 even if wrapped.
-        msg = str(e)
-        if "ref_audio" in msg and "required" in msg:
-            msg += (
-                " (提示：当前 MLX TTS 模型需要 ref_audio 用于音色/说话人条件。"
-                "你可以传本地路径 ref_audio=\"/path/to.wav\" 或 base64 字符串。)"
-            )
-            raise HTTPException(status_code=400, detail=msg)
-        raise HTTPException(status_code=500, detail=f"TTS failed: {e.__class__.__name__}: {e}")
+        raise _synthesis_error(e)
     finally:
-        for p in tmp_files:
-            try:
-                p.unlink(missing_ok=True)
-            except Exception:
-                pass
+        engine.when_idle(slot.release)
 
     assert audio is not None
 
-    media_type = {
-        "wav": "audio/wav",
-        "mp3": "audio/mpeg",
-        "aiff": "audio/aiff",
-    }.get(fmt, "application/octet-stream")
+    metrics.tts_latency.observe(model, value=elapsed)
+    if duration:
+        metrics.tts_rtf.observe(model, value=elapsed / duration)
+        metrics.tts_audio_seconds.inc(model, amount=duration)
 
+    if cache is not None and cache_key is not None:
+        with span("tts-cache"):
+            await asyncio.to_thread(cache.put, cache_key, audio)
+        return buffer_response(request, audio, etag=f'"{cache_key}"', media_type=media_type)
     return Response(content=audio, media_type=media_type)
+
+
+def _synthesis_error(e: Exception) -> HTTPException:
+    """Map an engine failure to the HTTP error returned to the client."""
+    if isinstance(e, DeadlineExceeded):
+        return HTTPException(status_code=504, detail=str(e))
+    if isinstance(e, GenerationCancelled):
+        return HTTPException(status_code=499, detail=str(e))
+    msg = str(e)
+    missing_ref = "ref_audio" in msg and "required" in msg
+    if missing_ref:
+        msg += (
+            " (提示：当前 MLX TTS 模型需要 ref_audio 用于音色/说话人条件。"
+            "你可以传本地路径 ref_audio=\"/path/to.wav\" 或 base64 字符串。)"
+        )
+    # Surface common user input errors as 400 (even if wrapped).
+    if isinstance(e, ValueError) or missing_ref:
+        return HTTPException(status_code=400, detail=msg)
+    return HTTPException(status_code=500, detail=f"TTS failed: {e.__class__.__name__}: {e}")
+
+
+async def _stream_speech(
+    request: Request,
+    engine: AsyncTTSEngine,
+    model: str,
+    text: str,
+    params: TTSParams,
+    fmt: str,
+    extra: dict,
+    slot: AdmissionSlot,
+) -> StreamingResponse:
+    """Send audio sentence by sentence: a streaming WAV header + PCM16, or raw PCM16 (`pcm`)."""
+    metrics: ServerMetrics = request.app.state.metrics
+    cancel = params.cancel
+    assert cancel is not None
+    t0 = time.perf_counter()
+    chunks = engine.stream_synthesize(text, params, **extra)
+
+    # Wait for the first chunk before answering: errors still get a proper
+    # status code, and the sample rate is known for the header.
+    try:
+        async with cancel_on_disconnect(request, cancel):
+            first = await chunks.__anext__()
+    except StopAsyncIteration:
+        engine.when_idle(slot.release)
+        raise HTTPException(status_code=500, detail="TTS failed: no audio produced")
+    except Exception as e:
+        engine.when_idle(slot.release)
+        raise _synthesis_error(e)
+    metrics.tts_ttfa.observe(model, value=time.perf_counter() - t0)
+
+    sample_rate = first.sample_rate
+
+    async def body_iter() -> AsyncIterator[bytes]:
+        duration = first.duration
+        try:
+            if fmt == "wav":
+                yield first.stream_header()
+            yield first.pcm16
+            async with cancel_on_disconnect(request, cancel):
+                async for buf in chunks:
+                    duration += buf.duration
+                    yield buf.pcm16
+            elapsed = time.perf_counter() - t0
+            metrics.tts_latency.observe(model, value=elapsed)
+            if duration:
+                metrics.tts_rtf.observe(model, value=elapsed / duration)
+                metrics.tts_audio_seconds.inc(model, amount=duration)
+        except GenerationCancelled:
+            # Client went away or the deadline passed: just end the stream.
+            pass
+        except Exception:
+            # Headers are already sent; all we can do is log and cut the stream short.
+            traceback.print_exc()
+        finally:
+            await chunks.aclose()
+            engine.when_idle(slot.release)
+
+    async def finish() -> None:
+        # Covers streams that end before the body is iterated.
+        await chunks.aclose()
+        engine.when_idle(slot.release)
+
+    return StreamingResponse(
+        body_iter(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"X-Audio-Sample-Rate": str(sample_rate)},
+        background=BackgroundTask(finish),
+    )
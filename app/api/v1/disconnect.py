@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from fastapi import Request
+
+from ...engine.cancellation import CancelToken
+
+
+def request_cancel_token(request: Request, timeout: float | None) -> CancelToken:
+    """Token for one request; its deadline is the request's `timeout` or the server default."""
+    default = float(getattr(request.app.state.settings, "request_timeout", 0) or 0)
+    seconds = timeout if timeout is not None else default
+    if default > 0 and seconds > default:
+        seconds = default
+    return CancelToken.with_timeout(seconds)
+
+
+@asynccontextmanager
+async def cancel_on_disconnect(
+    request: Request, token: CancelToken, *, interval: float = 0.25
+) -> AsyncIterator[CancelToken]:
+    """Cancel `token` when the client goes away while the body of the `async with` runs."""
+
+    async def _watch() -> None:
+        while not token.cancelled:
+            if await request.is_disconnected():
+                token.cancel("client disconnected")
+                return
+            await asyncio.sleep(interval)
+
+    watcher = asyncio.create_task(_watch())
+    try:
+        yield token
+    finally:
+        watcher.cancel()
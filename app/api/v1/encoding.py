@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from ...schemas.openai import (
+    ChatCompletionChunk,
+    ChatCompletionChunkChoice,
+    ChatCompletionUsageChunk,
+    DeltaMessage,
+    Usage,
+)
+from ...utils.timing import span
+
+_SENTINEL = "\x00content\x00"
+
+
+def _dump_json(content: str) -> str:
+    # Same escaping as pydantic's serializer (raw UTF-8, compact).
+    return json.dumps(content, ensure_ascii=False)
+
+
+class ChatChunkEncoder:
+    """Pre-rendered SSE events for one streamed chat completion.
+
+    The role, content and stop chunks only differ in a few bytes, so each is
+    rendered once through the pydantic models and per-token events just splice
+    the JSON-escaped text between a fixed prefix and suffix.
+    """
+
+    def __init__(self, *, resp_id: str, created: int, model: str) -> None:
+        self._id = resp_id
+        self._created = created
+        self._model = model
+
+        def event(delta: DeltaMessage, finish_reason: str | None) -> bytes:
+            chunk = ChatCompletionChunk(
+                id=resp_id,
+                created=created,
+                model=model,
+                choices=[ChatCompletionChunkChoice(index=0, delta=delta, finish_reason=finish_reason)],
+            )
+            return b"data: " + chunk.__pydantic_serializer__.to_json(chunk) + b"\n\n"
+
+        self.role_event = event(DeltaMessage(role="assistant"), None)
+        self.stop_event = event(DeltaMessage(), "stop")
+
+        template = event(DeltaMessage(content=_SENTINEL), None)
+        prefix, suffix = template.split(_dump_json(_SENTINEL).encode("utf-8"))
+        self._prefix = prefix
+        self._suffix = suffix
+
+    def content_event(self, piece: str) -> bytes:
+        return self._prefix + _dump_json(piece).encode("utf-8") + self._suffix
+
+    def usage_event(self, usage: Usage) -> bytes:
+        chunk = ChatCompletionUsageChunk(
+            id=self._id, created=self._created, model=self._model, choices=[], usage=usage
+        )
+        return b"data: " + chunk.__pydantic_serializer__.to_json(chunk) + b"\n\n"
+
+
+def json_response(model: BaseModel, *, status_code: int = 200) -> Response:
+    """Serialize a pydantic model straight to JSON bytes (no dict round-trip)."""
+    with span("serialize"):
+        content = model.__pydantic_serializer__.to_json(model)
+    return Response(
+        content=content,
+        status_code=status_code,
+        media_type="application/json",
+    )
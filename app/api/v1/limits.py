@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from fastapi import HTTPException, Request
+
+from ...admission import PRIORITY_CLASSES, AdmissionRejected, AdmissionSlot, parse_priority
+
+
+def request_priority(request: Request) -> int:
+    """Priority class from the API key mapping (PRIORITY_API_KEYS), else `X-Priority` if PRIORITY_HEADER allows it."""
+    settings = request.app.state.settings
+    auth = request.headers.get("authorization", "")
+    if auth.lower().startswith("bearer "):
+        by_key = parse_priority(settings.priority_api_keys.get(auth[7:].strip()))
+        if by_key is not None:
+            return by_key
+    if settings.priority_header:
+        by_header = parse_priority(request.headers.get("x-priority"))
+        if by_header is not None:
+            return by_header
+    return PRIORITY_CLASSES["default"]
+
+
+async def admit(request: Request, model_id: str) -> AdmissionSlot:
+    """Wait for an execution slot on `model_id`; 429/503 with `Retry-After` when overloaded."""
+    controller = request.app.state.registry.admission.get(model_id)
+    if controller is None:
+        return AdmissionSlot(None)
+    try:
+        return await controller.acquire(request_priority(request))
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)}
+        )
@@ -7,19 +7,27 @@ import traceback
 from collections.abc import AsyncIterator
 
 from fastapi import APIRouter, Request, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from ...engine.async_engine import AsyncLLMEngine
 from ...engine.base import GenerationParams
+from ...engine.cancellation import CancelToken, DeadlineExceeded, GenerationCancelled
+from ...metrics import ServerMetrics
+from ...registry import ModelLoadError
+from .disconnect import cancel_on_disconnect, request_cancel_token
+from .encoding import ChatChunkEncoder, json_response
+from .limits import admit
+from .streaming import coalesce
+from ...utils.timing import span
 from ...schemas.openai import (
-    ChatCompletionChunk,
-    ChatCompletionChunkChoice,
     ChatCompletionChoice,
     ChatCompletionRequest,
     ChatCompletionResponse,
     ChatCompletionResponseMessage,
-    DeltaMessage,
     ListModelsResponse,
     OpenAIModel,
+    Usage,
 )
 
 router = APIRouter()
@@ -33,81 +41,110 @@ def list_models(request: Request) -> ListModelsResponse:
     )
 
 
-def _generation_params(req: ChatCompletionRequest) -> GenerationParams:
+def _generation_params(
+    req: ChatCompletionRequest, cancel: CancelToken | None = None, defaults: dict | None = None
+) -> GenerationParams:
+    """Request values, falling back to the model's manifest `defaults`, then the server defaults."""
+    defaults = defaults or {}
+
+    def pick(name: str, fallback: float) -> float:
+        value = getattr(req, name)
+        return value if value is not None else defaults.get(name, fallback)
+
     return GenerationParams(
-        max_tokens=req.max_tokens or 256,
-        temperature=req.temperature if req.temperature is not None else 0.7,
-        top_p=req.top_p if req.top_p is not None else 0.95,
+        max_tokens=int(pick("max_tokens", 256)),
+        temperature=float(pick("temperature", 0.7)),
+        top_p=float(pick("top_p", 0.95)),
+        cancel=cancel,
     )
 
 
+async def _observe_stream(
+    pieces: AsyncIterator[str], metrics: ServerMetrics, model: str, started: float, out: list[str]
+) -> AsyncIterator[str]:
+    """Record TTFT / inter-token latency per engine chunk and keep the text in `out`."""
+    last: float | None = None
+    async for piece in pieces:
+        now = time.perf_counter()
+        if piece:
+            if last is None:
+                metrics.chat_ttft.observe(model, value=now - started)
+            else:
+                metrics.chat_itl.observe(model, value=now - last)
+            last = now
+            out.append(piece)
+        yield piece
+
+
 @router.post("/chat/completions")
 async def chat_completions(request: Request, req: ChatCompletionRequest):
+    started = time.perf_counter()
     registry = request.app.state.registry
+    settings = request.app.state.settings
+    metrics: ServerMetrics = request.app.state.metrics
 
-    model = req.model or request.app.state.settings.chat_model_id
+    model = registry.resolve(req.model or settings.chat_model_id)
+    if registry.kind(model) != "chat":
+        raise HTTPException(status_code=404, detail=f"Unknown chat model: {model}")
 
+    metrics.requests.inc(model, "chat.completions")
+    # Admit before fetching the engine: a model with requests in flight is never evicted.
+    with span("admission"):
+        slot = await admit(request, model)
     try:
-        engine = registry.get_chat(model)
-    except KeyError as e:
-        raise HTTPException(status_code=404, detail=str(e))
+        with span("load"):
+            engine = AsyncLLMEngine(await registry.get_chat_async(model), request.app.state.executor)
+    except (KeyError, ModelLoadError) as e:
+        slot.release()
+        raise HTTPException(status_code=404 if isinstance(e, KeyError) else 503, detail=str(e))
 
-    params = _generation_params(req)
+    cancel = request_cancel_token(request, req.timeout)
+    params = _generation_params(req, cancel, registry.defaults.get(model))
 
     created = int(time.time())
     resp_id = f"chatcmpl-{uuid.uuid4().hex}"
 
     if req.stream:
+        encoder = ChatChunkEncoder(resp_id=resp_id, created=created, model=model)
 
         async def event_iter() -> AsyncIterator[bytes]:
+            generated: list[str] = []
             try:
-                first = ChatCompletionChunk(
-                    id=resp_id,
-                    created=created,
-                    model=model,
-                    choices=[
-                        ChatCompletionChunkChoice(
-                            index=0,
-                            delta=DeltaMessage(role="assistant"),
-                            finish_reason=None,
-                        )
-                    ],
-                )
-                yield f"data: {first.model_dump_json()}\n\n".encode("utf-8")
-
-                for piece in engine.stream_generate_chat(req.messages, params):
-                    if not piece:
-                        continue
-                    chunk = ChatCompletionChunk(
-                        id=resp_id,
-                        created=created,
-                        model=model,
-                        choices=[
-                            ChatCompletionChunkChoice(
-                                index=0,
-                                delta=DeltaMessage(content=piece),
-                                finish_reason=None,
-                            )
-                        ],
+                yield encoder.role_event
+
+                async with cancel_on_disconnect(request, cancel):
+                    pieces = coalesce(
+                        _observe_stream(
+                            engine.stream_generate_chat(req.messages, params), metrics, model, started, generated
+                        ),
+                        max_bytes=settings.stream_coalesce_bytes,
+                        max_delay=settings.stream_coalesce_ms / 1000.0,
                     )
-                    yield f"data: {chunk.model_dump_json()}\n\n".encode("utf-8")
-
-                done = ChatCompletionChunk(
-                    id=resp_id,
-                    created=created,
-                    model=model,
-                    choices=[
-                        ChatCompletionChunkChoice(
-                            index=0,
-                            delta=DeltaMessage(),
-                            finish_reason="stop",
+                    async for piece in pieces:
+                        if not piece:
+                            continue
+                        yield encoder.content_event(piece)
+
+                yield encoder.stop_event
+                metrics.chat_e2e.observe(model, value=time.perf_counter() - started)
+                # Generation is over: counting tokens doesn't need the slot.
+                engine.when_idle(slot.release)
+
+                prompt_tokens, completion_tokens = await engine.count_usage(req.messages, "".join(generated))
+                metrics.prompt_tokens.inc(model, amount=prompt_tokens)
+                metrics.completion_tokens.inc(model, amount=completion_tokens)
+                if req.stream_options is not None and req.stream_options.include_usage:
+                    yield encoder.usage_event(
+                        Usage(
+                            prompt_tokens=prompt_tokens,
+                            completion_tokens=completion_tokens,
+                            total_tokens=prompt_tokens + completion_tokens,
                         )
-                    ],
-                )
-                yield f"data: {done.model_dump_json()}\n\n".encode("utf-8")
+                    )
                 yield b"data: [DONE]\n\n"
             except Exception as e:
-                traceback.print_exc()
+                if not isinstance(e, GenerationCancelled):
+                    traceback.print_exc()
                 err = {
                     "error": {
                         "message": str(e),
@@ -117,11 +154,24 @@ async def chat_completions(request: Request, req: ChatCompletionRequest):
                 }
                 yield f"data: {json.dumps(err, ensure_ascii=False)}\n\n".encode("utf-8")
                 yield b"data: [DONE]\n\n"
-
-        return StreamingResponse(event_iter(), media_type="text/event-stream")
+            finally:
+                engine.when_idle(slot.release)
+
+        # The background task covers streams that end before the body is iterated.
+        return StreamingResponse(
+            event_iter(),
+            media_type="text/event-stream",
+            background=BackgroundTask(engine.when_idle, slot.release),
+        )
 
     try:
-        text = engine.generate_chat(req.messages, params)
+        async with cancel_on_disconnect(request, cancel):
+            text = await engine.generate_chat(req.messages, params)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except GenerationCancelled as e:
+        # Client Closed Request: nobody is there to read it, but keep the log honest.
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(
@@ -132,6 +182,14 @@ async def chat_completions(request: Request, req: ChatCompletionRequest):
                 "type": e.__class__.__name__,
             },
         )
+    finally:
+        engine.when_idle(slot.release)
+    metrics.chat_e2e.observe(model, value=time.perf_counter() - started)
+
+    with span("usage"):
+        prompt_tokens, completion_tokens = await engine.count_usage(req.messages, text)
+    metrics.prompt_tokens.inc(model, amount=prompt_tokens)
+    metrics.completion_tokens.inc(model, amount=completion_tokens)
 
     response = ChatCompletionResponse(
         id=resp_id,
@@ -144,5 +202,10 @@ async def chat_completions(request: Request, req: ChatCompletionRequest):
                 finish_reason="stop",
             )
         ],
+        usage=Usage(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+        ),
     )
-    return JSONResponse(content=json.loads(response.model_dump_json()))
+    return json_response(response)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import re
+from collections.abc import AsyncIterator
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Size of each body chunk when sending a buffer (views of it, not copies).
+CHUNK_BYTES = 64 * 1024
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None | bool:
+    """Inclusive `(start, end)` of a single `Range: bytes=...` header.
+
+    None means "send everything" (no header, or one we don't handle such as
+    multiple ranges); False means the range can't be satisfied (416).
+    """
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if m is None:
+        return None
+    first, last = m.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes.
+        n = int(last)
+        if n == 0:
+            return False
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def _close(data) -> None:  # noqa: ANN001
+    close = getattr(data, "close", None)
+    if callable(close):
+        try:
+            close()
+        except BufferError:
+            # A chunk is still referenced somewhere; the mmap closes once it is collected.
+            pass
+
+
+async def _chunks(data, start: int, end: int) -> AsyncIterator[memoryview]:
+    view = memoryview(data)
+    try:
+        for i in range(start, end, CHUNK_BYTES):
+            yield view[i : min(i + CHUNK_BYTES, end)]
+    finally:
+        view.release()
+
+
+def buffer_response(request: Request, data, *, etag: str, media_type: str, headers: dict | None = None) -> Response:
+    """Serve `data` (bytes or an mmap) with `ETag`, `If-None-Match` and single-range `Range` support.
+
+    An mmap is closed once the body has been sent (or right away when there is none).
+    """
+    size = len(data)
+    base = {"ETag": etag, "Accept-Ranges": "bytes", **(headers or {})}
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        _close(data)
+        return Response(status_code=304, headers=base)
+
+    byte_range = parse_range(request.headers.get("range"), size)
+    if_range = request.headers.get("if-range")
+    if byte_range is not None and if_range is not None and if_range.strip() != etag:
+        # The client's copy is stale: send the whole (new) body.
+        byte_range = None
+
+    if byte_range is False:
+        _close(data)
+        return Response(status_code=416, headers={**base, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        start, end, status = 0, size, 200
+    else:
+        start, end, status = byte_range[0], byte_range[1] + 1, 206
+        base["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+    base["Content-Length"] = str(end - start)
+    return StreamingResponse(
+        _chunks(data, start, end),
+        status_code=status,
+        media_type=media_type,
+        headers=base,
+        # After the last chunk has left the response, so nothing still refers to the mapping.
+        background=BackgroundTask(_close, data),
+    )
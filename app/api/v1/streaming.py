@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+
+
+async def coalesce(pieces: AsyncIterator[str], *, max_bytes: int, max_delay: float) -> AsyncIterator[str]:
+    """Merge small text pieces into fewer, larger ones.
+
+    The first non-empty piece is always passed through immediately (time to
+    first token is what users notice). After that, pieces are buffered until
+    `max_bytes` (UTF-8) have accumulated or the oldest buffered piece has waited
+    `max_delay` seconds, whichever comes first. `max_delay <= 0` disables
+    coalescing.
+    """
+    it = pieces.__aiter__()
+    if max_delay <= 0:
+        async for piece in it:
+            yield piece
+        return
+
+    loop = asyncio.get_running_loop()
+    buf: list[str] = []
+    size = 0
+    deadline: float | None = None
+    first = True
+    pending: asyncio.Future[str] | None = None
+
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if not done:
+                # Latency budget spent while waiting on the engine: flush what we have.
+                yield "".join(buf)
+                buf.clear()
+                size, deadline = 0, None
+                continue
+
+            fut, pending = pending, None
+            try:
+                piece = fut.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                if buf:
+                    yield "".join(buf)
+                    buf.clear()
+                raise
+
+            if not piece:
+                continue
+            if first:
+                first = False
+                yield piece
+                continue
+
+            buf.append(piece)
+            size += len(piece.encode("utf-8"))
+            if deadline is None:
+                deadline = loop.time() + max_delay
+            if size >= max_bytes:
+                yield "".join(buf)
+                buf.clear()
+                size, deadline = 0, None
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        aclose = getattr(it, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+    if buf:
+        yield "".join(buf)
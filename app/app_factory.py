@@ -1,37 +1,183 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+from collections.abc import Callable
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
 from .config import Settings, get_settings
+from .admission import AdmissionController
+from .engine.async_engine import create_engine_executor
+from .engine.base import GenerationParams
 from .engine.echo_engine import EchoEngine
 from .engine.mlx_engine import MLXEngine
 from .engine.macos_say_tts import MacOSSayTTSEngine
 from .engine.piper_tts import PiperTTSEngine
 from .engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
+from .engine.parallel_tts import ParallelTTSEngine
+from .engine.command_tts import CommandTTSEngine
+from .engine.process_engine import ProcessLLMEngine, ProcessTTSEngine
+from .engine.replica_pool import ReplicaPoolTTSEngine
+from .engine.tone_tts import ToneTTSEngine
+from .engine.tts_base import TTSParams
 from .api.v1 import openai
 from .api.v1 import audio
-from .registry import ModelRegistry
+from .api import debug, health
+from .metrics import Gauge, ServerMetrics
+from .schemas.openai import ChatMessage
+from .registry import ModelDescriptor, ModelRegistry
+from .manifest import ModelSpec, load_manifest
+from .tts_cache import TTSResponseCache
 
 
-def create_app(settings: Settings | None = None) -> FastAPI:
-    settings = settings or get_settings()
+def _onnx_threads(settings: Settings, replica: int) -> dict[str, int]:
+    """ONNX Runtime thread counts for TTS replica `replica` (lists cycle over replicas)."""
+
+    def nth(values: tuple[int, ...]) -> int:
+        return values[replica % len(values)] if values else 0
+
+    return {
+        "intra_op_threads": nth(settings.audio_onnx_intra_op_threads),
+        "inter_op_threads": nth(settings.audio_onnx_inter_op_threads),
+    }
+
+
+def _tts_engine_factory(settings: Settings, backend: str) -> functools.partial:
+    """Picklable constructor for one instance of the configured TTS backend."""
+    if backend == "piper":
+        return functools.partial(
+            PiperTTSEngine,
+            model_id=settings.audio_model_id,
+            model_path=settings.audio_model_path,
+            segment_cache_bytes=settings.audio_segment_cache_mb * 1024 * 1024,
+            **_onnx_threads(settings, 0),
+        )
+    if backend == "mlx-audio-plus":
+        return functools.partial(
+            MLXAudioPlusTTSEngine,
+            model_id=settings.audio_model_id,
+            model_path=settings.audio_model_path,
+            ref_cache_bytes=settings.audio_ref_cache_mb * 1024 * 1024,
+            trim_similarity=settings.audio_trim_similarity,
+        )
+    if backend == "command":
+        return functools.partial(
+            CommandTTSEngine,
+            model_id=settings.audio_model_id,
+            command=settings.audio_command,
+            protocol=settings.audio_command_protocol,
+            output=settings.audio_command_output,
+            sample_rate=settings.audio_command_sample_rate,
+            workers=settings.audio_command_workers,
+            max_requests=settings.audio_command_max_requests,
+        )
+    if backend == "tone":
+        return functools.partial(ToneTTSEngine, model_id=settings.audio_model_id)
+    return functools.partial(MacOSSayTTSEngine, model_id=settings.audio_model_id)
+
+
+def _build_tts_engine(settings: Settings, factory: functools.partial):
+    """Build a TTS model: the backend engine, replicated and/or wrapped for long texts."""
+    engine = factory()
+    if settings.audio_replicas > 1 and not isinstance(engine, CommandTTSEngine):
+        # CommandTTSEngine is already a pool of processes (AUDIO_COMMAND_WORKERS).
+        replicas = [engine]
+        for i in range(1, settings.audio_replicas):
+            if factory.func is PiperTTSEngine:
+                replicas.append(functools.partial(factory, **_onnx_threads(settings, i))())
+            else:
+                replicas.append(factory())
+        engine = ReplicaPoolTTSEngine(replicas)
+
+    if settings.audio_parallel_workers > 0:
+        mode = settings.audio_parallel_mode
+        if mode == "thread" and not engine.thread_safe:
+            # Sentences of one request must not run concurrently on a shared engine.
+            if settings.engine_processes:
+                print(f"[startup] {engine.model_id} is not thread-safe; parallel long-text TTS disabled")
+                return engine
+            print(f"[startup] {engine.model_id} is not thread-safe; AUDIO_PARALLEL_MODE=thread uses process")
+            mode = "process"
+        engine = ParallelTTSEngine(
+            engine,
+            workers=settings.audio_parallel_workers,
+            mode=mode,
+            factory=factory,
+            min_chars=settings.audio_parallel_min_chars,
+            crossfade_ms=settings.audio_crossfade_ms,
+        )
+    return engine
+
+
+def _chat_warmup(settings: Settings) -> Callable | None:
+    """A short generation, so the first request doesn't pay for kernel compilation."""
+    if not settings.model_warmup:
+        return None
 
-    app = FastAPI(title="MacOS Local OpenAI API", version="0.1.0")
+    def warmup(engine) -> None:  # noqa: ANN001
+        messages = [ChatMessage(role="user", content=settings.model_warmup_prompt)]
+        engine.generate_chat(messages, GenerationParams(max_tokens=settings.model_warmup_tokens))
 
-    # --- Chat engine(s) ---
+    return warmup
+
+
+def _tts_warmup(settings: Settings, defaults: dict) -> Callable | None:
+    """A short synthesis with the model's default voice and reference audio."""
+    if not settings.model_warmup:
+        return None
+    extra = {
+        key: value
+        for key in ("ref_audio", "ref_text", "instruct_text", "source_audio")
+        if (value := defaults.get(key) or getattr(settings, f"audio_{key}"))
+    }
+    params = TTSParams(
+        voice=defaults.get("voice") or "default",
+        speed=float(defaults.get("speed", 1.0)),
+        speaker_id=int(defaults["speaker_id"]) if defaults.get("speaker_id") is not None else None,
+    )
+
+    def warmup(engine) -> None:  # noqa: ANN001
+        engine.synthesize_audio(settings.model_warmup_text, params, **extra)
+
+    return warmup
+
+
+def _load_models(registry: ModelRegistry, model_ids: list[str]) -> None:
+    for model_id, e in registry.load_all(model_ids).items():
+        print(f"[startup] loading {model_id} failed: {e}")
+
+
+def _register_chat_model(registry: ModelRegistry, settings: Settings, spec: ModelSpec, *, channels: int) -> bool:
     if settings.echo_mode or not settings.chat_model_path:
-        chat_engine = EchoEngine(model_id=settings.chat_model_id)
+        factory = functools.partial(EchoEngine, model_id=settings.chat_model_id)
     else:
-        chat_engine = MLXEngine(model_id=settings.chat_model_id, model_path=settings.chat_model_path)
+        factory = functools.partial(
+            MLXEngine,
+            model_id=settings.chat_model_id,
+            model_path=settings.chat_model_path,
+            max_batch_size=settings.chat_max_batch_size,
+            prefix_cache_bytes=settings.chat_prefix_cache_mb * 1024 * 1024,
+            capability_cache=settings.chat_capability_cache,
+            reprobe=settings.chat_reprobe,
+        )
+    if settings.engine_processes:
+        factory = functools.partial(ProcessLLMEngine, factory, channels=channels, name=f"chat-{spec.id}")
+    registry.register(
+        ModelDescriptor(spec.id, "chat", factory, evictable=spec.evictable, warmup=_chat_warmup(settings))
+    )
+    return True
 
-    # --- Audio/TTS engine(s) ---
-    tts_models = {}
 
+def _register_tts_model(registry: ModelRegistry, settings: Settings, spec: ModelSpec, *, channels: int) -> bool:
+    """Register one TTS model; False when it is unavailable (macOS `say` missing)."""
     backend = (settings.audio_backend or "auto").strip().lower()
     if backend == "cosyvoice":
         backend = "mlx-audio-plus"
 
-    if backend not in {"auto", "macos-say", "piper", "mlx-audio-plus"}:
+    if backend not in {"auto", "macos-say", "piper", "mlx-audio-plus", "command", "tone"}:
         raise RuntimeError(f"Unknown AUDIO_BACKEND: {settings.audio_backend}")
 
     if backend == "auto":
@@ -39,52 +185,189 @@ def create_app(settings: Settings | None = None) -> FastAPI:
 
     if backend in {"piper", "mlx-audio-plus"} and not settings.audio_model_path:
         raise RuntimeError(f"AUDIO_BACKEND={backend} requires AUDIO_MODEL_PATH")
+    if backend == "command" and not settings.audio_command:
+        raise RuntimeError("AUDIO_BACKEND=command requires AUDIO_COMMAND")
 
-    if backend == "piper":
+    registry.sources[spec.id] = {
+        "backend": backend,
+        "path": settings.audio_model_path,
+        "command": settings.audio_command if backend == "command" else None,
+    }
+    factory = _tts_engine_factory(settings, backend)
+    if backend == "macos-say":
+        # `say` has nothing to load; build it now so a missing binary just disables TTS.
         try:
-            piper_engine = PiperTTSEngine(
-                model_id=settings.audio_model_id, model_path=settings.audio_model_path  # type: ignore[arg-type]
-            )
-            tts_models[piper_engine.model_id] = piper_engine
+            registry.tts_models[spec.id] = _build_tts_engine(settings, factory)
         except Exception as e:
-            raise RuntimeError(f"Failed to load Piper AUDIO_MODEL_PATH: {e}") from e
+            print(f"[startup] TTS disabled for {spec.id}: {e}")
+            return False
+        return True
 
-    elif backend == "mlx-audio-plus":
-        try:
-            mlx_audio_engine = MLXAudioPlusTTSEngine(
-                model_id=settings.audio_model_id,
-                model_path=settings.audio_model_path,  # type: ignore[arg-type]
-            )
-            tts_models[mlx_audio_engine.model_id] = mlx_audio_engine
-        except Exception as e:
-            raise RuntimeError(f"Failed to load MLX Audio Plus AUDIO_MODEL_PATH: {e}") from e
+    build = functools.partial(_build_tts_engine, settings, factory)
+    if settings.engine_processes:
+        build = functools.partial(ProcessTTSEngine, build, channels=channels, name=f"tts-{spec.id}")
+    registry.register(
+        ModelDescriptor(
+            spec.id,
+            "tts",
+            build,
+            evictable=spec.evictable,
+            warmup=_tts_warmup(settings, spec.defaults),
+        )
+    )
+    return True
+
+
+def create_app(settings: Settings | None = None) -> FastAPI:
+    settings = settings or get_settings()
 
-    else:  # macos-say
+    load_mode = (settings.model_load or "lazy").strip().lower()
+    if load_mode not in {"lazy", "background", "eager"}:
+        raise RuntimeError(f"Unknown MODEL_LOAD: {settings.model_load}")
+    if settings.engine_processes and settings.audio_parallel_workers > 0 and settings.audio_parallel_mode == "process":
+        # Engine workers are daemon processes, which can't start process pools of their own.
+        raise RuntimeError("ENGINE_PROCESSES can't be combined with AUDIO_PARALLEL_MODE=process")
+
+    if settings.model_manifest:
         try:
-            say_engine = MacOSSayTTSEngine(model_id=settings.audio_model_id)
-            tts_models[say_engine.model_id] = say_engine
+            specs = load_manifest(settings.model_manifest)
         except Exception as e:
-            print(f"[startup] TTS disabled: {e}")
+            raise RuntimeError(f"Invalid MODEL_MANIFEST {settings.model_manifest}: {e}") from e
+        chat_specs = [spec for spec in specs if spec.kind == "chat"]
+        if chat_specs and not any(settings.chat_model_id in (s.id, *s.aliases) for s in chat_specs):
+            # Requests without `model` go to the first chat model in the manifest.
+            settings = settings.model_copy(update={"chat_model_id": chat_specs[0].id})
+    else:
+        # The single chat and TTS model configured by CHAT_* / AUDIO_* variables.
+        backend = "mlx" if settings.chat_model_path and not settings.echo_mode else "echo"
+        specs = [
+            ModelSpec(id=settings.chat_model_id, kind="chat", backend=backend, path=settings.chat_model_path),
+            ModelSpec(
+                id=settings.audio_model_id,
+                kind="tts",
+                backend=settings.audio_backend,
+                path=settings.audio_model_path,
+            ),
+        ]
+
+    # Every running stream occupies one worker, so a batching chat engine needs at
+    # least a full batch of them.
+    max_batch_size = max(
+        (spec.settings(settings).chat_max_batch_size for spec in specs if spec.kind == "chat"),
+        default=settings.chat_max_batch_size,
+    )
+    executor = create_engine_executor(max(settings.engine_workers, max_batch_size + 1))
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        registry = app.state.registry
+        if load_mode == "background":
+            # Serve (and answer /health/*) right away; models load and warm up side by side.
+            # Queue them first, so /health/ready reports "loading" from the first request on.
+            queued = registry.queue_loads()
+            app.state.loader = asyncio.create_task(asyncio.to_thread(_load_models, registry, queued))
+        yield
+        executor.shutdown(wait=False, cancel_futures=True)
+        for model_id in [*registry.chat_models, *registry.tts_models]:
+            registry.unload(model_id)
 
-    registry = ModelRegistry(chat_models={chat_engine.model_id: chat_engine}, tts_models=tts_models)
+    app = FastAPI(title="MacOS Local OpenAI API", version="0.1.0", lifespan=lifespan)
+
+    # Models are registered with a constructor and built on first use (or all
+    # at startup with MODEL_LOAD=eager); MODEL_MEMORY_BUDGET_MB bounds how much
+    # of them stays loaded.
+    registry = ModelRegistry(
+        chat_models={},
+        tts_models={},
+        memory_budget_bytes=settings.model_memory_budget_mb * 1024 * 1024,
+    )
+
+    audio_in_flight = settings.audio_max_in_flight or settings.engine_workers
+
+    for spec in specs:
+        model_settings = spec.settings(settings)
+        if spec.kind == "chat":
+            default_in_flight = settings.chat_max_in_flight or max(
+                settings.engine_workers, model_settings.chat_max_batch_size
+            )
+        else:
+            default_in_flight = audio_in_flight
+        max_in_flight = spec.max_in_flight if spec.max_in_flight is not None else default_in_flight
+        # With ENGINE_PROCESSES, one pipe to the worker per request allowed to run at once.
+        channels = max_in_flight if max_in_flight > 0 else settings.engine_workers
+        register = _register_chat_model if spec.kind == "chat" else _register_tts_model
+        if not register(registry, model_settings, spec, channels=channels):
+            continue
+        for alias in spec.aliases:
+            registry.aliases[alias] = spec.id
+        if spec.defaults:
+            registry.defaults[spec.id] = dict(spec.defaults)
+        registry.admission[spec.id] = AdmissionController(
+            max_in_flight=max_in_flight,
+            max_queue=spec.max_queue if spec.max_queue is not None else settings.admission_max_queue,
+            queue_timeout=spec.queue_timeout if spec.queue_timeout is not None else settings.admission_queue_timeout,
+        )
+
+    if load_mode == "eager":
+        errors = registry.load_all()
+        if errors:
+            raise next(iter(errors.values()))
+
+    metrics = ServerMetrics()
+    metrics.add(
+        Gauge(
+            "macoslocalapi_in_flight",
+            "Requests currently holding an execution slot.",
+            ("model",),
+            collect=lambda: [((m,), c.in_flight) for m, c in registry.admission.items()],
+        )
+    )
+    metrics.add(
+        Gauge(
+            "macoslocalapi_queue_depth",
+            "Requests waiting for an execution slot.",
+            ("model",),
+            collect=lambda: [((m,), c.queued) for m, c in registry.admission.items()],
+        )
+    )
+
+    tts_cache = None
+    if settings.audio_cache_dir:
+        tts_cache = TTSResponseCache(settings.audio_cache_dir, settings.audio_cache_mb * 1024 * 1024)
+        metrics.add(
+            Gauge(
+                "macoslocalapi_tts_cache_bytes",
+                "Size of the on-disk TTS response cache.",
+                collect=lambda: [((), tts_cache.stats()["bytes"])],
+            )
+        )
 
     app.state.settings = settings
-    app.state.engine = chat_engine  # backward compat
     app.state.registry = registry
+    app.state.executor = executor
+    app.state.metrics = metrics
+    app.state.tts_cache = tts_cache
 
-    temp_kw = getattr(chat_engine, "_temp_kw", None)
     print(
-        f"[startup] chat_engine={chat_engine.__class__.__name__} chat_model_id={settings.chat_model_id} "
-        f"echo_mode={settings.echo_mode} chat_model_path={settings.chat_model_path} temp_kw={temp_kw}"
+        f"[startup] chat_model_id={settings.chat_model_id} echo_mode={settings.echo_mode} "
+        f"chat_model_path={settings.chat_model_path} model_load={load_mode}"
     )
     print(
         f"[startup] audio_backend={settings.audio_backend} audio_model_id={settings.audio_model_id} "
-        f"audio_model_path={settings.audio_model_path} tts_models={list(tts_models.keys())}"
+        f"audio_model_path={settings.audio_model_path} models={registry.list_model_ids()}"
     )
 
+    app.include_router(health.router)
     app.include_router(openai.router, prefix="/v1")
     app.include_router(audio.router, prefix="/v1")
 
+    profile_log = debug.ProfileLog(settings.profile_history) if settings.profile_history > 0 else None
+    if profile_log is not None:
+        app.state.profile_log = profile_log
+        app.include_router(debug.router)
+    if settings.server_timing or profile_log is not None:
+        app.add_middleware(debug.ServerTimingMiddleware, log=profile_log, header=settings.server_timing)
+
     @app.get("/")
     async def root():
         return {
@@ -96,6 +379,18 @@ def create_app(settings: Settings | None = None) -> FastAPI:
             "audio_model_path": settings.audio_model_path,
             "echo_mode": settings.echo_mode,
             "models": registry.list_model_ids(),
+            "stats": {
+                model_id: stats
+                for model_id, engine in {**registry.chat_models, **registry.tts_models}.items()
+                if (stats := getattr(engine, "stats", dict)())
+            },
+            "admission": {model_id: c.stats() for model_id, c in registry.admission.items()},
+            "tts_cache": tts_cache.stats() if tts_cache is not None else None,
+            "registry": registry.stats(),
         }
 
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
     return app
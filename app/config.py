@@ -15,9 +15,72 @@ class Settings(BaseModel):
     host: str = "127.0.0.1"
     port: int = 8000
 
+    # Size of the thread pool that runs blocking engine calls (generation/synthesis)
+    # off the event loop. Bounds how many engine calls run at the same time.
+    engine_workers: int = 4
+    # Host every registered model in its own worker process (the HTTP process
+    # only routes); token streams cross over pipes, audio over shared memory,
+    # and a crashed worker is restarted.
+    engine_processes: bool = False
+
+    # SSE token coalescing: after the first token, buffer streamed text until this
+    # many bytes or this many milliseconds have accumulated (0 ms disables).
+    stream_coalesce_bytes: int = 256
+    stream_coalesce_ms: float = 20.0
+
+    # Upper bound (seconds) for any chat/TTS request; requests may ask for less
+    # via a `timeout` field. 0 means no server-side limit.
+    request_timeout: float = 0.0
+
+    # Admission control per model: concurrent requests (0 = derive from ENGINE_WORKERS),
+    # how many more may wait, and for how long (seconds).
+    chat_max_in_flight: int = 0
+    audio_max_in_flight: int = 0
+    admission_max_queue: int = 64
+    admission_queue_timeout: float = 30.0
+    # API key -> priority class ("interactive", "default", "batch").
+    priority_api_keys: dict[str, str] = {}
+    # Honour a client-sent `X-Priority` header (any client could jump the queue).
+    priority_header: bool = False
+
+    # Per-request phase timings: `Server-Timing` response header, and how many
+    # recent breakdowns `/debug/profile` keeps (0 disables the endpoint, which
+    # is unauthenticated, so keep it for local debugging).
+    server_timing: bool = True
+    profile_history: int = 0
+    # Longest stack-sampling run `/debug/profile?sample_seconds=N` may start
+    # (0 disables sampling); one runs at a time.
+    profile_sample_max_seconds: float = 0.0
+
+    # Models are built before the server starts ("eager", so a bad model path
+    # fails startup), on first use ("lazy"), or concurrently in the background
+    # once the server is up ("background"; /health/ready turns 200 when all are
+    # warm, and reports a failed load). When the loaded models' estimated memory
+    # exceeds the budget (MiB, 0 = no limit), the least recently used idle ones
+    # are unloaded.
+    model_load: str = "eager"
+    model_memory_budget_mb: int = 0
+    # TOML/JSON file declaring several chat and TTS models (see app.manifest);
+    # replaces the single CHAT_MODEL_* / AUDIO_MODEL_* model.
+    model_manifest: str | None = None
+    # Run a short chat generation / synthesis on every model right after it loads.
+    model_warmup: bool = True
+    model_warmup_prompt: str = "Hello"
+    model_warmup_tokens: int = 4
+    model_warmup_text: str = "Hello."
+
     # --- Chat model ---
     chat_model_id: str = "local-chat"
     chat_model_path: str | None = None
+    # >1 enables continuous batching of concurrent chat requests (MLX only).
+    chat_max_batch_size: int = 1
+    # Memory budget (MiB) for reusable prompt-prefix KV state across requests (MLX only, 0 disables).
+    chat_prefix_cache_mb: int = 512
+    # JSON file remembering which sampling kwargs the installed mlx-lm accepts, per
+    # mlx-lm version and model path (default ~/.cache/macoslocalapi/mlx_capabilities.json);
+    # `chat_reprobe` re-detects on startup and overwrites the entry.
+    chat_capability_cache: str | None = None
+    chat_reprobe: bool = False
 
     # --- Audio model (TTS) ---
     audio_model_id: str = "local-audio"
@@ -29,6 +92,8 @@ class Settings(BaseModel):
     # - "piper": use Piper ONNX model (requires AUDIO_MODEL_PATH)
     # - "mlx-audio-plus": use `mlx-audio-plus` (CosyVoice2/3, Chatterbox, etc.) (requires AUDIO_MODEL_PATH)
     # - "cosyvoice": alias of "mlx-audio-plus"
+    # - "command": a command-line synthesizer (AUDIO_COMMAND)
+    # - "tone": model-free test tones
     audio_backend: str = "auto"
 
     # If true, we don't try to use real MLX generation and just echo (chat only).
@@ -39,6 +104,42 @@ class Settings(BaseModel):
     audio_ref_text: str | None = None
     audio_instruct_text: str | None = None
     audio_source_audio: str | None = None
+    # Memory budget (MiB) for decoded reference/source clips reused across requests (0 disables).
+    audio_ref_cache_mb: int = 64
+
+    # Long-text TTS: inputs of at least `audio_parallel_min_chars` are split into
+    # sentences synthesized concurrently on this many workers (0 disables), then
+    # joined with short crossfades. Mode "thread" shares the engine; "process"
+    # loads one engine per worker process.
+    audio_parallel_workers: int = 0
+    audio_parallel_mode: str = "thread"
+    audio_parallel_min_chars: int = 200
+    audio_crossfade_ms: float = 10.0
+    # mlx-audio-plus sometimes speaks the start of the text twice; a leading
+    # segment followed by a copy at least this similar (normalized correlation,
+    # 1.0 = bit-identical only) is trimmed. Lower it to also catch near repeats.
+    audio_trim_similarity: float = 1.0
+    # On-disk cache of `/v1/audio/speech` responses keyed by everything that
+    # affects the audio (disabled unless a directory is set), capped at
+    # `audio_cache_mb` with LRU eviction.
+    audio_cache_dir: str | None = None
+    audio_cache_mb: int = 512
+    # Piper: per-sentence memo of phoneme IDs and audio (0 disables).
+    audio_segment_cache_mb: int = 32
+    # AUDIO_BACKEND=command: a command-line synthesizer run from a pool of warm
+    # processes (see CommandTTSEngine for the "oneshot"/"persistent" protocols).
+    audio_command: str | None = None
+    audio_command_protocol: str = "oneshot"
+    audio_command_output: str = "wav"
+    audio_command_sample_rate: int = 22050
+    audio_command_workers: int = 2
+    audio_command_max_requests: int = 0
+    # Independent copies of the TTS model; each request goes to the least busy
+    # one. ONNX (Piper) thread counts are per replica: one value for all, or a
+    # comma-separated list cycled over the replicas. 0 = ONNX Runtime default.
+    audio_replicas: int = 1
+    audio_onnx_intra_op_threads: tuple[int, ...] = ()
+    audio_onnx_inter_op_threads: tuple[int, ...] = ()
 
 
 def get_settings() -> Settings:
@@ -50,6 +151,19 @@ def get_settings() -> Settings:
             return default
         return v.strip().lower() in {"1", "true", "yes", "y", "on"}
 
+    def _get_mapping(name: str) -> dict[str, str]:
+        # "key1:batch,key2:interactive"
+        out: dict[str, str] = {}
+        for item in (os.getenv(name) or "").split(","):
+            k, sep, v = item.strip().rpartition(":")
+            if sep and k:
+                out[k.strip()] = v.strip()
+        return out
+
+    def _get_ints(name: str) -> tuple[int, ...]:
+        # "4" or "8,4,4"
+        return tuple(int(v) for v in (os.getenv(name) or "").split(",") if v.strip())
+
     # Backward-compat: MODEL_ID/MODEL_PATH map to chat model.
     legacy_model_id = os.getenv("MODEL_ID")
     legacy_model_path = os.getenv("MODEL_PATH")
@@ -57,8 +171,33 @@ def get_settings() -> Settings:
     return Settings(
         host=os.getenv("HOST", "127.0.0.1"),
         port=int(os.getenv("PORT", "8000")),
+        engine_workers=int(os.getenv("ENGINE_WORKERS", "4")),
+        engine_processes=_get_bool("ENGINE_PROCESSES", False),
+        stream_coalesce_bytes=int(os.getenv("STREAM_COALESCE_BYTES", "256")),
+        stream_coalesce_ms=float(os.getenv("STREAM_COALESCE_MS", "20")),
+        request_timeout=float(os.getenv("REQUEST_TIMEOUT", "0")),
+        chat_max_in_flight=int(os.getenv("CHAT_MAX_IN_FLIGHT", "0")),
+        audio_max_in_flight=int(os.getenv("AUDIO_MAX_IN_FLIGHT", "0")),
+        admission_max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        admission_queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "30")),
+        priority_api_keys=_get_mapping("PRIORITY_API_KEYS"),
+        priority_header=_get_bool("PRIORITY_HEADER", False),
+        server_timing=_get_bool("SERVER_TIMING", True),
+        profile_history=int(os.getenv("PROFILE_HISTORY", "0")),
+        profile_sample_max_seconds=float(os.getenv("PROFILE_SAMPLE_MAX_SECONDS", "0")),
+        model_load=os.getenv("MODEL_LOAD", "eager"),
+        model_memory_budget_mb=int(os.getenv("MODEL_MEMORY_BUDGET_MB", "0")),
+        model_manifest=os.getenv("MODEL_MANIFEST") or None,
+        model_warmup=_get_bool("MODEL_WARMUP", True),
+        model_warmup_prompt=os.getenv("MODEL_WARMUP_PROMPT", "Hello"),
+        model_warmup_tokens=int(os.getenv("MODEL_WARMUP_TOKENS", "4")),
+        model_warmup_text=os.getenv("MODEL_WARMUP_TEXT", "Hello."),
         chat_model_id=os.getenv("CHAT_MODEL_ID", legacy_model_id or "local-chat"),
         chat_model_path=os.getenv("CHAT_MODEL_PATH", legacy_model_path),
+        chat_max_batch_size=int(os.getenv("CHAT_MAX_BATCH_SIZE", "1")),
+        chat_prefix_cache_mb=int(os.getenv("CHAT_PREFIX_CACHE_MB", "512")),
+        chat_capability_cache=os.getenv("CHAT_CAPABILITY_CACHE") or None,
+        chat_reprobe=_get_bool("CHAT_REPROBE", False),
         audio_model_id=os.getenv("AUDIO_MODEL_ID", "local-audio"),
         audio_model_path=os.getenv("AUDIO_MODEL_PATH"),
         audio_backend=os.getenv("AUDIO_BACKEND", "auto"),
@@ -66,5 +205,23 @@ def get_settings() -> Settings:
         audio_ref_text=os.getenv("AUDIO_REF_TEXT"),
         audio_instruct_text=os.getenv("AUDIO_INSTRUCT_TEXT"),
         audio_source_audio=os.getenv("AUDIO_SOURCE_AUDIO"),
+        audio_ref_cache_mb=int(os.getenv("AUDIO_REF_CACHE_MB", "64")),
+        audio_parallel_workers=int(os.getenv("AUDIO_PARALLEL_WORKERS", "0")),
+        audio_parallel_mode=os.getenv("AUDIO_PARALLEL_MODE", "thread"),
+        audio_parallel_min_chars=int(os.getenv("AUDIO_PARALLEL_MIN_CHARS", "200")),
+        audio_crossfade_ms=float(os.getenv("AUDIO_CROSSFADE_MS", "10")),
+        audio_trim_similarity=float(os.getenv("AUDIO_TRIM_SIMILARITY", "1.0")),
+        audio_cache_dir=os.getenv("AUDIO_CACHE_DIR") or None,
+        audio_cache_mb=int(os.getenv("AUDIO_CACHE_MB", "512")),
+        audio_segment_cache_mb=int(os.getenv("AUDIO_SEGMENT_CACHE_MB", "32")),
+        audio_command=os.getenv("AUDIO_COMMAND") or None,
+        audio_command_protocol=os.getenv("AUDIO_COMMAND_PROTOCOL", "oneshot"),
+        audio_command_output=os.getenv("AUDIO_COMMAND_OUTPUT", "wav"),
+        audio_command_sample_rate=int(os.getenv("AUDIO_COMMAND_SAMPLE_RATE", "22050")),
+        audio_command_workers=int(os.getenv("AUDIO_COMMAND_WORKERS", "2")),
+        audio_command_max_requests=int(os.getenv("AUDIO_COMMAND_MAX_REQUESTS", "0")),
+        audio_replicas=int(os.getenv("AUDIO_REPLICAS", "1")),
+        audio_onnx_intra_op_threads=_get_ints("AUDIO_ONNX_INTRA_OP_THREADS"),
+        audio_onnx_inter_op_threads=_get_ints("AUDIO_ONNX_INTER_OP_THREADS"),
         echo_mode=_get_bool("ECHO_MODE", False),
     )
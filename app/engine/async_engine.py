@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Sequence, TypeVar
+
+from .base import ChatMessageLike, GenerationParams, LLMEngine
+from .cancellation import CancelToken
+from .serial import serialized, serialized_iter
+from .tts_base import TTSParams, TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+
+T = TypeVar("T")
+
+_ITEM = 0
+_ERROR = 1
+_END = 2
+_CANCEL = 3
+
+
+def create_engine_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Bounded pool that runs the (blocking) engine calls off the event loop."""
+    return ThreadPoolExecutor(max_workers=max(1, int(max_workers)), thread_name_prefix="engine")
+
+
+async def run_in_executor(executor: Executor | None, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    # Like `asyncio.to_thread`: carry context vars (request timings) into the worker.
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+async def wait_cancellable(aw: Awaitable[T], cancel: CancelToken | None) -> T:
+    """Await `aw`, but give up as soon as `cancel` fires or its deadline passes.
+
+    The engine thread behind `aw` keeps running until it notices the token;
+    this only stops the request from waiting on it.
+    """
+    if cancel is None:
+        return await aw
+
+    loop = asyncio.get_running_loop()
+    fut = asyncio.ensure_future(aw)
+    # We may stop waiting on it; don't let a late failure go unobserved.
+    fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+    fired = loop.create_future()
+
+    def _wake() -> None:
+        try:
+            loop.call_soon_threadsafe(lambda: fired.done() or fired.set_result(None))
+        except RuntimeError:
+            pass
+
+    cancel.add_callback(_wake)
+    done, _ = await asyncio.wait({fut, fired}, timeout=cancel.remaining(), return_when=asyncio.FIRST_COMPLETED)
+    if fut in done:
+        return fut.result()
+    if not done:
+        cancel.cancel("deadline exceeded")
+    cancel.raise_if_cancelled()
+    raise AssertionError("unreachable")
+
+
+async def iterate_in_executor(
+    executor: Executor | None,
+    fn: Callable[..., Iterable[T]],
+    *args: Any,
+    cancel: CancelToken | None = None,
+    max_buffered: int = 32,
+    track: Callable[[asyncio.Future[None]], Any] | None = None,
+    **kwargs: Any,
+) -> AsyncIterator[T]:
+    """Drive a sync iterator on an executor thread and re-yield its items with `async for`.
+
+    The whole iteration happens on a single worker thread (some backends keep
+    per-thread state between steps); items are handed back to the event loop
+    through a queue holding at most `max_buffered` items, so a slow consumer
+    pauses the producer instead of letting its output pile up. If the
+    consumer stops early the producer notices at the next item boundary and
+    closes the underlying generator. With `cancel`, the
+    consumer also stops waiting once the token fires or its deadline passes,
+    and an abandoned iteration cancels the token so the engine can stop mid-step.
+    `track`, if given, is called with the producer's executor future.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[tuple[int, Any]] = asyncio.Queue()
+    stop = threading.Event()
+    credits = threading.Semaphore(max(1, int(max_buffered)))
+
+    def _put(kind: int, val: Any) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, val))
+            return True
+        except RuntimeError:
+            # Event loop already closed; nobody is listening anymore.
+            return False
+
+    def _produce() -> None:
+        it: Iterable[T] | None = None
+        try:
+            it = iter(fn(*args, **kwargs))
+            for item in it:
+                # Wait for room in the queue; `stop` also wakes us (see below).
+                while not credits.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set() or not _put(_ITEM, item):
+                    return
+        except BaseException as e:
+            _put(_ERROR, e)
+        else:
+            _put(_END, None)
+        finally:
+            close = getattr(it, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    if cancel is not None:
+        cancel.add_callback(lambda: _put(_CANCEL, None))
+
+    producer = loop.run_in_executor(executor, contextvars.copy_context().run, _produce)
+    if track is not None:
+        track(producer)
+    finished = False
+    try:
+        while True:
+            if cancel is not None and cancel.deadline is not None:
+                try:
+                    kind, val = await asyncio.wait_for(queue.get(), timeout=cancel.remaining())
+                except asyncio.TimeoutError:
+                    cancel.cancel("deadline exceeded")
+                    kind, val = _CANCEL, None
+            else:
+                kind, val = await queue.get()
+
+            if kind == _ITEM:
+                credits.release()
+                yield val
+            elif kind == _ERROR:
+                finished = True
+                raise val
+            elif kind == _CANCEL:
+                assert cancel is not None
+                cancel.raise_if_cancelled()
+            else:
+                finished = True
+                break
+    finally:
+        stop.set()
+        credits.release()
+        if cancel is not None and not finished:
+            cancel.cancel("stream closed")
+
+
+class _EngineCalls:
+    """Tracks a facade's calls still running on the executor.
+
+    A request that stops waiting (deadline, disconnect) leaves the engine
+    thread running until it notices; `when_idle` lets the request hold its
+    admission slot until that thread has actually returned.
+    """
+
+    def __init__(self) -> None:
+        self._running: set[asyncio.Future[Any]] = set()
+
+    def _submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> asyncio.Future[T]:
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+        fut = loop.run_in_executor(self._executor, functools.partial(ctx.run, fn, *args, **kwargs))
+        self._track(fut)
+        return fut
+
+    def _track(self, fut: asyncio.Future[Any]) -> None:
+        self._running.add(fut)
+        fut.add_done_callback(self._running.discard)
+
+    def when_idle(self, callback: Callable[[], Any]) -> None:
+        """Call `callback` once the calls running now have returned (right away if there are none).
+
+        Calls started afterwards are not waited for. Must be called from the
+        event loop the calls were made on.
+        """
+        running = [fut for fut in self._running if not fut.done()]
+        if not running:
+            callback()
+            return
+        remaining = len(running)
+
+        def _returned(_fut: asyncio.Future[Any]) -> None:
+            nonlocal remaining
+            remaining -= 1
+            if remaining == 0:
+                callback()
+
+        for fut in running:
+            fut.add_done_callback(_returned)
+
+
+class AsyncLLMEngine(_EngineCalls):
+    """Async facade over a sync `LLMEngine`.
+
+    Every call is executed on the shared engine executor so long generations
+    never block the event loop (and therefore other connections). Calls into
+    an engine that is not `thread_safe` run one at a time (see `serial`).
+    """
+
+    def __init__(self, engine: LLMEngine, executor: Executor | None) -> None:
+        super().__init__()
+        self.engine = engine
+        self.model_id = engine.model_id
+        self._executor = executor
+
+    async def generate(self, prompt: str, params: GenerationParams) -> str:
+        fn = serialized(self.engine, self.engine.generate, params.cancel)
+        return await wait_cancellable(self._submit(fn, prompt, params), params.cancel)
+
+    def stream_generate(self, prompt: str, params: GenerationParams) -> AsyncIterator[str]:
+        fn = serialized_iter(self.engine, self.engine.stream_generate, params.cancel)
+        return iterate_in_executor(
+            self._executor, fn, prompt, params, cancel=params.cancel, track=self._track
+        )
+
+    async def generate_chat(self, messages: Sequence[ChatMessageLike], params: GenerationParams) -> str:
+        fn = serialized(self.engine, self.engine.generate_chat, params.cancel)
+        return await wait_cancellable(self._submit(fn, messages, params), params.cancel)
+
+    def stream_generate_chat(
+        self, messages: Sequence[ChatMessageLike], params: GenerationParams
+    ) -> AsyncIterator[str]:
+        fn = serialized_iter(self.engine, self.engine.stream_generate_chat, params.cancel)
+        return iterate_in_executor(
+            self._executor, fn, messages, params, cancel=params.cancel, track=self._track
+        )
+
+    async def count_usage(self, messages: Sequence[ChatMessageLike], completion: str) -> tuple[int, int]:
+        """(prompt_tokens, completion_tokens) for a finished chat completion."""
+
+        def _count() -> tuple[int, int]:
+            return self.engine.count_chat_tokens(messages), self.engine.count_tokens(completion)
+
+        return await self._submit(serialized(self.engine, _count))
+
+
+class AsyncTTSEngine(_EngineCalls):
+    """Async facade over a sync `TTSEngine` (see `AsyncLLMEngine`)."""
+
+    def __init__(self, engine: TTSEngine, executor: Executor | None) -> None:
+        super().__init__()
+        self.engine = engine
+        self.model_id = engine.model_id
+        self._executor = executor
+
+    async def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
+        fn = serialized(self.engine, self.engine.synthesize, params.cancel)
+        return await wait_cancellable(
+            self._submit(fn, text, params, format=format, **kwargs), params.cancel
+        )
+
+    @property
+    def native_audio(self) -> bool:
+        """Whether the engine hands back PCM (`synthesize_audio`) rather than only encoded bytes."""
+        return callable(getattr(self.engine, "synthesize_audio", None))
+
+    async def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        fn = getattr(self.engine, "synthesize_audio", None) or functools.partial(
+            TTSEngine.synthesize_audio, self.engine
+        )
+        fn = serialized(self.engine, fn, params.cancel)
+        return await wait_cancellable(self._submit(fn, text, params, **kwargs), params.cancel)
+
+    def stream_synthesize(self, text: str, params: TTSParams, **kwargs) -> AsyncIterator[AudioBuffer]:
+        stream = getattr(self.engine, "stream_synthesize", None)
+        if stream is None:
+            # Duck-typed engines without their own streaming get the sentence-by-sentence default.
+            stream = functools.partial(TTSEngine.stream_synthesize, self.engine)
+        stream = serialized_iter(self.engine, stream, params.cancel)
+        return iterate_in_executor(
+            self._executor, stream, text, params, cancel=params.cancel, track=self._track, **kwargs
+        )
@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Iterable, Protocol, Sequence
 
+from .cancellation import CancelToken
+
 
 @dataclass(frozen=True)
 class GenerationParams:
     max_tokens: int = 256
     temperature: float = 0.7
     top_p: float = 0.95
+    # Checked by engines between tokens; set by the API layer for disconnects/deadlines.
+    cancel: CancelToken | None = field(default=None, compare=False, repr=False)
 
 
 class ChatMessageLike(Protocol):
@@ -20,6 +24,8 @@ class LLMEngine:
     """Minimal interface the API layer relies on."""
 
     model_id: str
+    # Whether concurrent calls may run on one instance; otherwise they are serialized (see `serial`).
+    thread_safe: bool = False
 
     def generate(self, prompt: str, params: GenerationParams) -> str:
         raise NotImplementedError
@@ -28,17 +34,35 @@ class LLMEngine:
         """Yield incremental text chunks (already decoded)."""
         raise NotImplementedError
 
+    def stats(self) -> dict:
+        """Engine-specific runtime counters (caches, queues, ...). Empty by default."""
+        return {}
+
+    def memory_bytes(self) -> int:
+        """Estimated resident memory of the loaded model, for the registry's budget."""
+        return 0
+
+    def count_tokens(self, text: str) -> int:
+        """Token count of `text`. Engines without a tokenizer approximate with words."""
+        return len(text.split())
+
+    def count_chat_tokens(self, messages: Sequence[ChatMessageLike]) -> int:
+        """Token count of the prompt `generate_chat` would feed the model."""
+        return self.count_tokens(_render_plain_chat(messages))
+
     # Optional chat-friendly helpers.
     def generate_chat(self, messages: Sequence[ChatMessageLike], params: GenerationParams) -> str:
-        prompt = "\n".join(
-            f"{m.role}: {m.content}" for m in messages if getattr(m, "content", None) is not None
-        ) + "\nassistant:"
+        prompt = _render_plain_chat(messages)
         return self.generate(prompt, params)
 
     def stream_generate_chat(
         self, messages: Sequence[ChatMessageLike], params: GenerationParams
     ) -> Iterable[str]:
-        prompt = "\n".join(
-            f"{m.role}: {m.content}" for m in messages if getattr(m, "content", None) is not None
-        ) + "\nassistant:"
+        prompt = _render_plain_chat(messages)
         return self.stream_generate(prompt, params)
+
+
+def _render_plain_chat(messages: Sequence[ChatMessageLike]) -> str:
+    return "\n".join(
+        f"{m.role}: {m.content}" for m in messages if getattr(m, "content", None) is not None
+    ) + "\nassistant:"
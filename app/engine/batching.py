@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import queue
+import threading
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Protocol
+
+from .base import GenerationParams
+from .cancellation import GenerationCancelled
+
+
+@dataclass
+class StepOutput:
+    """What one decode step produced for a single sequence."""
+
+    text: str = ""
+    finished: bool = False
+
+
+class StepModel(Protocol):
+    """A model that decodes a whole batch one token at a time.
+
+    `add` registers a new sequence (the model may prefill it right away or on the
+    next `step`), `step` advances every active sequence by one token and
+    `remove` drops a sequence from the batch (finished or abandoned).
+    """
+
+    def add(self, seq_id: int, prompt: str, params: GenerationParams) -> None: ...
+
+    def step(self) -> dict[int, StepOutput]: ...
+
+    def remove(self, seq_id: int) -> None: ...
+
+
+_DONE = object()
+
+
+@dataclass
+class _Failure:
+    error: BaseException
+
+
+@dataclass
+class _Sequence:
+    seq_id: int
+    prompt: str
+    params: GenerationParams
+    out: queue.SimpleQueue = field(default_factory=queue.SimpleQueue)
+    generated: int = 0
+    abandoned: bool = False
+
+    def cancel_error(self) -> GenerationCancelled | None:
+        token = self.params.cancel
+        if token is None:
+            return None
+        try:
+            token.raise_if_cancelled()
+        except GenerationCancelled as e:
+            return e
+        return None
+
+
+class BatchScheduler:
+    """Continuous-batching scheduler on top of a `StepModel`.
+
+    Requests are queued by `submit`. A single worker thread owns the model: at
+    every token boundary it admits queued sequences into the running batch (up
+    to `max_batch_size`), runs one decode step for the whole batch and routes
+    each sequence's text back to its caller. Sequences leave the batch as soon
+    as they finish, hit `max_tokens` or their consumer goes away.
+    """
+
+    def __init__(self, model: StepModel, *, max_batch_size: int = 8, name: str = "batch") -> None:
+        self._model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self._name = name
+
+        self._cond = threading.Condition()
+        self._pending: deque[_Sequence] = deque()
+        self._active: dict[int, _Sequence] = {}
+        self._next_id = 0
+        self._closed = False
+        self._thread: threading.Thread | None = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._pending)
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def submit(self, prompt: str, params: GenerationParams) -> Iterator[str]:
+        """Queue a request and yield its text chunks as the batch decodes them."""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("BatchScheduler is closed")
+            seq = _Sequence(seq_id=self._next_id, prompt=prompt, params=params)
+            self._next_id += 1
+            self._pending.append(seq)
+            self._ensure_worker()
+            self._cond.notify()
+
+        try:
+            while True:
+                item = seq.out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.error
+                yield item
+        finally:
+            seq.abandoned = True
+            with self._cond:
+                self._cond.notify()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _ensure_worker(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self._name}-scheduler", daemon=True)
+            self._thread.start()
+
+    def _finish(self, seq: _Sequence, item: object = _DONE) -> None:
+        self._active.pop(seq.seq_id, None)
+        try:
+            self._model.remove(seq.seq_id)
+        except Exception:
+            pass
+        seq.out.put(item)
+
+    def _admit(self) -> list[_Sequence]:
+        with self._cond:
+            while not self._closed and not self._pending and not self._active:
+                self._cond.wait()
+            if self._closed:
+                return []
+            admitted: list[_Sequence] = []
+            while self._pending and len(self._active) + len(admitted) < self.max_batch_size:
+                admitted.append(self._pending.popleft())
+            return admitted
+
+    def _run(self) -> None:
+        while True:
+            admitted = self._admit()
+            if self._closed:
+                break
+
+            # Join new sequences at the token boundary.
+            for seq in admitted:
+                if seq.abandoned:
+                    seq.out.put(_DONE)
+                    continue
+                err = seq.cancel_error()
+                if err is not None:
+                    seq.out.put(_Failure(err))
+                    continue
+                try:
+                    self._model.add(seq.seq_id, seq.prompt, seq.params)
+                except Exception as e:
+                    seq.out.put(_Failure(e))
+                    continue
+                self._active[seq.seq_id] = seq
+
+            for seq in list(self._active.values()):
+                if seq.abandoned:
+                    self._finish(seq)
+                elif (err := seq.cancel_error()) is not None:
+                    self._finish(seq, _Failure(err))
+
+            if not self._active:
+                continue
+
+            try:
+                outputs = self._model.step()
+            except Exception as e:
+                for seq in list(self._active.values()):
+                    self._finish(seq, _Failure(e))
+                continue
+
+            for seq_id, out in outputs.items():
+                seq = self._active.get(seq_id)
+                if seq is None:
+                    continue
+                seq.generated += 1
+                if out.text:
+                    seq.out.put(out.text)
+                if out.finished or seq.generated >= int(seq.params.max_tokens):
+                    self._finish(seq)
+
+        with self._cond:
+            leftovers = list(self._pending) + list(self._active.values())
+            self._pending.clear()
+        for seq in leftovers:
+            self._finish(seq, _Failure(RuntimeError("BatchScheduler is closed")))
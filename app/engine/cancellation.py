@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+
+
+class GenerationCancelled(RuntimeError):
+    """Raised inside an engine call once its `CancelToken` fired."""
+
+
+class DeadlineExceeded(GenerationCancelled):
+    """The request ran past its deadline."""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between the API layer and an engine call.
+
+    The API layer cancels it (client went away) or gives it a deadline; engines
+    call `raise_if_cancelled()` at token/chunk boundaries. Thread-safe.
+    """
+
+    def __init__(self, *, deadline: float | None = None) -> None:
+        # `deadline` is a `time.monotonic()` timestamp.
+        self.deadline = deadline
+        self.reason: str | None = None
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    @classmethod
+    def with_timeout(cls, seconds: float | None) -> CancelToken:
+        if seconds is None or seconds <= 0:
+            return cls()
+        return cls(deadline=time.monotonic() + float(seconds))
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            self.cancel("deadline exceeded")
+            return True
+        return False
+
+    def remaining(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            try:
+                cb()
+            except Exception:
+                pass
+
+    def add_callback(self, cb: Callable[[], None]) -> None:
+        """Run `cb` once when the token is cancelled (immediately if it already is)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(cb)
+                return
+        cb()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            if self.reason == "deadline exceeded":
+                raise DeadlineExceeded("Request deadline exceeded")
+            raise GenerationCancelled(f"Generation cancelled: {self.reason}")
+
+
+def check_cancelled(token: CancelToken | None) -> None:
+    """`token.raise_if_cancelled()` that tolerates a missing token."""
+    if token is not None:
+        token.raise_if_cancelled()
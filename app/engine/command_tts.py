@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import select
+import shlex
+import shutil
+import subprocess
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+from .cancellation import CancelToken, check_cancelled
+from .macos_say_tts import MacOSSayTTSEngine
+from .tts_base import TTSParams
+from ..utils.audio_buffer import PCM_FORMATS, AudioBuffer
+from ..utils.timing import span
+
+# Per-request values that can appear in the command template, e.g. `-v {voice}`.
+_PLACEHOLDERS = ("{text}", "{voice}", "{speed}", "{speaker_id}")
+
+
+@dataclass
+class _Worker:
+    proc: subprocess.Popen
+    requests: int = 0
+
+
+class CommandTTSEngine(MacOSSayTTSEngine):
+    """TTS engine that runs a command-line synthesizer, with a pool of warm processes.
+
+    `command` is an argv template (string or list). Audio comes back on stdout,
+    never through temp files, in one of two protocols:
+
+    - `"oneshot"`: one process per utterance. The text is written to stdin and
+      the process writes the whole clip (`output="wav"`, or raw PCM16 mono at
+      `sample_rate` for `output="pcm"`) to stdout and exits. Processes are
+      started ahead of time, so their start-up (imports, model load) overlaps
+      with earlier requests; each is replaced as soon as it is taken. If the
+      template uses `{text}`, `{voice}`, `{speed}` or `{speaker_id}` it is
+      started per request instead.
+    - `"persistent"`: long-lived workers. Each request is one JSON line
+      (`{"text", "voice", "speed", "speaker_id"}`) on stdin; the worker answers
+      `OK <sample_rate> <nbytes>\\n` followed by that many bytes of PCM16 mono,
+      or `ERR <message>\\n`. Workers are recycled after `max_requests` requests
+      (0 = never) and whenever one fails or a request is cancelled.
+
+    At most `workers` requests run at once; the rest wait for a free worker.
+    """
+
+    def __init__(
+        self,
+        model_id: str,
+        command: str | Sequence[str],
+        *,
+        protocol: str = "oneshot",
+        output: str = "wav",
+        sample_rate: int = 22050,
+        workers: int = 2,
+        max_requests: int = 0,
+    ) -> None:
+        if protocol not in {"oneshot", "persistent"}:
+            raise ValueError(f"Unknown TTS command protocol: {protocol!r} (expected 'oneshot' or 'persistent')")
+        if output not in PCM_FORMATS:
+            raise ValueError(f"Unknown TTS command output: {output!r} (expected 'wav' or 'pcm')")
+        self.command = shlex.split(command) if isinstance(command, str) else list(command)
+        if not self.command:
+            raise ValueError("TTS command is empty")
+        self.protocol = protocol
+        self.output = output
+        self.sample_rate = int(sample_rate)
+        self.workers = max(1, int(workers))
+        self.max_requests = int(max_requests)
+        super().__init__(model_id)
+
+        # Warm only if the argv doesn't depend on the request.
+        self._warm = protocol == "persistent" or not any(p in arg for arg in self.command for p in _PLACEHOLDERS)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.spawned = 0
+        self.recycled = 0
+        self.requests = 0
+        # One entry per allowed concurrent request: a warm worker, or None for "start one".
+        self._idle: queue.Queue[_Worker | None] = queue.Queue()
+        for _ in range(self.workers):
+            self._idle.put(self._spawn() if self._warm else None)
+
+    def _check_tools(self) -> None:
+        if shutil.which(self.command[0]) is None:
+            raise RuntimeError(f"TTS command not found: {self.command[0]}")
+
+    def _argv(self, text: str, params: TTSParams) -> list[str]:
+        if self._warm:
+            return self.command
+        values = {
+            "text": text,
+            "voice": self._map_voice(params.voice),
+            "speed": params.speed,
+            "speaker_id": "" if params.speaker_id is None else params.speaker_id,
+        }
+        return [arg.format(**values) for arg in self.command]
+
+    def _spawn(self, argv: list[str] | None = None) -> _Worker:
+        proc = subprocess.Popen(
+            argv or self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            # Persistent workers keep running: let their diagnostics reach our stderr.
+            stderr=None if self.protocol == "persistent" else subprocess.PIPE,
+            bufsize=0,
+        )
+        with self._lock:
+            self.spawned += 1
+        return _Worker(proc)
+
+    @staticmethod
+    def _kill(worker: _Worker) -> None:
+        if worker.proc.poll() is None:
+            worker.proc.kill()
+        worker.proc.wait()
+        for pipe in (worker.proc.stdin, worker.proc.stdout, worker.proc.stderr):
+            if pipe is not None:
+                pipe.close()
+
+    def _acquire(self, cancel: CancelToken | None) -> _Worker | None:
+        while True:
+            try:
+                return self._idle.get(timeout=None if cancel is None else 0.05)
+            except queue.Empty:
+                check_cancelled(cancel)
+
+    def _release(self, worker: _Worker | None) -> None:
+        """Return a slot to the pool, replacing (or recycling) the worker as needed."""
+        if self._closed:
+            if worker is not None:
+                self._kill(worker)
+            return
+        if self._warm and (worker is None or worker.proc.poll() is not None):
+            worker = self._spawn()
+        elif worker is not None and self.max_requests and worker.requests >= self.max_requests:
+            with self._lock:
+                self.recycled += 1
+            self._kill(worker)
+            worker = self._spawn()
+        self._idle.put(worker)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                self._kill(worker)
+
+    def stats(self) -> dict:
+        return {
+            "command": {
+                "protocol": self.protocol,
+                "workers": self.workers,
+                "warm": self._warm,
+                "spawned": self.spawned,
+                "recycled": self.recycled,
+                "requests": self.requests,
+            }
+        }
+
+    def _oneshot(self, worker: _Worker, text: str, cancel: CancelToken | None) -> AudioBuffer:
+        proc = worker.proc
+        data: bytes | None = text.encode("utf-8")
+        while True:
+            try:
+                out, err = proc.communicate(data, timeout=None if cancel is None else 0.05)
+                break
+            except subprocess.TimeoutExpired:
+                # Output read so far is kept; input must not be sent twice.
+                data = None
+                check_cancelled(cancel)
+        if proc.returncode != 0:
+            detail = (err or b"").decode("utf-8", "replace").strip()
+            raise RuntimeError(f"TTS command exited with {proc.returncode}: {detail}")
+        if self.output == "wav":
+            return AudioBuffer.from_wav(out)
+        return AudioBuffer.from_pcm16(out, self.sample_rate)
+
+    def _persistent(self, worker: _Worker, text: str, params: TTSParams) -> AudioBuffer:
+        request = {"text": text, "voice": params.voice, "speed": params.speed, "speaker_id": params.speaker_id}
+        assert worker.proc.stdin is not None and worker.proc.stdout is not None
+        line = memoryview(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        while line:
+            line = line[worker.proc.stdin.write(line) :]
+        worker.requests += 1
+
+        fd = worker.proc.stdout.fileno()
+        buf = bytearray()
+        header: tuple[int, int] | None = None
+        while True:
+            if header is None and b"\n" in buf:
+                line, _, rest = bytes(buf).partition(b"\n")
+                buf = bytearray(rest)
+                status, _, detail = line.decode("utf-8", "replace").partition(" ")
+                if status != "OK":
+                    raise RuntimeError(f"TTS worker error: {detail or line!r}")
+                sample_rate, nbytes = (int(v) for v in detail.split())
+                header = (sample_rate, nbytes)
+            if header is not None and len(buf) >= header[1]:
+                return AudioBuffer.from_pcm16(memoryview(buf)[: header[1]], header[0])
+            ready, _, _ = select.select([fd], [], [], 0.05)
+            if not ready:
+                check_cancelled(params.cancel)
+                continue
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                raise RuntimeError(f"TTS worker exited with {worker.proc.wait()}")
+            buf += chunk
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        with span("tts-queue"):
+            worker = self._acquire(params.cancel)
+        try:
+            with span("tts-command"):
+                if worker is None:
+                    worker = self._spawn(self._argv(text, params))
+                with self._lock:
+                    self.requests += 1
+                if self.protocol == "persistent":
+                    audio = self._persistent(worker, text, params)
+                else:
+                    audio = self._oneshot(worker, text, params.cancel)
+        except BaseException:
+            # Cancelled or failed mid-request: the process is in an unknown state.
+            if worker is not None:
+                self._kill(worker)
+            self._release(None if not self._warm else worker)
+            raise
+        if self.protocol == "oneshot":
+            # The process has exited; its slot gets a fresh one.
+            self._release(None)
+        else:
+            self._release(worker)
+        return audio
+
+    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
+        fmt = (format or "wav").lower()
+        if fmt not in PCM_FORMATS:
+            raise ValueError(f"Unsupported format: {format}. Supported: {', '.join(sorted(PCM_FORMATS))}")
+        audio = self.synthesize_audio(text, params, **kwargs)
+        with span("tts-encode"):
+            return audio.encode(fmt)
@@ -4,9 +4,12 @@ from collections.abc import Iterable
 from typing import Sequence
 
 from .base import ChatMessageLike, GenerationParams, LLMEngine
+from .cancellation import check_cancelled
 
 
 class EchoEngine(LLMEngine):
+    thread_safe = True
+
     def __init__(self, model_id: str = "local-echo") -> None:
         self.model_id = model_id
 
@@ -16,6 +19,7 @@ class EchoEngine(LLMEngine):
     def stream_generate(self, prompt: str, params: GenerationParams) -> Iterable[str]:
         text = self.generate(prompt, params)
         for i in range(0, len(text), 32):
+            check_cancelled(params.cancel)
             yield text[i : i + 32]
 
     def generate_chat(self, messages: Sequence[ChatMessageLike], params: GenerationParams) -> str:
@@ -28,4 +32,5 @@ class EchoEngine(LLMEngine):
     ) -> Iterable[str]:
         text = self.generate_chat(messages, params)
         for i in range(0, len(text), 32):
+            check_cancelled(params.cancel)
             yield text[i : i + 32]
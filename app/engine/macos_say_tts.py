@@ -5,7 +5,9 @@ import subprocess
 import tempfile
 from pathlib import Path
 
+from .cancellation import CancelToken, check_cancelled
 from .tts_base import TTSParams, TTSEngine
+from ..utils.timing import span
 
 
 class MacOSSayTTSEngine(TTSEngine):
@@ -18,14 +20,38 @@ class MacOSSayTTSEngine(TTSEngine):
     We implement `wav` reliably and also accept `mp3` if `afconvert` supports it.
     """
 
+    # Every call runs its own subprocesses.
+    thread_safe = True
+
     def __init__(self, model_id: str = "macos-say") -> None:
         self.model_id = model_id
+        self._check_tools()
 
+    def _check_tools(self) -> None:
+        """Fail early if the command-line tools this engine runs are missing."""
         if shutil.which("say") is None:
             raise RuntimeError("macOS 'say' command not found")
         if shutil.which("afconvert") is None:
             raise RuntimeError("macOS 'afconvert' command not found")
 
+    @staticmethod
+    def _run(cmd: list[str], cancel: CancelToken | None) -> None:
+        """`subprocess.run(cmd, check=True)` that kills the child if the request is cancelled."""
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    returncode = proc.wait(timeout=None if cancel is None else 0.05)
+                    break
+                except subprocess.TimeoutExpired:
+                    check_cancelled(cancel)
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
     @staticmethod
     def _map_voice(voice: str) -> str:
         # Let users pass through native voices; default means do not specify.
@@ -49,7 +75,8 @@ class MacOSSayTTSEngine(TTSEngine):
             # Note: `say` doesn't support continuous speed parameter, so we ignore params.speed.
             cmd.append(text)
 
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with span("tts-say"):
+                self._run(cmd, params.cancel)
 
             if fmt == "aiff":
                 return aiff_path.read_bytes()
@@ -78,5 +105,6 @@ class MacOSSayTTSEngine(TTSEngine):
                     str(out_path),
                 ]
 
-            subprocess.run(conv, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            with span("tts-convert"):
+                self._run(conv, params.cancel)
             return out_path.read_bytes()
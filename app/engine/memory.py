@@ -0,0 +1,13 @@
+from __future__ import annotations
+
+
+def mlx_parameter_nbytes(model) -> int:
+    """Bytes held by an MLX module's parameters (weights dominate resident memory)."""
+    try:
+        from mlx.utils import tree_flatten  # type: ignore
+    except Exception:
+        return 0
+    try:
+        return int(sum(v.nbytes for _, v in tree_flatten(model.parameters())))
+    except Exception:
+        return 0
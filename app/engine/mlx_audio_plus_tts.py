@@ -1,11 +1,17 @@
 from __future__ import annotations
 
+import inspect
+import io
 import os
 import tempfile
 from pathlib import Path
 
+from .cancellation import check_cancelled
+from .memory import mlx_parameter_nbytes
+from .reference_cache import ReferenceAudioCache, reference_key
 from .tts_base import TTSParams, TTSEngine
-from app.utils.audio_wav import read_wav_mono_pcm16, trim_repeat_prefix_pcm16, write_wav_pcm16
+from app.utils.audio_buffer import PCM_FORMATS, AudioBuffer
+from app.utils.timing import span
 
 
 class MLXAudioPlusTTSEngine(TTSEngine):
@@ -17,132 +23,155 @@ class MLXAudioPlusTTSEngine(TTSEngine):
     - a local directory path containing the MLX TTS model, or
     - a HuggingFace repo id like `mlx-community/Fun-CosyVoice3-0.5B-2512-4bit`
 
-    The underlying library writes audio to a file; we read and return bytes.
+    The model is loaded once and kept resident; each request calls its
+    `generate()` directly and gets the samples back as an `AudioBuffer`.
+
+    With `ref_cache_bytes > 0` decoded reference/source clips are kept in a
+    `ReferenceAudioCache`, so clients that reuse the same few voices skip
+    decoding and resampling on every request.
     """
 
-    def __init__(self, model_id: str, model_path: str) -> None:
+    def __init__(
+        self, model_id: str, model_path: str, *, ref_cache_bytes: int = 0, trim_similarity: float = 1.0
+    ) -> None:
         self.model_id = model_id
         self.model_path = model_path
+        self.trim_similarity = float(trim_similarity)
+        self._ref_cache = ReferenceAudioCache(ref_cache_bytes) if ref_cache_bytes > 0 else None
 
-        # Validate import early for clear startup errors.
         try:
-            from mlx_audio.tts.generate import generate_audio  # noqa: F401
+            from mlx_audio.tts.utils import load_model
         except Exception as e:  # pragma: no cover
             raise RuntimeError(
                 "mlx-audio-plus is required for AUDIO_BACKEND=mlx-audio-plus. "
                 "Install with: uv add mlx-audio-plus"
             ) from e
 
+        self._model = load_model(model_path)
+        self.sample_rate = int(getattr(self._model, "sample_rate", 24000))
+
+        # Only pass what this model's generate() understands.
+        sig = inspect.signature(self._model.generate)
+        self._generate_kwargs: set[str] | None = (
+            None
+            if any(p.kind is inspect.Parameter.VAR_KEYWORD for p in sig.parameters.values())
+            else set(sig.parameters)
+        )
+
     @staticmethod
     def _guess_audio_format(fmt: str | None) -> str:
         f = (fmt or "wav").lower()
-        if f in {"wav", "mp3", "flac", "aac", "opus"}:
+        if f in {"wav", "pcm", "mp3", "flac", "aac", "opus"}:
             return f
         return "wav"
 
-    @staticmethod
-    def _pick_output_file(tmp_dir: Path, out_prefix: str, audio_format: str) -> Path:
-        """Pick the best output file produced by mlx_audio.
-
-        Some versions/models produce numbered outputs like `speech_000.wav`.
-        """
-        direct = Path(f"{out_prefix}.{audio_format}")
-        if direct.exists():
-            return direct
-
-        # Common fallback
-        wav = Path(f"{out_prefix}.wav")
-        if wav.exists():
-            return wav
-
-        # Search for numbered outputs
-        candidates = sorted(tmp_dir.glob(f"speech_*.{audio_format}"))
-        if not candidates and audio_format != "wav":
-            candidates = sorted(tmp_dir.glob("speech_*.wav"))
-
-        if candidates:
-            # Pick the first segment by default to avoid overlap/repetition.
-            return candidates[0]
-
-        # Last resort: any audio file in tmp dir
-        any_files = sorted(tmp_dir.glob(f"*.{audio_format}"))
-        if not any_files and audio_format != "wav":
-            any_files = sorted(tmp_dir.glob("*.wav"))
-        if any_files:
-            return any_files[-1]
-
-        raise RuntimeError("mlx_audio did not produce an output audio file")
+    def memory_bytes(self) -> int:
+        cached = self._ref_cache.stats()["bytes"] if self._ref_cache is not None else 0
+        return mlx_parameter_nbytes(self._model) + int(cached)
+
+    def stats(self) -> dict:
+        return {"ref_cache": self._ref_cache.stats()} if self._ref_cache is not None else {}
+
+    def _load_audio(self, val, *, ref_text: str | None = None):
+        """Reference/source audio as the sample array the model expects."""
+        if val is None:
+            return None
+        if not isinstance(val, (bytes, bytearray)) and not os.path.exists(str(val)):
+            raise ValueError(f"Audio file not found: {val}")
+        if self._ref_cache is None:
+            return self._decode_audio(val)
+
+        key = reference_key(val, ref_text=ref_text)
+
+        def _load():
+            audio = self._decode_audio(val)
+            nbytes = getattr(audio, "nbytes", None)
+            return audio, int(nbytes) if nbytes is not None else 4 * len(audio)
+
+        with span("tts-ref-audio"):
+            return self._ref_cache.get_or_load(key, _load)
+
+    def _decode_audio(self, val):
+        from mlx_audio.tts.generate import load_audio
+
+        if isinstance(val, (bytes, bytearray)):
+            # load_audio() wants a path; only raw bytes need the round trip.
+            fd, p = tempfile.mkstemp(suffix=".wav")
+            os.close(fd)
+            path = Path(p)
+            try:
+                with span("tts-tmp-write"):
+                    path.write_bytes(bytes(val))
+                return load_audio(str(path), sample_rate=self.sample_rate)
+            finally:
+                path.unlink(missing_ok=True)
+        return load_audio(str(val), sample_rate=self.sample_rate)
 
-    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:  # type: ignore[override]
-        from mlx_audio.tts.generate import generate_audio
+    @staticmethod
+    def _encode(audio: AudioBuffer, audio_format: str) -> bytes:
+        if audio_format in PCM_FORMATS:
+            return audio.encode(audio_format)
+        if audio_format == "aac":
+            # libsndfile (which mlx_audio's own writer also uses) has no AAC container.
+            raise ValueError("Unsupported format for mlx-audio-plus: aac (use mp3, opus, flac or wav)")
+
+        import numpy as np
+        import soundfile as sf
+
+        buf = io.BytesIO()
+        samples = np.frombuffer(audio.pcm16, dtype="<i2")
+        subtype = "OPUS" if audio_format == "opus" else None
+        container = "OGG" if audio_format == "opus" else audio_format.upper()
+        try:
+            sf.write(buf, samples, audio.sample_rate, format=container, subtype=subtype)
+        except Exception as e:
+            raise ValueError(f"Unsupported format for mlx-audio-plus: {audio_format}") from e
+        return buf.getvalue()
 
-        audio_format = self._guess_audio_format(format)
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        cancel = getattr(params, "cancel", None)
 
-        # Some models need reference audio; we accept either file paths or bytes.
-        # For bytes we persist to a temp wav.
-        tmp_files: list[Path] = []
-
-        def _ensure_path(val):
-            if val is None:
-                return None
-            if isinstance(val, (str, os.PathLike)):
-                return str(val)
-            if isinstance(val, (bytes, bytearray)):
-                fd, p = tempfile.mkstemp(suffix=".wav")
-                os.close(fd)
-                path = Path(p)
-                path.write_bytes(bytes(val))
-                tmp_files.append(path)
-                return str(path)
-            return str(val)
-
-        ref_audio = _ensure_path(kwargs.pop("ref_audio", None))
-        source_audio = _ensure_path(kwargs.pop("source_audio", None))
         ref_text = kwargs.pop("ref_text", None)
-        instruct_text = kwargs.pop("instruct_text", None)
-
+        call_kwargs = dict(
+            ref_audio=self._load_audio(kwargs.pop("ref_audio", None), ref_text=ref_text),
+            source_audio=self._load_audio(kwargs.pop("source_audio", None)),
+            ref_text=ref_text,
+            instruct_text=kwargs.pop("instruct_text", None),
+            verbose=False,
+        )
+        # Voice conversion mode may not provide text.
+        if text:
+            call_kwargs["text"] = text
+        call_kwargs = {k: v for k, v in call_kwargs.items() if v is not None}
+        if self._generate_kwargs is not None:
+            call_kwargs = {k: v for k, v in call_kwargs.items() if k in self._generate_kwargs}
+
+        audio: AudioBuffer | None = None
+        check_cancelled(cancel)
+        with span("tts-generate"):
+            # Long inputs come back as several segments; join them (same as join_audio=True).
+            for result in self._model.generate(**call_kwargs):
+                sample_rate = int(getattr(result, "sample_rate", None) or self.sample_rate)
+                chunk = AudioBuffer.from_float(result.audio, sample_rate)
+                if audio is None:
+                    audio = chunk
+                else:
+                    audio.extend(chunk)
+                check_cancelled(cancel)
+        if audio is None:
+            raise RuntimeError("mlx_audio did not produce any audio")
+
+        # Heuristic de-duplication for repeated prefix
         try:
-            with tempfile.TemporaryDirectory() as td:
-                tmp_dir = Path(td)
-                out_prefix = str(tmp_dir / "speech")
-
-                call_kwargs = dict(
-                    model=self.model_path,
-                    ref_audio=ref_audio,
-                    source_audio=source_audio,
-                    ref_text=ref_text,
-                    instruct_text=instruct_text,
-                    file_prefix=out_prefix,
-                    audio_format=audio_format,
-                    join_audio=True,
-                    verbose=False,
-                )
-                # Voice conversion mode may not provide text.
-                if text:
-                    call_kwargs["text"] = text
-
-                generate_audio(**call_kwargs)
-
-                out_file = self._pick_output_file(tmp_dir, out_prefix, audio_format)
-                audio_bytes = out_file.read_bytes()
-
-                # Heuristic de-duplication for repeated prefix (wav only)
-                if audio_format == "wav":
-                    try:
-                        sr, pcm = read_wav_mono_pcm16(audio_bytes)
-                        trimmed = trim_repeat_prefix_pcm16(pcm, sample_rate=sr)
-                        if trimmed != pcm:
-                            audio_bytes = write_wav_pcm16(sr, trimmed)
-                    except Exception:
-                        # Never fail the request because of post-processing.
-                        pass
-
-                return audio_bytes
-        finally:
-            # Cleanup temp refs
-            for p in tmp_files:
-                try:
-                    p.unlink(missing_ok=True)
-                except Exception:
-                    pass
+            with span("tts-trim"):
+                audio.trim_repeat_prefix(similarity=self.trim_similarity)
+        except Exception:
+            # Never fail the request because of post-processing.
+            pass
+        return audio
 
+    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:  # type: ignore[override]
+        audio_format = self._guess_audio_format(format)
+        audio = self.synthesize_audio(text, params, **kwargs)
+        with span("tts-encode"):
+            return self._encode(audio, audio_format)
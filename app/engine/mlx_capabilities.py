@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import importlib
+import inspect
+import json
+import os
+import tempfile
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Sampling kwargs `stream_generate` may forward to `generate_step`, depending on the build:
+# older ones take `temp`/`temperature`/`top_p`, newer ones a `sampler` callable.
+SAMPLING_KWARGS = ("temperature", "temp", "top_p", "sampler")
+# `make_sampler` parameters we set when passing a sampler.
+SAMPLER_KWARGS = ("temp", "top_p")
+
+
+@dataclass(frozen=True)
+class MLXCapabilities:
+    """Which sampling parameters the installed `mlx-lm` accepts."""
+
+    kwargs: tuple[str, ...] = ()
+    sampler_kwargs: tuple[str, ...] = ()
+
+    @property
+    def temp_kw(self) -> str | None:
+        for name in ("temperature", "temp"):
+            if name in self.kwargs:
+                return name
+        return None
+
+    def generation_kwargs(self, temperature: float, top_p: float) -> dict:
+        """Keyword arguments for `stream_generate` that apply `temperature` and `top_p`."""
+        if "sampler" in self.kwargs and self.sampler_kwargs:
+            from mlx_lm.sample_utils import make_sampler  # type: ignore
+
+            values = {"temp": float(temperature), "top_p": float(top_p)}
+            return {"sampler": make_sampler(**{k: values[k] for k in self.sampler_kwargs})}
+
+        kwargs: dict = {}
+        if self.temp_kw is not None:
+            kwargs[self.temp_kw] = float(temperature)
+        if "top_p" in self.kwargs:
+            kwargs["top_p"] = float(top_p)
+        return kwargs
+
+
+def _parameters(fn: Callable | None) -> tuple[set[str], bool]:
+    """Keyword-passable parameter names of `fn` and whether it takes `**kwargs`."""
+    if fn is None:
+        return set(), False
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return set(), False
+    names = {p.name for p in params if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+    return names, any(p.kind is p.VAR_KEYWORD for p in params)
+
+
+def introspect(
+    stream_generate: Callable, generate_step: Callable | None = None, make_sampler: Callable | None = None
+) -> MLXCapabilities:
+    """Capabilities from the signatures of `stream_generate` and what its `**kwargs` reach."""
+    names, forwards = _parameters(stream_generate)
+    if forwards:
+        step_names, _ = _parameters(generate_step)
+        names |= step_names
+    kwargs = tuple(k for k in SAMPLING_KWARGS if k in names)
+
+    sampler_kwargs: tuple[str, ...] = ()
+    if "sampler" in kwargs:
+        sampler_names, _ = _parameters(make_sampler)
+        sampler_kwargs = tuple(k for k in SAMPLER_KWARGS if k in sampler_names)
+    return MLXCapabilities(kwargs=kwargs, sampler_kwargs=sampler_kwargs)
+
+
+def introspect_installed() -> MLXCapabilities:
+    """`introspect` applied to the installed `mlx_lm`."""
+    from mlx_lm import stream_generate  # type: ignore
+
+    # `generate_step` moved from `mlx_lm.utils` to `mlx_lm.generate`.
+    generate_step = None
+    for module in ("mlx_lm.generate", "mlx_lm.utils"):
+        try:
+            generate_step = getattr(importlib.import_module(module), "generate_step", None)
+        except ImportError:
+            continue
+        if generate_step is not None:
+            break
+    try:
+        from mlx_lm.sample_utils import make_sampler  # type: ignore
+    except ImportError:
+        make_sampler = None
+    return introspect(stream_generate, generate_step, make_sampler)
+
+
+def mlx_lm_version() -> str:
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return version("mlx-lm")
+    except PackageNotFoundError:
+        import mlx_lm  # type: ignore
+
+        return str(getattr(mlx_lm, "__version__", "unknown"))
+
+
+def default_cache_path() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "macoslocalapi" / "mlx_capabilities.json"
+
+
+def _read(path: Path) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def load_capabilities(
+    model_path: str,
+    *,
+    cache_path: str | Path | None = None,
+    force: bool = False,
+    detect: Callable[[], MLXCapabilities] = introspect_installed,
+    version: str | None = None,
+) -> tuple[MLXCapabilities, bool]:
+    """Capabilities for `model_path`, from the on-disk cache unless `force`; returns (caps, cached).
+
+    Entries are keyed by the `mlx-lm` version and the model path, so upgrading
+    either re-detects. Cache read/write errors only cost a re-detection.
+    """
+    path = Path(cache_path) if cache_path else default_cache_path()
+    if os.path.exists(model_path):
+        model_path = os.path.abspath(model_path)
+    key = f"{version or mlx_lm_version()}|{model_path}"
+    entries = _read(path)
+    if not force and isinstance(entry := entries.get(key), dict):
+        try:
+            return MLXCapabilities(tuple(entry["kwargs"]), tuple(entry["sampler_kwargs"])), True
+        except (KeyError, TypeError):
+            pass
+
+    caps = detect()
+    entries[key] = asdict(caps)
+    try:
+        _write(path, entries)
+    except OSError as e:
+        print(f"[mlx] could not persist capabilities to {path}: {e}")
+    return caps, False
@@ -1,23 +1,174 @@
 from __future__ import annotations
 
 import importlib.util
+import inspect
+import threading
 from collections.abc import Iterable
 from typing import Sequence
 
 from .base import ChatMessageLike, GenerationParams, LLMEngine
+from .batching import BatchScheduler, StepOutput
+from .cancellation import check_cancelled
+from .memory import mlx_parameter_nbytes
+from .mlx_capabilities import MLXCapabilities, load_capabilities
+from .prefix_cache import PrefixCache
+from .stream_filter import CUT_MARKERS, ChatStreamFilter
+from ..utils.timing import span, timed_iter
+
+
+def _encode_prompt(tokenizer, prompt: str) -> list[int]:
+    # Same rule as `mlx_lm.stream_generate`: don't add a second BOS when the
+    # chat template already rendered one.
+    bos = getattr(tokenizer, "bos_token", None)
+    add_special_tokens = bos is None or not prompt.startswith(bos)
+    return list(tokenizer.encode(prompt, add_special_tokens=add_special_tokens))
+
+
+def _prompt_cache_nbytes(prompt_cache: list) -> int:
+    total = 0
+    for c in prompt_cache:
+        nbytes = getattr(c, "nbytes", None)
+        if isinstance(nbytes, int):
+            total += nbytes
+            continue
+        for arr in getattr(c, "state", None) or ():
+            total += int(getattr(arr, "nbytes", 0) or 0)
+    return total
+
+
+def _new_detokenizer(tokenizer):
+    # Older `TokenizerWrapper`s hand out one shared detokenizer; batched decoding
+    # needs one per sequence.
+    cls = getattr(tokenizer, "_detokenizer_class", None)
+    if cls is not None:
+        return cls(tokenizer)
+    import copy
+
+    detok = copy.copy(tokenizer.detokenizer)
+    detok.reset()
+    return detok
+
+
+def _fork_prompt_cache(stored: list, n: int) -> list:
+    """A cache holding the first `n` tokens of `stored` that generation may extend.
+
+    Generation writes into its cache in place, so the stored one is never handed
+    out. Plain `KVCache` layers get views of the first `n` positions: the first
+    update outgrows them and reallocates, so only the matched prefix is ever
+    copied. Other layer types (rotating, quantized, recurrent) are deep-copied
+    and trimmed.
+    """
+    import copy
+
+    from mlx_lm.models.cache import KVCache  # type: ignore
+
+    fork = []
+    for layer in stored:
+        if type(layer) is KVCache and layer.keys is not None:
+            fresh = KVCache()
+            fresh.state = (layer.keys[..., :n, :], layer.values[..., :n, :])
+            fork.append(fresh)
+            continue
+        layer = copy.deepcopy(layer)
+        excess = int(getattr(layer, "offset", n)) - n
+        if excess > 0:
+            layer.trim(excess)
+        fork.append(layer)
+    return fork
+
+
+class _MLXBatchModel:
+    """`StepModel` backed by `mlx_lm.generate.BatchGenerator`."""
+
+    def __init__(self, model, tokenizer, lock: threading.Lock) -> None:
+        from mlx_lm.generate import BatchGenerator  # type: ignore
+
+        self._tokenizer = tokenizer
+        self._lock = lock
+        eos = getattr(tokenizer, "eos_token_ids", None) or {tokenizer.eos_token_id}
+        self._gen = BatchGenerator(model, stop_tokens=set(eos))
+        # Per-request samplers are only accepted by newer builds; older ones decode greedily.
+        self.per_request_sampling = "samplers" in inspect.signature(self._gen.insert).parameters
+        self._seq_by_uid: dict[int, int] = {}
+        self._seqs: dict[int, tuple[int, object]] = {}
+
+    def add(self, seq_id: int, prompt: str, params: GenerationParams) -> None:
+        kwargs: dict = {"max_tokens": [int(params.max_tokens)]}
+        if self.per_request_sampling:
+            from mlx_lm.sample_utils import make_sampler  # type: ignore
+
+            kwargs["samplers"] = [make_sampler(temp=float(params.temperature), top_p=float(params.top_p))]
+
+        with self._lock:
+            (uid,) = self._gen.insert([_encode_prompt(self._tokenizer, prompt)], **kwargs)
+        self._seq_by_uid[uid] = seq_id
+        self._seqs[seq_id] = (uid, _new_detokenizer(self._tokenizer))
+
+    def step(self) -> dict[int, StepOutput]:
+        out: dict[int, StepOutput] = {}
+        with self._lock:
+            responses = self._gen.next()
+        for resp in responses:
+            seq_id = self._seq_by_uid.get(resp.uid)
+            if seq_id is None:
+                continue
+            detok = self._seqs[seq_id][1]
+            finished = resp.finish_reason is not None
+            if resp.finish_reason != "stop":  # "stop" means EOS; it has no text
+                detok.add_token(resp.token)
+            if finished:
+                detok.finalize()
+            out[seq_id] = StepOutput(text=detok.last_segment, finished=finished)
+        return out
+
+    def remove(self, seq_id: int) -> None:
+        entry = self._seqs.pop(seq_id, None)
+        if entry is None:
+            return
+        uid = entry[0]
+        self._seq_by_uid.pop(uid, None)
+        try:
+            with self._lock:
+                self._gen.remove([uid])
+        except Exception:
+            # Finished sequences are already retired by the generator.
+            pass
 
 
 class MLXEngine(LLMEngine):
     """MLX engine via `mlx-lm`.
 
     `mlx_lm.stream_generate(..., **kwargs)` forwards kwargs to an internal
-    `generate_step()` which may differ across builds. Some installs reject
-    keys like `top_p` and/or `temperature`.
-
-    We therefore probe supported kwargs once (best-effort) and cache the result.
+    `generate_step()` which may differ across builds: older ones take
+    `temp`/`temperature`/`top_p`, newer ones only a `sampler`. Which applies is
+    read from the signatures (see `mlx_capabilities`) and cached on disk per
+    mlx-lm version and model path; `reprobe=True` ignores the cached entry.
+
+    With `max_batch_size > 1` requests go through a continuous-batching
+    `BatchScheduler` (over `mlx_lm`'s `BatchGenerator`) instead of one
+    `stream_generate` call per request.
+
+    With `prefix_cache_bytes > 0` the KV state of finished requests is kept in
+    a `PrefixCache` keyed by token ids, so follow-up turns (or prompts sharing a
+    system prompt) only prefill the tokens that are new.
+
+    MLX is not thread-safe: a request that does not go through the batcher
+    holds the model lock for its whole generation, and the batcher takes the
+    same lock for each step, so concurrent calls on one engine are safe.
     """
 
-    def __init__(self, model_id: str, model_path: str | None) -> None:
+    thread_safe = True
+
+    def __init__(
+        self,
+        model_id: str,
+        model_path: str | None,
+        *,
+        max_batch_size: int = 1,
+        prefix_cache_bytes: int = 0,
+        capability_cache: str | None = None,
+        reprobe: bool = False,
+    ) -> None:
         self.model_id = model_id
         self.model_path = model_path
 
@@ -33,99 +184,116 @@ class MLXEngine(LLMEngine):
         path = model_path or model_id
         self._model, self._tokenizer = load(path)
 
-        # Cached supported kwargs for this environment.
-        self._supported: set[str] | None = None
-        self._temp_kw: str | None = None
+        # Which sampling kwargs this mlx-lm build takes, from its signatures
+        # (persisted per mlx-lm version and model path).
+        self._model_key = path
+        self._capability_cache = capability_cache
+        self.capabilities, cached = load_capabilities(path, cache_path=capability_cache, force=reprobe)
+        print(f"[mlx] capabilities={self.capabilities}{' (cached)' if cached else ''}")
+
+        self._prefix_cache: PrefixCache | None = None
+        self._prompt_cache_trimmable = False
+        if prefix_cache_bytes > 0:
+            from mlx_lm.models.cache import can_trim_prompt_cache, make_prompt_cache  # type: ignore
+
+            self._prefix_cache = PrefixCache(max_bytes=prefix_cache_bytes)
+            self._prompt_cache_trimmable = bool(can_trim_prompt_cache(make_prompt_cache(self._model)))
+
+        self._model_lock = threading.Lock()
+        self._scheduler: BatchScheduler | None = None
+        self._batch_sampling = False
+        if max_batch_size > 1:
+            batch_model = _MLXBatchModel(self._model, self._tokenizer, self._model_lock)
+            self._batch_sampling = batch_model.per_request_sampling
+            if not self._batch_sampling:
+                print("[mlx] BatchGenerator takes no per-request samplers; sampled requests run unbatched")
+            self._scheduler = BatchScheduler(batch_model, max_batch_size=max_batch_size, name=model_id)
+
+    def reprobe(self) -> MLXCapabilities:
+        """Detect the sampling kwargs again, bypassing (and refreshing) the on-disk cache."""
+        self.capabilities, _ = load_capabilities(self._model_key, cache_path=self._capability_cache, force=True)
+        print(f"[mlx] capabilities={self.capabilities} (re-probed)")
+        return self.capabilities
+
+    def _batched(self, params: GenerationParams) -> bool:
+        # Without per-request samplers the batch decodes greedily, which only
+        # matches what the request asked for at temperature 0.
+        return self._scheduler is not None and (self._batch_sampling or params.temperature <= 0)
 
-    def _probe_supported_kwargs(self) -> None:
-        """Probe which kwargs are accepted by the internal generate_step.
+    def _mlx_lm_kwargs(self, params: GenerationParams) -> dict:
+        return self.capabilities.generation_kwargs(params.temperature, params.top_p)
 
-        We do one tiny generation (max_tokens=1) with different kwargs.
-        On unexpected keyword errors, we drop that key.
-        """
-        if self._supported is not None:
-            return
+    def _responses(self, prompt: str, params: GenerationParams) -> Iterable:
+        """Run `mlx_lm.stream_generate`, reusing cached KV state for known prompt prefixes."""
+        with self._model_lock:
+            yield from self._locked_responses(prompt, params)
 
+    def _locked_responses(self, prompt: str, params: GenerationParams) -> Iterable:
         from mlx_lm import stream_generate  # type: ignore
 
-        supported = {"temp", "temperature", "top_p"}
-
-        # Use a tiny prompt and minimal generation.
-        prompt = "hello"
-
-        # We'll try multiple times, dropping keys that fail.
-        def _try(kwargs: dict) -> Exception | None:
-            try:
-                it = stream_generate(
-                    self._model,
-                    self._tokenizer,
-                    prompt,
-                    max_tokens=1,
-                    **kwargs,
-                )
-                next(iter(it))
-                return None
-            except Exception as e:
-                return e
-
-        # First, try all.
-        kwargs = {"temp": 0.0, "temperature": 0.0, "top_p": 1.0}
-        err = _try({k: v for k, v in kwargs.items() if k in supported})
-        if err is not None:
-            msg = str(err)
-            # Repeatedly remove the offending key if it's an unexpected keyword.
-            while "unexpected keyword argument" in msg:
-                # Extract key name between quotes if possible.
-                bad = None
-                for key in list(supported):
-                    if f"'{key}'" in msg or f'"{key}"' in msg:
-                        bad = key
-                        break
-                if bad is None:
-                    break
-                supported.discard(bad)
-                err = _try({k: v for k, v in kwargs.items() if k in supported})
-                if err is None:
-                    break
-                msg = str(err)
-
-        # Decide temp kw preference.
-        if "temperature" in supported:
-            temp_kw = "temperature"
-        elif "temp" in supported:
-            temp_kw = "temp"
-        else:
-            temp_kw = None
-
-        self._supported = supported
-        self._temp_kw = temp_kw
-
-        print(f"[mlx] supported_kwargs={sorted(supported)} temp_kw={temp_kw}")
-
-    def _mlx_lm_kwargs(self, params: GenerationParams) -> dict:
-        self._probe_supported_kwargs()
-
-        kwargs: dict = {}
-        assert self._supported is not None
-
-        if self._temp_kw is not None and self._temp_kw in self._supported:
-            kwargs[self._temp_kw] = float(params.temperature)
-        if "top_p" in self._supported:
-            kwargs["top_p"] = float(params.top_p)
+        kwargs = self._mlx_lm_kwargs(params)
+        if self._prefix_cache is None:
+            responses = stream_generate(
+                self._model, self._tokenizer, prompt, max_tokens=int(params.max_tokens), **kwargs
+            )
+            for resp in timed_iter(responses, "prefill", "decode"):
+                check_cancelled(params.cancel)
+                yield resp
+            return
 
-        return kwargs
+        with span("prefix-cache"):
+            tokens = _encode_prompt(self._tokenizer, prompt)
+            prompt_cache, reused = self._fetch_prompt_cache(tokens)
+        fed = list(tokens)
+        responses = stream_generate(
+            self._model,
+            self._tokenizer,
+            tokens[reused:],
+            max_tokens=int(params.max_tokens),
+            prompt_cache=prompt_cache,
+            **kwargs,
+        )
+        for resp in timed_iter(responses, "prefill", "decode"):
+            check_cancelled(params.cancel)
+            token = getattr(resp, "token", None)
+            if token is not None:
+                fed.append(int(token))
+            yield resp
+        with span("prefix-cache"):
+            self._store_prompt_cache(fed, prompt_cache)
+
+    def _fetch_prompt_cache(self, tokens: list[int]) -> tuple[list, int]:
+        """Return (prompt_cache, reused_tokens); at least one prompt token is always left to prefill."""
+        from mlx_lm.models.cache import make_prompt_cache  # type: ignore
+
+        assert self._prefix_cache is not None
+        match = self._prefix_cache.lookup(tokens[:-1], allow_partial=self._prompt_cache_trimmable)
+        if match is None:
+            return make_prompt_cache(self._model), 0
+
+        return _fork_prompt_cache(match.value, match.matched), match.matched
+
+    def _store_prompt_cache(self, fed: list[int], prompt_cache: list) -> None:
+        from mlx_lm.models.cache import trim_prompt_cache  # type: ignore
+
+        assert self._prefix_cache is not None
+        offset = getattr(prompt_cache[0], "offset", None) if prompt_cache else None
+        if not isinstance(offset, int):
+            return
+        # The decode loop may run one step ahead of the tokens it reported.
+        n = min(offset, len(fed))
+        if offset > n:
+            if not self._prompt_cache_trimmable:
+                return
+            trim_prompt_cache(prompt_cache, offset - n)
+        self._prefix_cache.insert(fed[:n], prompt_cache, _prompt_cache_nbytes(prompt_cache))
 
     def generate(self, prompt: str, params: GenerationParams) -> str:
-        from mlx_lm import stream_generate  # type: ignore
+        if self._batched(params):
+            return "".join(timed_iter(self._scheduler.submit(prompt, params), "prefill", "decode"))
 
         pieces: list[str] = []
-        for resp in stream_generate(
-            self._model,
-            self._tokenizer,
-            prompt,
-            max_tokens=int(params.max_tokens),
-            **self._mlx_lm_kwargs(params),
-        ):
+        for resp in self._responses(prompt, params):
             text = getattr(resp, "text", None)
             if text is None:
                 text = str(resp)
@@ -133,21 +301,39 @@ class MLXEngine(LLMEngine):
         return "".join(pieces)
 
     def stream_generate(self, prompt: str, params: GenerationParams) -> Iterable[str]:
-        from mlx_lm import stream_generate  # type: ignore
+        if self._batched(params):
+            yield from timed_iter(self._scheduler.submit(prompt, params), "prefill", "decode")
+            return
 
-        for resp in stream_generate(
-            self._model,
-            self._tokenizer,
-            prompt,
-            max_tokens=int(params.max_tokens),
-            **self._mlx_lm_kwargs(params),
-        ):
+        for resp in self._responses(prompt, params):
             text = getattr(resp, "text", None)
             if text is None:
                 yield str(resp)
             else:
                 yield str(text)
 
+    def stats(self) -> dict:
+        out: dict = {"sampling_kwargs": list(self.capabilities.kwargs)}
+        if self._prefix_cache is not None:
+            out["prefix_cache"] = self._prefix_cache.stats()
+        if self._scheduler is not None:
+            out["batch"] = {"active": self._scheduler.active, "queued": self._scheduler.queued}
+        return out
+
+    def memory_bytes(self) -> int:
+        cached = self._prefix_cache.stats()["bytes"] if self._prefix_cache is not None else 0
+        return mlx_parameter_nbytes(self._model) + int(cached)
+
+    def close(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.close()
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer.encode(text, add_special_tokens=False))
+
+    def count_chat_tokens(self, messages: Sequence[ChatMessageLike]) -> int:
+        return len(_encode_prompt(self._tokenizer, self._render_chat(messages)))
+
     @staticmethod
     def _render_fallback_chat(messages: Sequence[ChatMessageLike]) -> str:
         parts: list[str] = []
@@ -158,6 +344,7 @@ class MLXEngine(LLMEngine):
         parts.append("assistant:")
         return "\n".join(parts)
 
+    @span("render")
     def _render_chat(self, messages: Sequence[ChatMessageLike]) -> str:
         tok = self._tokenizer
         # Many HF tokenizers expose apply_chat_template.
@@ -177,9 +364,8 @@ class MLXEngine(LLMEngine):
             generated = generated[len(prompt) :]
 
         # 2) If the model starts repeating the conversation, cut when a new user/system turn appears.
-        cut_markers = ["\nuser:", "\nsystem:", "\nUser:", "\nSystem:"]
         cut_at = None
-        for m in cut_markers:
+        for m in CUT_MARKERS:
             idx = generated.find(m)
             if idx != -1:
                 cut_at = idx if cut_at is None else min(cut_at, idx)
@@ -191,19 +377,23 @@ class MLXEngine(LLMEngine):
     def generate_chat(self, messages: Sequence[ChatMessageLike], params: GenerationParams) -> str:
         prompt = self._render_chat(messages)
         text = self.generate(prompt, params)
-        return self._post_process(prompt, text)
+        with span("post-process"):
+            return self._post_process(prompt, text)
 
     def stream_generate_chat(
         self, messages: Sequence[ChatMessageLike], params: GenerationParams
     ) -> Iterable[str]:
-        # We produce incremental chunks after post-processing by keeping a rolling buffer.
+        # Post-process incrementally: only text that can no longer be an echoed
+        # prompt or the start of a cut marker is held back.
         prompt = self._render_chat(messages)
-        buf = ""
-        emitted = 0
+        filt = ChatStreamFilter(prompt)
         for chunk in self.stream_generate(prompt, params):
-            buf += chunk
-            processed = self._post_process(prompt, buf)
-            if len(processed) > emitted:
-                yield processed[emitted:]
-                emitted = len(processed)
-
+            out = filt.feed(chunk)
+            if out:
+                yield out
+            if filt.done:
+                # A new user/system turn started; the rest would be dropped anyway.
+                break
+        tail = filt.flush()
+        if tail:
+            yield tail
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import dataclasses
+import multiprocessing
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from .cancellation import check_cancelled
+from .serial import exclusive, serialized_iter
+from .tts_base import TTSParams, TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+from app.utils.text_segment import split_sentences
+from app.utils.timing import span
+
+# Engine built once per worker process (process mode).
+_worker_engine: TTSEngine | None = None
+
+
+def _init_worker(factory: Callable[[], TTSEngine]) -> None:
+    global _worker_engine
+    _worker_engine = factory()
+
+
+def _synthesize_in_worker(text: str, params: TTSParams, kwargs: dict) -> AudioBuffer:
+    assert _worker_engine is not None
+    return _worker_engine.synthesize_audio(text, params, **kwargs)
+
+
+class ParallelTTSEngine(TTSEngine):
+    """Synthesize long inputs sentence by sentence on a pool, then stitch the audio.
+
+    Inputs shorter than `min_chars` (or a single sentence) go straight to the
+    wrapped engine. Longer ones are split with `split_sentences`, every
+    sentence is synthesized concurrently, and the PCM is joined in order with
+    `crossfade_ms` crossfades, so wall time approaches that of the slowest
+    sentence rather than the sum.
+
+    `mode="thread"` shares `engine` between threads, so it needs an engine
+    that is `thread_safe` (e.g. Piper's ONNX Runtime session, or a
+    subprocess); `mode="process"` builds one engine per worker process from
+    the picklable `factory`.
+    """
+
+    # Threads only share a thread-safe engine; calls that go straight to an
+    # engine that is not (process mode) are serialized here.
+    thread_safe = True
+
+    def __init__(
+        self,
+        engine: TTSEngine,
+        *,
+        workers: int,
+        mode: str = "thread",
+        factory: Callable[[], TTSEngine] | None = None,
+        min_chars: int = 200,
+        crossfade_ms: float = 10.0,
+    ) -> None:
+        self.engine = engine
+        self.model_id = engine.model_id
+        self.mode = mode
+        self.min_chars = int(min_chars)
+        self.crossfade_ms = float(crossfade_ms)
+        self.workers = max(1, int(workers))
+
+        self._pool: Executor
+        if mode == "thread" and not engine.thread_safe:
+            raise ValueError(f"ParallelTTSEngine(mode='thread') needs a thread-safe engine, {engine.model_id} is not")
+        if mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"tts-{engine.model_id}")
+        elif mode == "process":
+            if factory is None:
+                raise ValueError("ParallelTTSEngine(mode='process') requires a picklable engine factory")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(factory,),
+            )
+        else:
+            raise ValueError(f"Unknown parallel TTS mode: {mode!r} (expected 'thread' or 'process')")
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def memory_bytes(self) -> int:
+        # Process mode loads one more copy of the model per worker.
+        copies = 1 + (self.workers if self.mode == "process" else 0)
+        return self.engine.memory_bytes() * copies
+
+    def stats(self) -> dict:
+        return {**self.engine.stats(), "parallel": {"mode": self.mode, "workers": self.workers}}
+
+    def _segments(self, text: str) -> list[str]:
+        if len(text) < self.min_chars:
+            return []
+        segments = split_sentences(text)
+        return segments if len(segments) > 1 else []
+
+    def _submit(self, segment: str, params: TTSParams, kwargs: dict) -> Future[AudioBuffer]:
+        if self.mode == "process":
+            # The cancel token can't cross processes; it is checked here instead.
+            return self._pool.submit(_synthesize_in_worker, segment, dataclasses.replace(params, cancel=None), kwargs)
+        return self._pool.submit(self.engine.synthesize_audio, segment, params, **kwargs)
+
+    def _audio_segments(self, segments: list[str], params: TTSParams, kwargs: dict) -> Iterator[AudioBuffer]:
+        """Yield each segment's audio, in order, while later ones are still running."""
+        futures = [self._submit(s, params, kwargs) for s in segments]
+        try:
+            for fut in futures:
+                while True:
+                    check_cancelled(params.cancel)
+                    try:
+                        audio = fut.result(timeout=0.05)
+                        break
+                    except TimeoutError:
+                        continue
+                yield audio
+        finally:
+            for fut in futures:
+                fut.cancel()
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        segments = self._segments(text)
+        if not segments:
+            with exclusive(self.engine, params.cancel):
+                return self.engine.synthesize_audio(text, params, **kwargs)
+
+        with span("tts-parallel"):
+            parts = list(self._audio_segments(segments, params, kwargs))
+        with span("tts-stitch"):
+            return AudioBuffer.concat(parts, crossfade_ms=self.crossfade_ms)
+
+    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
+        if not self._segments(text) or (format or "wav").lower() != "wav":
+            with exclusive(self.engine, params.cancel):
+                return self.engine.synthesize(text, params, format=format, **kwargs)
+        return self.synthesize_audio(text, params, **kwargs).encode("wav")
+
+    def stream_synthesize(self, text: str, params: TTSParams, **kwargs) -> Iterator[AudioBuffer]:
+        segments = self._segments(text)
+        if not segments:
+            stream = serialized_iter(self.engine, self.engine.stream_synthesize, params.cancel)
+            yield from stream(text, params, **kwargs)
+            return
+        # Everything is queued at once; each sentence is sent as soon as it and
+        # all sentences before it are done.
+        yield from self._audio_segments(segments, params, kwargs)
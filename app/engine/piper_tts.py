@@ -1,8 +1,89 @@
 from __future__ import annotations
 
+import functools
+import threading
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
 from pathlib import Path
+from typing import Any, TypeVar
 
+from .cancellation import check_cancelled
 from .tts_base import TTSParams, TTSEngine
+from ..utils.audio_buffer import AudioBuffer
+from ..utils.text_segment import split_sentences
+from ..utils.timing import span
+
+
+T = TypeVar("T")
+
+# espeak-ng, which Piper phonemizes with, keeps process-wide state.
+_PHONEMIZE_LOCK = threading.RLock()
+
+
+def _normalize_sentence(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _nbytes(audio: AudioBuffer) -> int:
+    return audio.samples.itemsize * len(audio.samples)
+
+
+class _SegmentMemo:
+    """Small thread-safe LRU of synthesized sentences, bounded by their PCM size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._entries: OrderedDict[tuple, AudioBuffer] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> AudioBuffer | None:
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key: tuple, audio: AudioBuffer) -> None:
+        size = _nbytes(audio)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= _nbytes(old)
+            self._entries[key] = audio
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= _nbytes(evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _locked(fn: Callable[..., T]) -> Callable[..., T]:
+    @functools.wraps(fn)
+    def call(*args: Any, **kwargs: Any) -> T:
+        with _PHONEMIZE_LOCK:
+            return fn(*args, **kwargs)
+
+    return call
 
 
 class PiperTTSEngine(TTSEngine):
@@ -12,11 +93,31 @@ class PiperTTSEngine(TTSEngine):
     - a `.onnx` model file, or
     - a directory containing exactly one `.onnx` model
 
-    Piper outputs raw audio; we wrap it into a WAV container.
+    Piper outputs raw int16 samples, returned as an `AudioBuffer`.
+
+    With `segment_cache_bytes > 0` text is synthesized sentence by sentence and
+    each sentence's audio is memoized (LRU, keyed by the normalized sentence,
+    voice, speaker and speed), so greetings, disclaimers and other recurring
+    sentences are only phonemized and run through ONNX once, whatever text
+    they appear in.
+
+    Concurrent calls share the ONNX Runtime session, which is thread-safe;
+    only phonemization takes a (process-wide) lock.
     """
 
-    def __init__(self, model_id: str, model_path: str) -> None:
+    thread_safe = True
+
+    def __init__(
+        self,
+        model_id: str,
+        model_path: str,
+        *,
+        segment_cache_bytes: int = 0,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+    ) -> None:
         self.model_id = model_id
+        self._segment_cache = _SegmentMemo(segment_cache_bytes) if segment_cache_bytes > 0 else None
 
         self._model_file = self._resolve_model_file(model_path)
 
@@ -24,6 +125,26 @@ class PiperTTSEngine(TTSEngine):
         from piper.voice import PiperVoice  # type: ignore
 
         self._voice = PiperVoice.load(str(self._model_file))
+        phonemize = getattr(self._voice, "phonemize", None)
+        if callable(phonemize):
+            # `PiperVoice.synthesize` phonemizes through this attribute too.
+            self._voice.phonemize = _locked(phonemize)
+        if intra_op_threads > 0 or inter_op_threads > 0:
+            self._tune_session(intra_op_threads, inter_op_threads)
+
+    def _tune_session(self, intra_op_threads: int, inter_op_threads: int) -> None:
+        """Rebuild the voice's ONNX Runtime session with explicit thread counts (0 = ORT default)."""
+        import onnxruntime  # type: ignore
+
+        opts = onnxruntime.SessionOptions()
+        if intra_op_threads > 0:
+            opts.intra_op_num_threads = int(intra_op_threads)
+        if inter_op_threads > 0:
+            opts.inter_op_num_threads = int(inter_op_threads)
+        providers = self._voice.session.get_providers()
+        self._voice.session = onnxruntime.InferenceSession(
+            str(self._model_file), sess_options=opts, providers=providers
+        )
 
     @staticmethod
     def _resolve_model_file(model_path: str) -> Path:
@@ -46,49 +167,103 @@ class PiperTTSEngine(TTSEngine):
             )
         return onnx[0]
 
+    def _iter_chunks(self, text: str, params: TTSParams) -> Iterator[AudioBuffer]:
+        """Yield audio as Piper produces it (about one chunk per sentence)."""
+        # The API differs slightly across piper versions; handle both.
+        if not hasattr(self._voice, "synthesize"):
+            raise RuntimeError("Unsupported piper-tts version: PiperVoice has no synthesize()")
+
+        syn_config = self._syn_config(params)
+        if syn_config is not None:
+            out = self._voice.synthesize(text, syn_config)  # type: ignore[attr-defined]
+        else:
+            out = self._voice.synthesize(text)  # type: ignore[attr-defined]
+        # Possible outputs:
+        # - tuple[list[int], int]
+        # - generator yielding tuple[list[int], int]
+        # - generator yielding `AudioChunk`s (piper-tts >= 1.3)
+        if isinstance(out, tuple) and len(out) == 2:
+            chunk, sr = out
+            yield AudioBuffer.from_samples(chunk, sr)
+        else:
+            for chunk in out:
+                check_cancelled(params.cancel)
+                if hasattr(chunk, "audio_int16_bytes"):
+                    yield AudioBuffer.from_pcm16(chunk.audio_int16_bytes, chunk.sample_rate)
+                else:
+                    samples, sr = chunk
+                    yield AudioBuffer.from_samples(samples, sr)
+
+    def memory_bytes(self) -> int:
+        # The ONNX weights dominate; ONNX Runtime holds roughly one copy of them.
+        cached = self._segment_cache.stats()["bytes"] if self._segment_cache is not None else 0
+        return self._model_file.stat().st_size + int(cached)
+
+    def stats(self) -> dict:
+        return {"segment_cache": self._segment_cache.stats()} if self._segment_cache is not None else {}
+
+    @property
+    def _sample_rate(self) -> int:
+        return int(self._voice.config.sample_rate)
+
+    def _length_scale(self, params: TTSParams) -> float | None:
+        if params.speed and params.speed != 1.0:
+            return float(getattr(self._voice.config, "length_scale", 1.0)) / params.speed
+        return None
+
+    def _syn_config(self, params: TTSParams):
+        """piper-tts >= 1.3 `SynthesisConfig` for `params`, or None on older versions."""
+        if not hasattr(self._voice, "phoneme_ids_to_audio"):
+            return None
+        from piper import SynthesisConfig  # type: ignore
+
+        return SynthesisConfig(speaker_id=params.speaker_id, length_scale=self._length_scale(params))
+
+    def _iter_segments(self, text: str, params: TTSParams) -> Iterator[AudioBuffer]:
+        """Audio per sentence, from the memo where possible (copies, so callers may modify them)."""
+        assert self._segment_cache is not None
+        for sentence in split_sentences(text):
+            check_cancelled(params.cancel)
+            key = (_normalize_sentence(sentence), params.voice, params.speaker_id, float(params.speed))
+            audio = self._segment_cache.get(key)
+            if audio is None:
+                # Piper's own pipeline (phonemize, ONNX, normalize, int16), one sentence at a time.
+                with span("tts-generate"):
+                    audio = self._join(self._iter_chunks(sentence, params))
+                self._segment_cache.put(key, audio)
+            if len(audio):
+                yield audio.copy()
+
     @staticmethod
-    def _wav_bytes(samples: list[int], sample_rate: int) -> bytes:
-        """Build a minimal PCM16 mono WAV file."""
-        import io
-        import wave
-        import struct
-
-        buf = io.BytesIO()
-        with wave.open(buf, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # int16
-            wf.setframerate(int(sample_rate))
-            wf.writeframes(struct.pack("<" + "h" * len(samples), *samples))
-        return buf.getvalue()
+    def _join(chunks: Iterator[AudioBuffer]) -> AudioBuffer:
+        audio: AudioBuffer | None = None
+        for chunk in chunks:
+            if audio is None:
+                audio = chunk
+            else:
+                audio.extend(chunk)
+        if audio is None:
+            raise RuntimeError("Piper returned no audio")
+        return audio
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        if self._segment_cache is not None:
+            return self._join(self._iter_segments(text, params))
+        with span("tts-generate"):
+            return self._join(self._iter_chunks(text, params))
 
     def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
         fmt = (format or "wav").lower()
         if fmt != "wav":
             raise ValueError("PiperTTSEngine currently supports only 'wav' output")
 
-        # PiperVoice.synthesize yields chunks of (audio, sample_rate) depending on version.
-        # We collect to a single list of int16.
-        samples: list[int] = []
-        sample_rate: int | None = None
+        audio = self.synthesize_audio(text, params, **kwargs)
+        with span("tts-encode"):
+            return audio.encode("wav")
 
-        # The API differs slightly across piper versions; handle both.
-        if hasattr(self._voice, "synthesize"):
-            out = self._voice.synthesize(text)  # type: ignore[attr-defined]
-            # Possible outputs:
-            # - tuple[list[int], int]
-            # - generator yielding tuple[list[int], int]
-            if isinstance(out, tuple) and len(out) == 2:
-                chunk, sr = out
-                samples.extend(list(chunk))
-                sample_rate = int(sr)
-            else:
-                for chunk, sr in out:  # type: ignore[assignment]
-                    samples.extend(list(chunk))
-                    sample_rate = int(sr)
+    def stream_synthesize(self, text: str, params: TTSParams, **kwargs) -> Iterator[AudioBuffer]:
+        # Piper already synthesizes sentence by sentence; pass its chunks straight on.
+        if self._segment_cache is not None:
+            yield from self._iter_segments(text, params)
         else:
-            raise RuntimeError("Unsupported piper-tts version: PiperVoice has no synthesize()")
-
-        if sample_rate is None:
-            raise RuntimeError("Piper returned no audio")
-
-        return self._wav_bytes(samples, sample_rate)
+            yield from self._iter_chunks(text, params)
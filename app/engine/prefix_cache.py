@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Generic, Sequence, TypeVar
+
+V = TypeVar("V")
+
+
+@dataclass
+class PrefixMatch(Generic[V]):
+    """Result of `PrefixCache.lookup`.
+
+    `tokens` is the full key the value was stored under and `matched` the
+    number of leading tokens it shares with the query. When `matched` is shorter
+    than `tokens` the caller has to trim the state back to `matched` tokens.
+    """
+
+    value: V
+    tokens: tuple[int, ...]
+    matched: int
+
+
+@dataclass(eq=False)
+class _Node:
+    edge: tuple[int, ...] = ()
+    parent: _Node | None = None
+    children: dict[int, _Node] = field(default_factory=dict)
+    value: Any = None
+    nbytes: int = 0
+    has_value: bool = False
+
+    def key(self) -> tuple[int, ...]:
+        parts: list[tuple[int, ...]] = []
+        node: _Node | None = self
+        while node is not None:
+            parts.append(node.edge)
+            node = node.parent
+        return tuple(t for edge in reversed(parts) for t in edge)
+
+
+class PrefixCache(Generic[V]):
+    """Radix tree over token-id sequences holding reusable prompt state (e.g. KV caches).
+
+    Values are evicted least-recently-used first once the sum of their reported
+    sizes exceeds `max_bytes`. All operations are thread-safe.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._root = _Node()
+        self._lru: OrderedDict[_Node, None] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reused_tokens = 0
+        self.lookup_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def insert(self, tokens: Sequence[int], value: V, nbytes: int) -> None:
+        key = tuple(tokens)
+        if not key or nbytes > self.max_bytes:
+            return
+        with self._lock:
+            node = self._root
+            i = 0
+            while i < len(key):
+                child = node.children.get(key[i])
+                if child is None:
+                    child = _Node(edge=key[i:], parent=node)
+                    node.children[key[i]] = child
+                    node = child
+                    break
+                m = _common_len(child.edge, key, i)
+                if m < len(child.edge):
+                    child = self._split(child, m)
+                node = child
+                i += m
+
+            if node.has_value:
+                self._bytes -= node.nbytes
+            node.value, node.nbytes, node.has_value = value, int(nbytes), True
+            self._bytes += node.nbytes
+            self._lru[node] = None
+            self._lru.move_to_end(node)
+            self._evict()
+
+    def lookup(self, tokens: Sequence[int], *, allow_partial: bool = True) -> PrefixMatch[V] | None:
+        """Find the stored state sharing the longest prefix with `tokens`.
+
+        With `allow_partial=False` only values whose whole key is a prefix of
+        `tokens` qualify (for state that cannot be trimmed).
+        """
+        key = tuple(tokens)
+        with self._lock:
+            self.lookup_tokens += len(key)
+            node = self._root
+            depth = 0
+            best: _Node | None = None
+            best_depth = 0
+            diverged: _Node | None = None
+            while depth < len(key):
+                child = node.children.get(key[depth])
+                if child is None:
+                    break
+                m = _common_len(child.edge, key, depth)
+                if m < len(child.edge):
+                    diverged = child
+                    depth += m
+                    break
+                node = child
+                depth += m
+                if node.has_value:
+                    best, best_depth = node, depth
+
+            if allow_partial:
+                # Anything below the point where the query stops matching shares `depth` tokens.
+                below = _first_value(diverged) if diverged is not None else None
+                if below is None and best is not node:
+                    below = _first_value(node)
+                if below is not None and depth > best_depth:
+                    best, best_depth = below, depth
+
+            if best is None or best_depth == 0:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.reused_tokens += best_depth
+            self._lru.move_to_end(best)
+            return PrefixMatch(value=best.value, tokens=best.key(), matched=best_depth)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._root = _Node()
+            self._lru.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "reused_tokens": self.reused_tokens,
+            "lookup_tokens": self.lookup_tokens,
+            "evictions": self.evictions,
+        }
+
+    def _split(self, node: _Node, at: int) -> _Node:
+        """Split `node`'s edge after `at` tokens; return the new upper node."""
+        assert node.parent is not None
+        upper = _Node(edge=node.edge[:at], parent=node.parent)
+        node.parent.children[upper.edge[0]] = upper
+        node.edge = node.edge[at:]
+        node.parent = upper
+        upper.children[node.edge[0]] = node
+        return upper
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._lru:
+            node, _ = self._lru.popitem(last=False)
+            self._bytes -= node.nbytes
+            node.value, node.nbytes, node.has_value = None, 0, False
+            self.evictions += 1
+            self._prune(node)
+
+    def _prune(self, node: _Node) -> None:
+        while node.parent is not None and not node.has_value:
+            if not node.children:
+                del node.parent.children[node.edge[0]]
+                node = node.parent
+                continue
+            if len(node.children) == 1:
+                # Merge the lone child into this node to keep the tree compact.
+                (child,) = node.children.values()
+                child.edge = node.edge + child.edge
+                child.parent = node.parent
+                node.parent.children[child.edge[0]] = child
+            break
+
+
+def _common_len(edge: tuple[int, ...], key: tuple[int, ...], offset: int) -> int:
+    n = min(len(edge), len(key) - offset)
+    i = 0
+    while i < n and edge[i] == key[offset + i]:
+        i += 1
+    return i
+
+
+def _first_value(node: _Node) -> _Node | None:
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n.has_value:
+            return n
+        stack.extend(n.children.values())
+    return None
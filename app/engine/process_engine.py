@@ -0,0 +1,518 @@
+from __future__ import annotations
+
+import dataclasses
+import multiprocessing
+import pickle
+import queue
+import threading
+import time
+from array import array
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from multiprocessing.connection import Connection, wait
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from .base import LLMEngine
+from .cancellation import CancelToken, GenerationCancelled, check_cancelled
+from .serial import serialized, serialized_iter
+from .tts_base import TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+
+# Methods a worker will run; anything named `stream_*` is iterated item by item.
+_METHODS = {
+    "chat": {
+        "generate",
+        "stream_generate",
+        "generate_chat",
+        "stream_generate_chat",
+        "count_tokens",
+        "count_chat_tokens",
+        "stats",
+        "memory_bytes",
+    },
+    "tts": {"synthesize", "synthesize_audio", "stream_synthesize", "stats", "memory_bytes"},
+}
+_MIN_SHM_BYTES = 1 << 20
+# The monitor prints at most one restart message per this many seconds.
+_LOG_INTERVAL = 30.0
+
+
+class EngineWorkerCrashed(RuntimeError):
+    """The worker process died during the call; it is restarted for the next one."""
+
+
+# --- worker process side ---------------------------------------------------
+
+
+class _SharedCancelToken(CancelToken):
+    """Worker-side token: cancelled when the parent raises the channel's flag (or the deadline passes)."""
+
+    def __init__(self, flag: Any, deadline: float | None) -> None:
+        super().__init__(deadline=deadline)
+        self._flag = flag
+
+    @property
+    def cancelled(self) -> bool:
+        if self._flag.value and not self._event.is_set():
+            self.cancel("cancelled by the server")
+        return super().cancelled
+
+
+def _with_cancel(args: tuple, cancel: CancelToken | None) -> tuple:
+    # GenerationParams / TTSParams carry the token; it can't be pickled across, so swap it.
+    return tuple(
+        dataclasses.replace(a, cancel=cancel) if dataclasses.is_dataclass(a) and hasattr(a, "cancel") else a
+        for a in args
+    )
+
+
+class _WorkerChannel:
+    def __init__(self, conn: Connection, flag: Any) -> None:
+        self.conn = conn
+        self.flag = flag
+        self.shm: SharedMemory | None = None
+
+    def send_value(self, value: Any) -> None:
+        if not isinstance(value, AudioBuffer):
+            self.conn.send(("value", value))
+            return
+        # PCM goes through the channel's shared-memory segment; the pipe only carries its shape.
+        data = memoryview(value.samples).cast("B")
+        if self.shm is None or self.shm.size < data.nbytes:
+            self.conn.send(("grow", data.nbytes))
+            op, name = self.conn.recv()
+            assert op == "shm"
+            if self.shm is not None:
+                self.shm.close()
+            self.shm = SharedMemory(name=name)
+        self.shm.buf[: data.nbytes] = data
+        self.conn.send(("audio", (data.nbytes, value.sample_rate, value.channels)))
+
+    def send_error(self, e: BaseException) -> None:
+        try:
+            # Some exceptions pickle but can't be rebuilt; check before the parent trips on it.
+            pickle.loads(pickle.dumps(e))
+        except Exception:
+            e = RuntimeError(f"{type(e).__name__}: {e}")
+        self.conn.send(("error", e))
+
+    def serve(self, engine: Any, methods: set[str], *, serialize: bool = True) -> None:
+        """Answer calls until the pipe closes.
+
+        With `serialize`, calls into an engine that is not `thread_safe` take
+        turns with the other channels (a stream keeps its turn until it ends);
+        the control channel's stats and token counts skip the line.
+        """
+        while True:
+            try:
+                msg = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            if msg[0] != "call":
+                continue
+            _, method, args, kwargs, deadline = msg
+            if method not in methods:
+                self.send_error(AttributeError(f"engine method {method!r} is not available"))
+                continue
+            cancel = _SharedCancelToken(self.flag, deadline)
+            args = _with_cancel(args, cancel)
+            stream = method.startswith("stream_")
+            fn = getattr(engine, method)
+            if serialize:
+                fn = (serialized_iter if stream else serialized)(engine, fn, cancel)
+            try:
+                result = fn(*args, **kwargs)
+                if stream:
+                    self._stream(iter(result))
+                else:
+                    self.send_value(result)
+            except (EOFError, OSError):
+                break
+            except BaseException as e:
+                self.send_error(e)
+        if self.shm is not None:
+            self.shm.close()
+
+    def _stream(self, it: Iterator) -> None:
+        # Compute one item ahead, hand it over on each "next": the parent's
+        # handling of item i overlaps the computation of item i+1.
+        sentinel = object()
+
+        def advance() -> Any:
+            try:
+                return next(it, sentinel)
+            except BaseException as e:  # noqa: BLE001
+                return e
+
+        pending = advance()
+        try:
+            while True:
+                op = self.conn.recv()[0]
+                if op == "close":
+                    self.conn.send(("closed", None))
+                    return
+                if pending is sentinel:
+                    self.conn.send(("end", None))
+                    return
+                if isinstance(pending, BaseException):
+                    self.send_error(pending)
+                    return
+                self.send_value(pending)
+                pending = advance()
+        finally:
+            close = getattr(it, "close", None)
+            if callable(close):
+                close()
+
+
+def _worker_main(kind: str, factory: Callable[[], Any], conns: list[Connection], flags: list[Any]) -> None:
+    try:
+        engine = factory()
+    except BaseException as e:
+        _WorkerChannel(conns[0], flags[0]).send_error(e)
+        return
+    conns[0].send(("ready", {"model_id": engine.model_id}))
+    # The last pipe is the parent's control channel.
+    threads = [
+        threading.Thread(
+            target=_WorkerChannel(c, f).serve,
+            args=(engine, _METHODS[kind]),
+            kwargs={"serialize": i < len(conns) - 1},
+            daemon=True,
+        )
+        for i, (c, f) in enumerate(zip(conns, flags))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+# --- server side -------------------------------------------------------------
+
+
+class _Channel:
+    """One request at a time to the worker: a pipe, a cancel flag and a shared-memory segment."""
+
+    def __init__(self, conn: Connection, flag: Any, generation: int) -> None:
+        self.conn = conn
+        self.flag = flag
+        self.generation = generation
+        self.shm: SharedMemory | None = None
+        self.calls = 0
+        # Set when the pipe may be out of step with the worker; never reused then.
+        self.broken = False
+
+    def _recv(self) -> tuple[str, Any]:
+        while True:
+            op, value = self.conn.recv()
+            if op != "grow":
+                return op, value
+            old = self.shm
+            self.shm = SharedMemory(create=True, size=max(int(value), 2 * (old.size if old else 0), _MIN_SHM_BYTES))
+            self.conn.send(("shm", self.shm.name))
+            if old is not None:
+                old.close()
+                old.unlink()
+
+    def reply(self) -> tuple[str, Any]:
+        """The next reply, with shared-memory audio copied out into an `AudioBuffer`."""
+        op, value = self._recv()
+        if op == "audio":
+            nbytes, sample_rate, channels = value
+            assert self.shm is not None
+            samples = array("h")
+            samples.frombytes(self.shm.buf[:nbytes])
+            return "value", AudioBuffer(samples, sample_rate, channels)
+        if op == "error":
+            raise value
+        return op, value
+
+    def close(self) -> None:
+        self.conn.close()
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def _cancel_of(args: tuple) -> CancelToken | None:
+    """The cancel token of the `GenerationParams` / `TTSParams` among `args`, if any."""
+    return next((getattr(a, "cancel", None) for a in args if getattr(a, "cancel", None) is not None), None)
+
+
+class _ProcessEngineMixin:
+    """Host an engine in a dedicated worker process and forward calls to it.
+
+    The engine is built in a `spawn`ed process from the picklable `factory`.
+    The parent keeps `channels` pipes to it (one call at a time each, served by
+    a thread in the worker, so `channels` calls run concurrently if the engine
+    is `thread_safe`, one at a time otherwise) plus one for stats and token
+    counts. Each pipe has a shared cancel flag and a
+    shared-memory segment for PCM, so audio is copied once into the segment and
+    once out of it instead of being pickled; text crosses the pipe pickled.
+    Streams are pulled item by item while the worker computes one ahead. If
+    the process dies, calls in flight fail with `EngineWorkerCrashed` and a new
+    worker is started in the background.
+    """
+
+    kind: str
+    thread_safe = True
+
+    def _start(self, factory: Callable[[], Any], *, channels: int, name: str) -> None:
+        self._factory = factory
+        self._n_channels = max(1, int(channels))
+        self._name = name
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._control_lock = threading.Lock()
+        self._closing = False
+        self._generation = 0
+        self.restarts = 0
+        self._logged_at = float("-inf")
+        self._suppressed = 0
+        self._spawn()
+        self._monitor = threading.Thread(target=self._watch, name=f"{name}-monitor", daemon=True)
+        self._monitor.start()
+
+    def _spawn(self) -> None:
+        # One extra pipe for quick calls (stats, token counts) that shouldn't queue behind requests.
+        pipes = [self._ctx.Pipe() for _ in range(self._n_channels + 1)]
+        flags = [self._ctx.RawValue("b", 0) for _ in range(self._n_channels + 1)]
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.kind, self._factory, [child for _, child in pipes], flags),
+            name=self._name,
+            daemon=True,
+        )
+        process.start()
+        for _, child in pipes:
+            child.close()
+        parents = [parent for parent, _ in pipes]
+
+        # Wait for the engine to load (or fail) in the worker.
+        ready = wait([parents[0], process.sentinel])
+        if parents[0] not in ready:
+            process.join()
+            raise RuntimeError(f"engine worker {self._name} exited during startup (code {process.exitcode})")
+        op, value = parents[0].recv()
+        if op == "error":
+            process.join(timeout=5)
+            for conn in parents:
+                conn.close()
+            raise value
+
+        self._generation += 1
+        self.model_id = value["model_id"]
+        self._process = process
+        channels = [_Channel(conn, flag, self._generation) for conn, flag in zip(parents, flags)]
+        self._control = channels.pop()
+        self._free: queue.Queue[_Channel] = queue.Queue()
+        for channel in channels:
+            self._free.put(channel)
+
+    def _watch(self) -> None:
+        failures = 0
+        while not self._closing:
+            process = self._process
+            wait([process.sentinel])
+            if self._closing:
+                return
+            process.join(timeout=1)
+            self._log(f"[process] engine worker {self._name} (pid {process.pid}) exited ({process.exitcode}); restarting")
+            while not self._closing:
+                try:
+                    with self._lock:
+                        self._drain()
+                        self._spawn()
+                    self.restarts += 1
+                    failures = 0
+                    break
+                except Exception as e:
+                    failures += 1
+                    self._log(f"[process] restarting {self._name} failed: {e}")
+                    time.sleep(min(30.0, 0.5 * 2**failures))
+
+    def _log(self, message: str) -> None:
+        # A worker that crashes on every start must not flood the log.
+        now = time.monotonic()
+        if now - self._logged_at < _LOG_INTERVAL:
+            self._suppressed += 1
+            return
+        if self._suppressed:
+            message += f" ({self._suppressed} similar messages suppressed)"
+        print(message)
+        self._logged_at = now
+        self._suppressed = 0
+
+    def _drain(self) -> None:
+        self._control.close()
+        while True:
+            try:
+                self._free.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @property
+    def pid(self) -> int | None:
+        return self._process.pid
+
+    @contextmanager
+    def _lease(self, cancel: CancelToken | None) -> Iterator[_Channel]:
+        while True:
+            if self._closing:
+                raise RuntimeError(f"engine worker {self._name} is closed")
+            check_cancelled(cancel)  # don't outwait the request's own deadline
+            try:
+                channel = self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if channel.generation == self._generation:
+                break
+            channel.close()  # from a worker that has since been replaced
+        try:
+            yield channel
+        except (EOFError, OSError, EngineWorkerCrashed):
+            channel.broken = True
+            raise
+        except BaseException as e:
+            # Engine errors, cancellation and early-closed streams (GeneratorExit)
+            # leave the pipe in step; anything else may have cut a reply short.
+            if not isinstance(e, (Exception, GeneratorExit)):
+                channel.broken = True
+            raise
+        finally:
+            if not channel.broken and channel.generation == self._generation and not self._closing:
+                self._free.put(channel)
+            else:
+                channel.close()
+
+    def _send_call(self, channel: _Channel, method: str, args: tuple, kwargs: dict) -> CancelToken | None:
+        cancel = _cancel_of(args)
+        channel.calls += 1
+        call = channel.calls
+        channel.flag.value = 0
+        if cancel is not None:
+            # Only this call's token may raise the flag, not a late one from an earlier call.
+            cancel.add_callback(lambda: call == channel.calls and setattr(channel.flag, "value", 1))
+        deadline = cancel.deadline if cancel is not None else None
+        channel.conn.send(("call", method, _with_cancel(args, None), kwargs, deadline))
+        return cancel
+
+    def _call_on(self, channel: _Channel, method: str, args: tuple, kwargs: dict) -> Any:
+        try:
+            cancel = self._send_call(channel, method, args, kwargs)
+            try:
+                return channel.reply()[1]
+            except GenerationCancelled:
+                check_cancelled(cancel)  # re-raise with the request's own reason
+                raise
+        except (EOFError, OSError) as e:
+            raise EngineWorkerCrashed(f"engine worker {self._name} died during {method}") from e
+
+    def _call(self, method: str, *args: Any, **kwargs: Any) -> Any:
+        with self._lease(_cancel_of(args)) as channel:
+            return self._call_on(channel, method, args, kwargs)
+
+    def _control_call(self, method: str, *args: Any) -> Any:
+        with self._control_lock:
+            return self._call_on(self._control, method, args, {})
+
+    def _stream(self, method: str, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        with self._lease(_cancel_of(args)) as channel:
+            done = False
+            try:
+                cancel = self._send_call(channel, method, args, kwargs)
+                while True:
+                    check_cancelled(cancel)
+                    channel.conn.send(("next",))
+                    try:
+                        op, value = channel.reply()
+                    except GenerationCancelled:
+                        done = True
+                        check_cancelled(cancel)
+                        raise
+                    except BaseException:
+                        done = True
+                        raise
+                    if op == "end":
+                        done = True
+                        return
+                    yield value
+            except (EOFError, OSError) as e:
+                done = True
+                raise EngineWorkerCrashed(f"engine worker {self._name} died during {method}") from e
+            finally:
+                if not done:
+                    # Stopped early: let the worker close its generator before reusing the channel.
+                    try:
+                        channel.conn.send(("close",))
+                        while channel.reply()[0] != "closed":
+                            pass
+                    except Exception:
+                        channel.broken = True
+
+    def memory_bytes(self) -> int:
+        return int(self._control_call("memory_bytes"))
+
+    def stats(self) -> dict:
+        process = {"pid": self.pid, "restarts": self.restarts}
+        try:
+            return {**self._control_call("stats"), "process": process}
+        except Exception as e:  # restarting; don't fail the caller (e.g. `GET /`)
+            return {"process": {**process, "error": str(e)}}
+
+    def close(self) -> None:
+        self._closing = True
+        with self._lock:
+            self._drain()
+        self._process.join(timeout=5)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=5)
+
+
+class ProcessLLMEngine(_ProcessEngineMixin, LLMEngine):
+    """`LLMEngine` whose model lives in a worker process (see `_ProcessEngineMixin`)."""
+
+    kind = "chat"
+
+    def __init__(self, factory: Callable[[], LLMEngine], *, channels: int = 4, name: str = "chat-worker") -> None:
+        self._start(factory, channels=channels, name=name)
+
+    def generate(self, prompt, params):  # noqa: ANN001
+        return self._call("generate", prompt, params)
+
+    def stream_generate(self, prompt, params):  # noqa: ANN001
+        return self._stream("stream_generate", prompt, params)
+
+    def generate_chat(self, messages, params):  # noqa: ANN001
+        return self._call("generate_chat", list(messages), params)
+
+    def stream_generate_chat(self, messages, params):  # noqa: ANN001
+        return self._stream("stream_generate_chat", list(messages), params)
+
+    def count_tokens(self, text: str) -> int:
+        return int(self._control_call("count_tokens", text))
+
+    def count_chat_tokens(self, messages) -> int:  # noqa: ANN001
+        return int(self._control_call("count_chat_tokens", list(messages)))
+
+
+class ProcessTTSEngine(_ProcessEngineMixin, TTSEngine):
+    """`TTSEngine` whose model lives in a worker process (see `_ProcessEngineMixin`)."""
+
+    kind = "tts"
+
+    def __init__(self, factory: Callable[[], TTSEngine], *, channels: int = 4, name: str = "tts-worker") -> None:
+        self._start(factory, channels=channels, name=name)
+
+    def synthesize(self, text, params, *, format: str = "wav", **kwargs) -> bytes:  # noqa: ANN001
+        return self._call("synthesize", text, params, format=format, **kwargs)
+
+    def synthesize_audio(self, text, params, **kwargs) -> AudioBuffer:  # noqa: ANN001
+        return self._call("synthesize_audio", text, params, **kwargs)
+
+    def stream_synthesize(self, text, params, **kwargs) -> Iterator[AudioBuffer]:  # noqa: ANN001
+        return self._stream("stream_synthesize", text, params, **kwargs)
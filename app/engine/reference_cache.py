@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+def reference_key(val: str | os.PathLike | bytes | bytearray, *, ref_text: str | None = None) -> Hashable:
+    """Cache key for a reference clip.
+
+    Raw audio bytes are keyed by their SHA-256; files by path, size and mtime
+    so a repeat hit needs no disk read at all. `ref_text` is part of the key
+    because prompt tokens derived from the clip depend on the transcript.
+    """
+    if isinstance(val, (bytes, bytearray)):
+        return ("sha256", hashlib.sha256(val).hexdigest(), ref_text)
+    path = os.path.realpath(os.fspath(val))
+    st = os.stat(path)
+    return ("file", path, st.st_size, st.st_mtime_ns, ref_text)
+
+
+class ReferenceAudioCache:
+    """LRU of decoded reference audio (and anything derived from it) for voice cloning.
+
+    Entries are evicted least-recently-used first once their reported sizes
+    exceed `max_bytes`. Thread-safe; a value is computed outside the lock, so
+    two concurrent misses on the same clip may both decode it.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = int(max_bytes)
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, n) = self._entries.popitem(last=False)
+                self._bytes -= n
+                self.evictions += 1
+
+    def get_or_load(self, key: Hashable, load: Callable[[], tuple[Any, int]]) -> Any:
+        """Cached value for `key`, else `load()` -> (value, nbytes) and remember it."""
+        value = self.get(key)
+        if value is None:
+            value, nbytes = load()
+            self.put(key, value, nbytes)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+
+from .serial import exclusive
+from .tts_base import TTSParams, TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+
+
+class ReplicaPoolTTSEngine(TTSEngine):
+    """Several independent copies of one TTS model behind a single model id.
+
+    A backend like Piper runs one ONNX session per engine, so concurrent
+    requests on one instance contend on it. The pool sends each call to the
+    replica with the fewest calls in flight (ties rotate), so `n` requests
+    run on `n` sessions. Give each replica fewer intra-op threads to favour
+    throughput, or more to favour latency per request. Replicas that are not
+    thread-safe still take one call at a time each.
+    """
+
+    thread_safe = True
+
+    def __init__(self, replicas: Sequence[TTSEngine]) -> None:
+        if not replicas:
+            raise ValueError("ReplicaPoolTTSEngine needs at least one replica")
+        self.replicas = list(replicas)
+        self.model_id = self.replicas[0].model_id
+        self._lock = threading.Lock()
+        self._in_flight = [0] * len(self.replicas)
+        self._requests = [0] * len(self.replicas)
+        self._next = 0
+
+    @contextmanager
+    def _lease(self) -> Iterator[TTSEngine]:
+        n = len(self.replicas)
+        with self._lock:
+            start = self._next
+            i = min(range(n), key=lambda j: (self._in_flight[j], (j - start) % n))
+            self._next = (i + 1) % n
+            self._in_flight[i] += 1
+            self._requests[i] += 1
+        try:
+            with exclusive(self.replicas[i]):
+                yield self.replicas[i]
+        finally:
+            with self._lock:
+                self._in_flight[i] -= 1
+
+    @property
+    def in_flight(self) -> list[int]:
+        return list(self._in_flight)
+
+    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
+        with self._lease() as engine:
+            return engine.synthesize(text, params, format=format, **kwargs)
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        with self._lease() as engine:
+            return engine.synthesize_audio(text, params, **kwargs)
+
+    def stream_synthesize(self, text: str, params: TTSParams, **kwargs) -> Iterator[AudioBuffer]:
+        # The replica stays leased until the stream is exhausted or closed.
+        with self._lease() as engine:
+            yield from engine.stream_synthesize(text, params, **kwargs)
+
+    def memory_bytes(self) -> int:
+        return sum(engine.memory_bytes() for engine in self.replicas)
+
+    def close(self) -> None:
+        for engine in self.replicas:
+            close = getattr(engine, "close", None)
+            if callable(close):
+                close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            load = list(zip(self._in_flight, self._requests))
+        return {
+            "replicas": [
+                {"in_flight": in_flight, "requests": requests, **engine.stats()}
+                for engine, (in_flight, requests) in zip(self.replicas, load)
+            ]
+        }
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import threading
+import weakref
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any, TypeVar
+
+from .cancellation import CancelToken, check_cancelled
+
+T = TypeVar("T")
+
+_locks: weakref.WeakKeyDictionary[Any, threading.Lock] = weakref.WeakKeyDictionary()
+_locks_guard = threading.Lock()
+
+
+def engine_lock(engine: Any) -> threading.Lock | None:
+    """The lock serializing calls into `engine`, or None if it needs none.
+
+    Engines declare `thread_safe = True` when concurrent calls on one instance
+    are fine (batching schedulers, subprocess pools, per-call sessions); for
+    the rest (one MLX model, one phonemizer) every caller shares a single lock
+    per instance, so requests on that model run one at a time.
+    """
+    if getattr(engine, "thread_safe", False):
+        return None
+    with _locks_guard:
+        lock = _locks.get(engine)
+        if lock is None:
+            lock = _locks[engine] = threading.Lock()
+    return lock
+
+
+@contextmanager
+def exclusive(engine: Any, cancel: CancelToken | None = None) -> Iterator[None]:
+    """Hold `engine_lock(engine)`; while waiting for it, give up once `cancel` fires."""
+    lock = engine_lock(engine)
+    if lock is None:
+        yield
+        return
+    while not lock.acquire(timeout=-1 if cancel is None else 0.05):
+        check_cancelled(cancel)
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+def serialized(engine: Any, fn: Callable[..., T], cancel: CancelToken | None = None) -> Callable[..., T]:
+    """`fn` (a method of `engine`) run under `exclusive(engine, cancel)`."""
+
+    def _call(*args: Any, **kwargs: Any) -> T:
+        with exclusive(engine, cancel):
+            return fn(*args, **kwargs)
+
+    return _call
+
+
+def serialized_iter(
+    engine: Any, fn: Callable[..., Iterable[T]], cancel: CancelToken | None = None
+) -> Callable[..., Iterator[T]]:
+    """Like `serialized`, for a streaming method: the lock is held until the stream ends or is closed."""
+
+    def _iterate(*args: Any, **kwargs: Any) -> Iterator[T]:
+        with exclusive(engine, cancel):
+            yield from fn(*args, **kwargs)
+
+    return _iterate
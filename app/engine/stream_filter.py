@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import re
+from collections import deque
+from collections.abc import Iterable
+
+# A new user/system turn in the generated text means the model started to
+# continue the conversation on its own; everything from there on is dropped.
+CUT_MARKERS: tuple[str, ...] = ("\nuser:", "\nsystem:", "\nUser:", "\nSystem:")
+
+
+class MarkerMatcher:
+    """Aho-Corasick automaton over a fixed set of string patterns.
+
+    Text is fed incrementally; the matcher tracks the longest suffix of the
+    text seen so far that is still a prefix of some pattern (`depth`), which is
+    exactly the part of the text that may not be released yet.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        pats = [p for p in patterns if p]
+        self._goto: list[dict[str, int]] = [{}]
+        self._depth: list[int] = [0]
+        self._out: list[int] = [0]  # longest pattern ending in this state (0 = none)
+        for p in pats:
+            s = 0
+            for ch in p:
+                nxt = self._goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[s][ch] = nxt
+                    self._goto.append({})
+                    self._depth.append(self._depth[s] + 1)
+                    self._out.append(0)
+                s = nxt
+            self._out[s] = max(self._out[s], len(p))
+
+        self._fail = [0] * len(self._goto)
+        order = deque(self._goto[0].values())
+        while order:
+            s = order.popleft()
+            for ch, nxt in self._goto[s].items():
+                order.append(nxt)
+                f = self._fail[s]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                cand = self._goto[f].get(ch, 0)
+                self._fail[nxt] = cand if cand != nxt else 0
+                self._out[nxt] = max(self._out[nxt], self._out[self._fail[nxt]])
+
+        self._first = re.compile("[" + re.escape("".join(sorted(set(self._goto[0])))) + "]") if pats else None
+        self.state = 0
+
+    @property
+    def depth(self) -> int:
+        return self._depth[self.state]
+
+    def step(self, ch: str) -> int:
+        """Advance by one character; return the length of the longest match ending here (0 if none)."""
+        s = self.state
+        while s and ch not in self._goto[s]:
+            s = self._fail[s]
+        s = self._goto[s].get(ch, 0)
+        self.state = s
+        return self._out[s]
+
+    def skip_to_candidate(self, text: str, pos: int) -> int:
+        """From the root state, return the next index in `text` that can start a match."""
+        if self._first is None:
+            return len(text)
+        m = self._first.search(text, pos)
+        return m.start() if m else len(text)
+
+
+class ChatStreamFilter:
+    """Incremental equivalent of `MLXEngine._post_process` for streamed output.
+
+    Concatenating everything returned by `feed` and `flush` yields exactly
+    `_post_process(prompt, full_text)`, but each character is inspected a
+    constant number of times. Text is held back only while it could still be
+    an echoed prompt or the beginning of a cut marker.
+    """
+
+    def __init__(self, prompt: str, markers: Iterable[str] = CUT_MARKERS) -> None:
+        self._prompt = prompt
+        self._echo_pos = 0
+        self._echo_held: list[str] | None = []  # None once the echo check is decided
+
+        self._matcher = MarkerMatcher(markers)
+        self._pending = ""  # text past the echo check that is not released yet
+        self._cut: int | None = None  # cut position inside `_pending`
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk: str) -> str:
+        if self.done or not chunk:
+            return ""
+        if self._echo_held is not None:
+            chunk = self._check_echo(chunk)
+            if not chunk:
+                return ""
+        return self._scan(chunk)
+
+    def flush(self) -> str:
+        out = ""
+        if self._echo_held is not None:
+            # Output ended while still looking like a (partial) prompt echo: no strip.
+            held = "".join(self._echo_held)
+            self._echo_held = None
+            out = self._scan(held) if held else ""
+        tail = self._pending if self._cut is None else self._pending[: self._cut]
+        self._pending = ""
+        self.done = True
+        return out + self._emit(tail)
+
+    def _check_echo(self, chunk: str) -> str:
+        assert self._echo_held is not None
+        remaining = len(self._prompt) - self._echo_pos
+        if len(chunk) >= remaining and chunk.startswith(self._prompt[self._echo_pos :]):
+            self._echo_held = None
+            return chunk[remaining:]
+        if len(chunk) < remaining and self._prompt.startswith(chunk, self._echo_pos):
+            self._echo_pos += len(chunk)
+            self._echo_held.append(chunk)
+            return ""
+        held = "".join(self._echo_held)
+        self._echo_held = None
+        return held + chunk
+
+    def _scan(self, chunk: str) -> str:
+        text = self._pending + chunk
+        m = self._matcher
+        i = len(self._pending)
+        n = len(text)
+        while i < n:
+            if m.state == 0 and self._cut is None:
+                i = m.skip_to_candidate(text, i)
+                if i >= n:
+                    break
+            matched = m.step(text[i])
+            if matched:
+                start = i + 1 - matched
+                if self._cut is None or start < self._cut:
+                    self._cut = start
+            i += 1
+            # Once cut, only keep scanning while an earlier-starting match could still complete.
+            if self._cut is not None and m.depth <= i - self._cut:
+                self._pending = ""
+                self.done = True
+                return self._emit(text[: self._cut])
+
+        if self._cut is not None:
+            self._pending = text
+            return ""
+        keep = m.depth
+        self._pending = text[n - keep :] if keep else ""
+        return self._emit(text[: n - keep])
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip("\n")
+            self._started = bool(text)
+        return text
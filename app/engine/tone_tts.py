@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import math
+from array import array
+
+from .cancellation import check_cancelled
+from .tts_base import TTSParams, TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+
+
+class ToneTTSEngine(TTSEngine):
+    """Model-free stand-in synthesizer for tests and load experiments.
+
+    Every character becomes `ms_per_char` of a sine tone whose pitch depends on
+    the character, so output length and content are predictable
+    (`AUDIO_BACKEND=tone`).
+    """
+
+    thread_safe = True
+
+    def __init__(self, model_id: str, *, sample_rate: int = 16000, ms_per_char: float = 20.0) -> None:
+        self.model_id = model_id
+        self.sample_rate = int(sample_rate)
+        self.frames_per_char = max(1, int(self.sample_rate * ms_per_char / 1000))
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        n = self.frames_per_char
+        samples = array("h")
+        for ch in text:
+            check_cancelled(params.cancel)
+            step = 2 * math.pi * (220.0 + (ord(ch) % 64) * 10.0) * params.speed / self.sample_rate
+            samples.extend(int(8000 * math.sin(step * i)) for i in range(n))
+        return AudioBuffer(samples, self.sample_rate)
+
+    def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
+        return self.synthesize_audio(text, params).encode((format or "wav").lower())
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import functools
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+
+from .cancellation import CancelToken, check_cancelled
+from app.utils.audio_buffer import AudioBuffer
 
 
 @dataclass(frozen=True)
@@ -9,10 +14,14 @@ class TTSParams:
     voice: str = "default"
     speed: float = 1.0
     speaker_id: int | None = None
+    # Checked by engines between chunks; set by the API layer for disconnects/deadlines.
+    cancel: CancelToken | None = field(default=None, compare=False, repr=False)
 
 
 class TTSEngine:
     model_id: str
+    # Whether concurrent calls may run on one instance; otherwise they are serialized (see `serial`).
+    thread_safe: bool = False
 
     def synthesize(self, text: str, params: TTSParams, *, format: str = "wav", **kwargs) -> bytes:
         """Return audio bytes in the requested format (e.g. wav).
@@ -20,3 +29,37 @@ class TTSEngine:
         Implementations may accept additional backend-specific kwargs.
         """
         raise NotImplementedError
+
+    def synthesize_audio(self, text: str, params: TTSParams, **kwargs) -> AudioBuffer:
+        """Return the synthesized audio as PCM, leaving container encoding to the caller.
+
+        The default decodes `synthesize(format="wav")`; engines that produce
+        samples directly should override it (and build `synthesize` on top).
+        """
+        return AudioBuffer.from_wav(self.synthesize(text, params, format="wav", **kwargs))
+
+    def stream_synthesize(self, text: str, params: TTSParams, **kwargs) -> Iterator[AudioBuffer]:
+        """Yield `AudioBuffer` chunks as soon as each is ready.
+
+        The default splits `text` into sentences and synthesizes them one by
+        one; engines that produce audio incrementally should override.
+        """
+        from app.utils.text_segment import split_sentences
+
+        # Also used unbound for duck-typed engines that only have `synthesize`.
+        synthesize_audio = getattr(self, "synthesize_audio", None) or functools.partial(
+            TTSEngine.synthesize_audio, self
+        )
+        for sentence in split_sentences(text):
+            check_cancelled(params.cancel)
+            buf = synthesize_audio(sentence, params, **kwargs)
+            if len(buf):
+                yield buf
+
+    def memory_bytes(self) -> int:
+        """Estimated resident memory of the loaded model, for the registry's budget."""
+        return 0
+
+    def stats(self) -> dict:
+        """Engine-specific runtime counters (caches, ...). Empty by default."""
+        return {}
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import json
+import tomllib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic import ValidationError
+
+from .config import Settings
+
+# Keys every manifest entry may set; anything else is a backend option (see `ModelSpec.settings`).
+_ENTRY_KEYS = {
+    "id",
+    "backend",
+    "path",
+    "aliases",
+    "defaults",
+    "max_in_flight",
+    "max_queue",
+    "queue_timeout",
+    "evictable",
+}
+_CHAT_DEFAULTS = {"max_tokens", "temperature", "top_p"}
+_TTS_REQUEST_OPTIONS = {"ref_audio", "ref_text", "instruct_text", "source_audio"}
+_PREFIX = {"chat": "chat_", "tts": "audio_"}
+
+
+@dataclass
+class ModelSpec:
+    """One model declared in a manifest file.
+
+    `defaults` fill request fields the client left out (chat: max_tokens,
+    temperature, top_p; TTS: voice, speed and any backend extra such as
+    ref_audio). `max_in_flight` / `max_queue` / `queue_timeout` override the
+    server-wide admission settings for this model. `options` are the backend
+    settings without their `chat_` / `audio_` prefix (e.g. `max_batch_size`,
+    `replicas`, `command`); unset ones come from the environment.
+    """
+
+    id: str
+    kind: str  # "chat" | "tts"
+    backend: str = "auto"
+    path: str | None = None
+    aliases: list[str] = field(default_factory=list)
+    defaults: dict[str, Any] = field(default_factory=dict)
+    max_in_flight: int | None = None
+    max_queue: int | None = None
+    queue_timeout: float | None = None
+    evictable: bool = True
+    options: dict[str, Any] = field(default_factory=dict)
+
+    def settings(self, base: Settings) -> Settings:
+        """`base` with this model's id, path, backend and options applied."""
+        prefix = _PREFIX[self.kind]
+        update: dict[str, Any] = {f"{prefix}model_id": self.id, f"{prefix}model_path": self.path}
+        if self.kind == "chat":
+            update["echo_mode"] = self.backend == "echo"
+        else:
+            update["audio_backend"] = self.backend
+        update.update({f"{prefix}{key}": value for key, value in self.options.items()})
+        # `model_copy(update=...)` wouldn't validate (or coerce) the options.
+        return Settings.model_validate({**base.model_dump(), **update})
+
+
+def _spec(kind: str, entry: dict[str, Any]) -> ModelSpec:
+    if not isinstance(entry, dict) or not isinstance(entry.get("id"), str) or not entry["id"]:
+        raise ValueError(f"every {kind} entry needs a string `id`: {entry!r}")
+    model_id = entry["id"]
+    prefix = _PREFIX[kind]
+    options = {k: v for k, v in entry.items() if k not in _ENTRY_KEYS}
+    for key in options:
+        if key in {"model_id", "model_path"} or f"{prefix}{key}" not in Settings.model_fields:
+            raise ValueError(f"{model_id}: unknown option {key!r}")
+    # Check option values here, so a bad one is reported against the manifest.
+    try:
+        checked = Settings.model_validate({f"{prefix}{key}": value for key, value in options.items()})
+    except ValidationError as e:
+        raise ValueError(f"{model_id}: invalid option: {e}") from None
+    options = {key: getattr(checked, f"{prefix}{key}") for key in options}
+
+    if kind == "chat":
+        backend = str(entry.get("backend") or ("mlx" if entry.get("path") else "echo"))
+    else:
+        backend = str(entry.get("backend") or "auto")
+    if kind == "chat" and backend not in {"mlx", "echo"}:
+        raise ValueError(f"{model_id}: unknown chat backend {backend!r} (expected 'mlx' or 'echo')")
+    if kind == "chat" and backend == "mlx" and not entry.get("path"):
+        raise ValueError(f"{model_id}: backend 'mlx' requires `path`")
+
+    aliases = entry.get("aliases") or []
+    if isinstance(aliases, str):
+        aliases = [aliases]
+    defaults = dict(entry.get("defaults") or {})
+    if kind == "tts":
+        # AUDIO_REF_AUDIO and friends are request defaults, not engine settings.
+        for key in _TTS_REQUEST_OPTIONS & set(options):
+            defaults.setdefault(key, options.pop(key))
+    if kind == "chat" and (unknown := set(defaults) - _CHAT_DEFAULTS):
+        raise ValueError(f"{model_id}: unknown chat defaults {sorted(unknown)}")
+
+    return ModelSpec(
+        id=model_id,
+        kind=kind,
+        backend=backend,
+        path=entry.get("path"),
+        aliases=[str(a) for a in aliases],
+        defaults=defaults,
+        max_in_flight=entry.get("max_in_flight"),
+        max_queue=entry.get("max_queue"),
+        queue_timeout=entry.get("queue_timeout"),
+        evictable=bool(entry.get("evictable", True)),
+        options=options,
+    )
+
+
+def parse_manifest(data: dict[str, Any]) -> list[ModelSpec]:
+    """Model specs from a decoded manifest: `{"chat": [...], "tts": [...]}`."""
+    unknown = set(data) - {"chat", "tts"}
+    if unknown:
+        raise ValueError(f"unknown sections {sorted(unknown)} (expected 'chat' and 'tts')")
+    specs = [_spec(kind, entry) for kind in ("chat", "tts") for entry in data.get(kind) or []]
+
+    seen: set[str] = set()
+    for spec in specs:
+        for name in (spec.id, *spec.aliases):
+            if name in seen:
+                raise ValueError(f"model id or alias {name!r} is declared twice")
+            seen.add(name)
+    return specs
+
+
+def load_manifest(path: str | Path) -> list[ModelSpec]:
+    """Read a TOML (`.toml`) or JSON model manifest."""
+    path = Path(path)
+    raw = path.read_bytes()
+    data = tomllib.loads(raw.decode("utf-8")) if path.suffix.lower() == ".toml" else json.loads(raw)
+    return parse_manifest(data)
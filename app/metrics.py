@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import bisect
+from collections.abc import Callable, Iterable, Sequence
+
+# Prometheus text exposition without extra dependencies.
+#
+# Metrics are updated from the event loop thread only (the API handlers), so
+# the hot path is a plain dict lookup plus an integer add: no locks needed.
+# Values that live elsewhere (queue depth, cache sizes) are read at scrape
+# time through collector callbacks instead of being pushed on every change.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RTF_BUCKETS = (0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are produced by a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        collect: Callable[[], Iterable[tuple[Labels, float]]] | None = None,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self._collect = collect
+        self._values: dict[Labels, float] = {}
+
+    def set(self, *labels: str, value: float) -> None:
+        self._values[labels] = value
+
+    def render(self) -> list[str]:
+        samples = dict(self._values)
+        if self._collect is not None:
+            samples.update(self._collect())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}" for k, v in samples.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[Labels, list[float]] = {}
+
+    def observe(self, *labels: str, value: float) -> None:
+        row = self._values.get(labels)
+        if row is None:
+            row = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def count(self, *labels: str) -> int:
+        row = self._values.get(labels)
+        return int(sum(row[:-1])) if row else 0
+
+    def render(self) -> list[str]:
+        lines: list[str] = []
+        for k, row in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += int(n)
+                le = f'le="{_fmt_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_value(row[-1])}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {cumulative}")
+        return lines
+
+
+class ServerMetrics:
+    """All metrics exported on `/metrics`."""
+
+    def __init__(self, prefix: str = "macoslocalapi") -> None:
+        p = prefix
+        self.requests = Counter(f"{p}_requests_total", "Requests per model and endpoint.", ("model", "endpoint"))
+        self.chat_ttft = Histogram(f"{p}_chat_time_to_first_token_seconds", "Time to first token.", ("model",))
+        self.chat_itl = Histogram(
+            f"{p}_chat_inter_token_latency_seconds", "Time between streamed engine chunks.", ("model",)
+        )
+        self.chat_e2e = Histogram(f"{p}_chat_request_duration_seconds", "End-to-end chat latency.", ("model",))
+        self.prompt_tokens = Counter(f"{p}_prompt_tokens_total", "Prompt tokens processed.", ("model",))
+        self.completion_tokens = Counter(f"{p}_completion_tokens_total", "Completion tokens generated.", ("model",))
+        self.tts_latency = Histogram(f"{p}_tts_synthesis_seconds", "Speech synthesis latency.", ("model",))
+        self.tts_ttfa = Histogram(
+            f"{p}_tts_time_to_first_audio_seconds", "Time to the first audio chunk (stream=true).", ("model",)
+        )
+        self.tts_rtf = Histogram(
+            f"{p}_tts_real_time_factor", "Synthesis time divided by audio duration.", ("model",), buckets=RTF_BUCKETS
+        )
+        self.tts_audio_seconds = Counter(f"{p}_tts_audio_seconds_total", "Seconds of audio synthesized.", ("model",))
+        self.tts_cache_requests = Counter(
+            f"{p}_tts_cache_requests_total", "TTS response cache lookups by result (hit/miss).", ("model", "result")
+        )
+        self.tts_cache_bytes_saved = Counter(
+            f"{p}_tts_cache_bytes_saved_total", "Audio bytes served from the TTS cache.", ("model",)
+        )
+        self._metrics: list[_Metric] = [
+            self.requests,
+            self.chat_ttft,
+            self.chat_itl,
+            self.chat_e2e,
+            self.prompt_tokens,
+            self.completion_tokens,
+            self.tts_latency,
+            self.tts_ttfa,
+            self.tts_rtf,
+            self.tts_audio_seconds,
+            self.tts_cache_requests,
+            self.tts_cache_bytes_saved,
+        ]
+
+    def add(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics:
+            lines.extend(m.header())
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
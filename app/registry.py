@@ -1,30 +1,298 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any
 
+from .admission import AdmissionController
 from .engine.base import LLMEngine
 from .engine.tts_base import TTSEngine
 
 
+class ModelLoadError(RuntimeError):
+    """A registered model failed to load; map to 503."""
+
+
+@dataclass
+class ModelDescriptor:
+    """How to build a model on demand, without loading it.
+
+    `memory_bytes` overrides the engine's own `memory_bytes()` estimate (for
+    budgeting); `evictable=False` keeps the engine loaded once it is. `warmup`
+    runs on each freshly built engine before any request can use it.
+    """
+
+    model_id: str
+    kind: str  # "chat" | "tts"
+    factory: Callable[[], Any]
+    memory_bytes: int | None = None
+    evictable: bool = True
+    warmup: Callable[[Any], None] | None = None
+
+
 @dataclass
 class ModelRegistry:
+    """Chat and TTS engines by model id.
+
+    `chat_models` / `tts_models` hold the engines that are loaded right now.
+    Models registered with a `ModelDescriptor` are loaded on first use
+    (concurrent first requests share one load) and, when the loaded engines'
+    estimated memory exceeds `memory_budget_bytes` (0 = no limit), the least
+    recently used idle ones are unloaded again.
+    """
+
     chat_models: dict[str, LLMEngine]
     tts_models: dict[str, TTSEngine]
+    # Per-model admission control (model id -> controller); models without one are unlimited.
+    admission: dict[str, AdmissionController] = field(default_factory=dict)
+    descriptors: dict[str, ModelDescriptor] = field(default_factory=dict)
+    memory_budget_bytes: int = 0
+    # Alternative names (alias -> model id) and per-model request defaults (see app.manifest).
+    aliases: dict[str, str] = field(default_factory=dict)
+    defaults: dict[str, dict[str, Any]] = field(default_factory=dict)
+    # Where each model comes from (backend, weights path), for the TTS response cache key.
+    sources: dict[str, dict[str, Any]] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._load_locks: dict[str, threading.Lock] = {}
+        self._last_used: OrderedDict[str, float] = OrderedDict()
+        self._memory: dict[str, int] = {}
+        # model id -> {"state": "unloaded" | "queued" | "loading" | "warming" | "ready" | "failed", timings, error}
+        self._state: dict[str, dict[str, Any]] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def register(self, descriptor: ModelDescriptor) -> None:
+        with self._lock:
+            self.descriptors[descriptor.model_id] = descriptor
 
     def list_model_ids(self) -> list[str]:
         # OpenAI /v1/models is a flat list.
-        ids = set(self.chat_models.keys()) | set(self.tts_models.keys())
+        with self._lock:
+            ids = set(self.chat_models) | set(self.tts_models) | set(self.descriptors) | set(self.aliases)
         return sorted(ids)
 
+    def resolve(self, model_id: str) -> str:
+        """The model id an alias stands for (ids pass through unchanged)."""
+        return self.aliases.get(model_id, model_id)
+
+    def kind(self, model_id: str) -> str | None:
+        """"chat" or "tts" for a known model id or alias (loaded or not), else None."""
+        model_id = self.resolve(model_id)
+        if model_id in self.chat_models:
+            return "chat"
+        if model_id in self.tts_models:
+            return "tts"
+        descriptor = self.descriptors.get(model_id)
+        return descriptor.kind if descriptor is not None else None
+
+    def _loaded(self, kind: str) -> dict[str, Any]:
+        return self.chat_models if kind == "chat" else self.tts_models
+
+    def _get(self, kind: str, model_id: str) -> Any:
+        model_id = self.resolve(model_id)
+        engine = self._loaded(kind).get(model_id)
+        if engine is None:
+            descriptor = self.descriptors.get(model_id)
+            if descriptor is None or descriptor.kind != kind:
+                raise KeyError(f"Unknown {kind} model: {model_id}")
+            engine = self.load(model_id)
+        with self._lock:
+            self._last_used[model_id] = time.monotonic()
+            self._last_used.move_to_end(model_id)
+        return engine
+
     def get_chat(self, model_id: str) -> LLMEngine:
-        try:
-            return self.chat_models[model_id]
-        except KeyError:
-            raise KeyError(f"Unknown chat model: {model_id}")
+        return self._get("chat", model_id)
 
     def get_tts(self, model_id: str) -> TTSEngine:
-        try:
-            return self.tts_models[model_id]
-        except KeyError:
-            raise KeyError(f"Unknown tts model: {model_id}")
+        return self._get("tts", model_id)
+
+    async def get_chat_async(self, model_id: str) -> LLMEngine:
+        """`get_chat` that loads off the event loop when the model isn't loaded yet."""
+        if self.resolve(model_id) in self.chat_models:
+            return self.get_chat(model_id)
+        return await asyncio.to_thread(self.get_chat, model_id)
+
+    async def get_tts_async(self, model_id: str) -> TTSEngine:
+        if self.resolve(model_id) in self.tts_models:
+            return self.get_tts(model_id)
+        return await asyncio.to_thread(self.get_tts, model_id)
+
+    def is_loaded(self, model_id: str) -> bool:
+        return model_id in self.chat_models or model_id in self.tts_models
+
+    def load(self, model_id: str) -> Any:
+        """Load (and warm up) a registered model unless it already is; returns the engine. Blocking."""
+        descriptor = self.descriptors[model_id]
+        loaded = self._loaded(descriptor.kind)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(model_id, threading.Lock())
+        # Everyone asking for the same model waits on one load.
+        with load_lock:
+            engine = loaded.get(model_id)
+            if engine is not None:
+                return engine
+            self._set_state(model_id, "loading", error=None)
+            t0 = time.perf_counter()
+            try:
+                engine = descriptor.factory()
+            except Exception as e:
+                self._set_state(model_id, "failed", error=str(e))
+                raise ModelLoadError(f"Failed to load model {model_id}: {e}") from e
+            t1 = time.perf_counter()
+            if descriptor.warmup is not None:
+                self._set_state(model_id, "warming", load_seconds=round(t1 - t0, 3))
+                try:
+                    descriptor.warmup(engine)
+                except Exception as e:  # a cold first request is better than no model
+                    print(f"[registry] warmup of {model_id} failed: {e!r}")
+            memory = descriptor.memory_bytes
+            if memory is None:
+                memory = int(getattr(engine, "memory_bytes", lambda: 0)())
+            with self._lock:
+                self._memory[model_id] = memory
+                self._last_used[model_id] = time.monotonic()
+                self._last_used.move_to_end(model_id)
+                self.loads += 1
+                loaded[model_id] = engine
+            self._set_state(
+                model_id,
+                "ready",
+                load_seconds=round(t1 - t0, 3),
+                warmup_seconds=round(time.perf_counter() - t1, 3) if descriptor.warmup is not None else None,
+            )
+        self._evict(keep=model_id)
+        return engine
+
+    def queue_loads(self, model_ids: list[str] | None = None) -> list[str]:
+        """Mark registered models that aren't loaded as "queued" (not ready); returns them."""
+        model_ids = list(self.descriptors) if model_ids is None else model_ids
+        queued = [m for m in model_ids if not self.is_loaded(m)]
+        for model_id in queued:
+            if self.state(model_id) not in {"loading", "warming"}:
+                self._set_state(model_id, "queued")
+        return queued
+
+    def load_all(self, model_ids: list[str] | None = None) -> dict[str, Exception]:
+        """Load registered models concurrently (all by default); returns the failures by model id."""
+        model_ids = self.queue_loads(model_ids)
+        if not model_ids:
+            return {}
+        errors: dict[str, Exception] = {}
+
+        def load_one(model_id: str) -> None:
+            try:
+                self.load(model_id)
+            except Exception as e:
+                errors[model_id] = e
+
+        with ThreadPoolExecutor(len(model_ids), thread_name_prefix="model-load") as pool:
+            list(pool.map(load_one, model_ids))
+        return errors
+
+    def state(self, model_id: str) -> str:
+        """Load state of a model: "unloaded", "queued", "loading", "warming", "ready" or "failed"."""
+        model_id = self.resolve(model_id)
+        if self.is_loaded(model_id):
+            return "ready"
+        with self._lock:
+            return self._state.get(model_id, {}).get("state", "unloaded")
+
+    def _set_state(self, model_id: str, state: str, **info: Any) -> None:
+        with self._lock:
+            entry = self._state.setdefault(model_id, {})
+            entry["state"] = state
+            entry.update(info)
+
+    def unload(self, model_id: str) -> bool:
+        """Drop a loaded engine and close it; returns False if it wasn't loaded."""
+        with self._lock:
+            engine = self.chat_models.pop(model_id, None) or self.tts_models.pop(model_id, None)
+            self._memory.pop(model_id, None)
+            self._last_used.pop(model_id, None)
+            if engine is not None and model_id in self._state:
+                self._state[model_id]["state"] = "unloaded"
+        if engine is None:
+            return False
+        close = getattr(engine, "close", None)
+        if callable(close):
+            close()
+        return True
+
+    @property
+    def memory_bytes(self) -> int:
+        with self._lock:
+            return sum(self._memory.values())
+
+    def _busy(self, model_id: str) -> bool:
+        controller = self.admission.get(model_id)
+        return controller is not None and (controller.in_flight > 0 or controller.queued > 0)
+
+    def _evict(self, *, keep: str) -> None:
+        if self.memory_budget_bytes <= 0:
+            return
+        while self.memory_bytes > self.memory_budget_bytes:
+            with self._lock:
+                candidates = [
+                    m
+                    for m in self._last_used
+                    if m != keep
+                    and m in self._memory
+                    and (d := self.descriptors.get(m)) is not None
+                    and d.evictable
+                    and not self._busy(m)
+                ]
+            if not candidates:
+                return
+            victim = candidates[0]
+            print(f"[registry] unloading {victim} to stay within the model memory budget")
+            if self.unload(victim):
+                self.evictions += 1
+
+    def load_states(self) -> dict[str, dict[str, Any]]:
+        """Load state, timings and last error of every model, by id."""
+        # Loader and eviction threads change these dicts; iterate over copies.
+        with self._lock:
+            states = {m: dict(info) for m, info in self._state.items()}
+            loaded = {"chat": list(self.chat_models), "tts": list(self.tts_models)}
+            descriptors = dict(self.descriptors)
+        out: dict[str, dict[str, Any]] = {}
+        for kind, model_ids in loaded.items():
+            for model_id in model_ids:
+                out[model_id] = {"kind": kind, **states.get(model_id, {}), "state": "ready"}
+        for model_id, d in descriptors.items():
+            if model_id not in out:
+                out[model_id] = {"kind": d.kind, "state": "unloaded", **states.get(model_id, {})}
+        return dict(sorted(out.items()))
 
+    def stats(self) -> dict:
+        with self._lock:
+            memory = dict(self._memory)
+            last_used = dict(self._last_used)
+            states = {m: dict(info) for m, info in self._state.items()}
+            loaded = set(self.chat_models) | set(self.tts_models)
+            descriptors = dict(self.descriptors)
+        now = time.monotonic()
+        return {
+            "memory_bytes": sum(memory.values()),
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "models": {
+                model_id: {
+                    "kind": d.kind,
+                    "loaded": model_id in loaded,
+                    **states.get(model_id, {"state": "unloaded"}),
+                    "memory_bytes": memory.get(model_id),
+                    "idle_seconds": round(now - last_used[model_id], 3) if model_id in last_used else None,
+                }
+                for model_id, d in sorted(descriptors.items())
+            },
+        }
@@ -32,6 +32,10 @@ class ChatMessage(BaseModel):
     tool_calls: list[dict[str, Any]] | None = None
 
 
+class StreamOptions(BaseModel):
+    include_usage: bool = False
+
+
 class ChatCompletionRequest(BaseModel):
     model_config = ConfigDict(extra="allow")
 
@@ -43,6 +47,10 @@ class ChatCompletionRequest(BaseModel):
     max_tokens: int | None = Field(default=None, ge=1)
 
     stream: bool | None = False
+    stream_options: StreamOptions | None = None
+
+    # Non-standard: abort generation after this many seconds.
+    timeout: float | None = Field(default=None, gt=0)
 
 
 class ChatCompletionResponseMessage(BaseModel):
@@ -93,6 +101,12 @@ class ChatCompletionChunk(BaseModel):
     choices: list[ChatCompletionChunkChoice]
 
 
+class ChatCompletionUsageChunk(ChatCompletionChunk):
+    """Last chunk of a stream with `stream_options.include_usage`: no choices, just the usage."""
+
+    usage: Usage
+
+
 # --- Audio / Speech (TTS) ---
 
 
@@ -113,5 +127,12 @@ class AudioSpeechRequest(BaseModel):
     # Generic multi-speaker hint (used by some backends)
     speaker_id: int | None = None
 
+    # Abort synthesis after this many seconds.
+    timeout: float | None = Field(default=None, gt=0)
+
+    # Send audio sentence by sentence as it is synthesized (format "wav" or "pcm").
+    stream: bool | None = False
+    stream_options: StreamOptions | None = None
+
     class Config:
         extra = "allow"
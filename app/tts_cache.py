@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any
+
+from .engine.reference_cache import reference_key
+
+# Request fields holding audio (a path or raw bytes); keyed by content, not by value.
+_AUDIO_FIELDS = ("ref_audio", "source_audio")
+
+
+def speech_cache_key(
+    model: str,
+    text: str,
+    *,
+    voice: str,
+    speed: float,
+    speaker_id: int | None,
+    format: str,
+    extra: dict[str, Any],
+    source: dict[str, Any] | None = None,
+) -> str:
+    """Content address of a `/v1/audio/speech` response.
+
+    Covers everything that changes the audio: model, input, voice, speed,
+    speaker, format and the backend-specific extras. Reference clips are keyed
+    by SHA-256 (raw bytes) or path, size and mtime (files), as in
+    `ReferenceAudioCache`. `source` is where the model comes from (backend and
+    weights path, see `ModelRegistry.sources`); the weights are keyed by size
+    and mtime too, so switching backends or replacing the model file does not
+    serve audio from the old one.
+    """
+    fields: dict[str, Any] = {k: v for k, v in extra.items() if k not in _AUDIO_FIELDS}
+    for name in _AUDIO_FIELDS:
+        val = extra.get(name)
+        if val is None:
+            continue
+        try:
+            fields[name] = reference_key(val)
+        except OSError:
+            # Missing file: the engine will reject it; key on the name alone.
+            fields[name] = str(val)
+    payload = {
+        "model": model,
+        "input": text,
+        "voice": voice,
+        "speed": float(speed),
+        "speaker_id": speaker_id,
+        "format": format,
+        "extra": fields,
+        "source": None if source is None else {**source, "weights": _weights_stamp(source.get("path"))},
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _weights_stamp(path: str | None) -> tuple[int, int] | None:
+    """(size, newest mtime) of a model file, or of the files directly inside a model directory."""
+    if not path:
+        return None
+    try:
+        p = Path(path).expanduser()
+        stats = [f.stat() for f in p.iterdir() if f.is_file()] if p.is_dir() else [p.stat()]
+    except OSError:
+        # Not a local path (e.g. a hub repo id): the name is all we have.
+        return None
+    return sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0)
+
+
+class TTSResponseCache:
+    """On-disk, content-addressed cache of synthesized speech.
+
+    Each response is one file named by its `speech_cache_key` under
+    `directory` (fanned out by the first two hex digits). Hits are returned as
+    read-only `mmap`s, so serving a cached clip never copies it into Python.
+    Files are evicted least-recently-used first once they total more than
+    `max_bytes`; recency survives restarts through the files' mtimes.
+    Thread-safe.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_bytes: int) -> None:
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_saved = 0
+
+        self._load_index()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / key
+
+    def _load_index(self) -> None:
+        found = []
+        for path in self.directory.glob("??/*"):
+            if path.name.startswith(".tmp-"):
+                # Left behind by a write interrupted by a crash.
+                path.unlink(missing_ok=True)
+                continue
+            if path.name.startswith(".") or not path.is_file():
+                continue
+            st = path.stat()
+            found.append((st.st_mtime_ns, path.name, st.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> mmap.mmap | None:
+        """Cached audio for `key` as a read-only mmap, or None."""
+        with self._lock:
+            size = self._entries.get(key)
+            if size is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += size
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Deleted behind our back (or truncated): forget it.
+            with self._lock:
+                if self._entries.pop(key, None) is not None:
+                    self._bytes -= size
+                self.hits -= 1
+                self.bytes_saved -= size
+                self.misses += 1
+            return None
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        size = len(data)
+        if not size or size > self.max_bytes:
+            return
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # Write then rename, so readers never see a partial file.
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old
+            self._entries[key] = size
+            self._bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+            self._path(key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import io
+import sys
+import wave
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+
+from .audio_wav import find_repeat_prefix_frames, wav_stream_header, write_wav_pcm16
+
+# Formats the HTTP layer can encode from PCM without a backend-specific encoder.
+PCM_FORMATS = {"wav", "pcm"}
+
+
+def _le(samples: array) -> array:
+    # PCM16 on the wire is little-endian; `array` uses native order.
+    if sys.byteorder == "big":
+        samples = array("h", samples)
+        samples.byteswap()
+    return samples
+
+
+@dataclass
+class AudioBuffer:
+    """Interleaved signed 16-bit PCM plus its format.
+
+    Backed by `array('h')` (2 bytes per sample, versus ~36 for a list of ints);
+    `pcm16` exposes the bytes as a memoryview, so slicing and writing out don't
+    copy. Engines return this; the container (WAV, ...) is produced once, at
+    the HTTP edge.
+    """
+
+    samples: array = field(default_factory=lambda: array("h"))
+    sample_rate: int = 24000
+    channels: int = 1
+
+    @classmethod
+    def from_pcm16(cls, pcm16: bytes | bytearray | memoryview, sample_rate: int, channels: int = 1) -> AudioBuffer:
+        samples = array("h")
+        samples.frombytes(pcm16)
+        return cls(_le(samples), int(sample_rate), channels)
+
+    @classmethod
+    def from_samples(cls, samples: Iterable[int], sample_rate: int, channels: int = 1) -> AudioBuffer:
+        """From int16 values; int16 buffers (e.g. NumPy arrays) are copied in one go."""
+        try:
+            view = memoryview(samples)  # type: ignore[arg-type]
+        except TypeError:
+            return cls(array("h", samples), int(sample_rate), channels)
+        if view.c_contiguous and view.format in ("h", "=h"):
+            buf = array("h")
+            buf.frombytes(view.cast("B"))
+            return cls(buf, int(sample_rate), channels)
+        return cls(array("h", view.tolist()), int(sample_rate), channels)
+
+    @classmethod
+    def from_float(cls, audio, sample_rate: int, channels: int = 1) -> AudioBuffer:
+        """From float samples in [-1, 1] (NumPy/MLX arrays or sequences); clipped."""
+        import numpy as np
+
+        pcm = (np.clip(np.asarray(audio, dtype=np.float32).reshape(-1), -1.0, 1.0) * 32767.0).astype("<i2")
+        return cls.from_pcm16(pcm.tobytes(), sample_rate, channels)
+
+    @classmethod
+    def from_wav(cls, data: bytes) -> AudioBuffer:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError(f"Only PCM16 wav supported, got sampwidth={wf.getsampwidth()}")
+            return cls.from_pcm16(wf.readframes(wf.getnframes()), wf.getframerate(), wf.getnchannels())
+
+    def __len__(self) -> int:
+        """Number of frames."""
+        return len(self.samples) // self.channels
+
+    @property
+    def duration(self) -> float:
+        return len(self) / self.sample_rate if self.sample_rate else 0.0
+
+    @property
+    def pcm16(self) -> memoryview:
+        """Little-endian PCM16 bytes (a view, no copy on little-endian hosts)."""
+        return memoryview(_le(self.samples)).cast("B")
+
+    def copy(self) -> AudioBuffer:
+        return type(self)(array("h", self.samples), self.sample_rate, self.channels)
+
+    def extend(self, other: AudioBuffer) -> None:
+        self.samples.extend(other.samples)
+
+    def drop_frames(self, n: int) -> None:
+        """Remove the first `n` frames in place."""
+        if n > 0:
+            del self.samples[: n * self.channels]
+
+    def trim_repeat_prefix(self, *, max_prefix_seconds: float = 2.5, similarity: float = 1.0) -> int:
+        """In-place version of `trim_repeat_prefix_pcm16`; returns the frames removed."""
+        if self.channels != 1:
+            return 0
+        frames = find_repeat_prefix_frames(
+            self.pcm16, sample_rate=self.sample_rate, max_prefix_seconds=max_prefix_seconds, similarity=similarity
+        )
+        self.drop_frames(frames)
+        return frames
+
+    def encode(self, format: str) -> bytes:
+        """Container bytes for `format` ("wav" or raw "pcm")."""
+        if format == "wav":
+            return write_wav_pcm16(self.sample_rate, self.pcm16, n_channels=self.channels)
+        if format == "pcm":
+            return self.pcm16.tobytes()
+        raise ValueError(f"AudioBuffer can only encode {sorted(PCM_FORMATS)}, not {format!r}")
+
+    def stream_header(self) -> bytes:
+        return wav_stream_header(self.sample_rate, n_channels=self.channels)
+
+    @classmethod
+    def concat(cls, parts: Sequence[AudioBuffer], *, crossfade_ms: float = 0.0) -> AudioBuffer:
+        """Join mono buffers in order, blending each seam with a linear crossfade.
+
+        Each seam overlaps the tail of one part with the head of the next, so
+        the result is `crossfade` samples shorter per join.
+        """
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls()
+        first = parts[0]
+        out = first.copy()
+        n = int(first.sample_rate * crossfade_ms / 1000) if first.channels == 1 else 0
+        for part in parts[1:]:
+            head = part.samples
+            k = min(n, len(out.samples), len(head))
+            if k > 1:
+                base = len(out.samples) - k
+                for i in range(k):
+                    w = i / (k - 1)
+                    out.samples[base + i] = int(out.samples[base + i] * (1.0 - w) + head[i] * w)
+                out.samples.extend(head[k:])
+            else:
+                out.samples.extend(head)
+        return out
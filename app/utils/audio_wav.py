@@ -18,6 +18,16 @@ def read_wav_mono_pcm16(data: bytes) -> tuple[int, bytes]:
         return sample_rate, frames
 
 
+def wav_duration_seconds(data: bytes) -> float | None:
+    """Duration of a WAV payload from its header, or None if it isn't one."""
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wf:
+            rate = wf.getframerate()
+            return wf.getnframes() / rate if rate else None
+    except (wave.Error, EOFError):
+        return None
+
+
 def write_wav_pcm16(sample_rate: int, pcm16: bytes, *, n_channels: int = 1) -> bytes:
     buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
@@ -28,40 +38,116 @@ def write_wav_pcm16(sample_rate: int, pcm16: bytes, *, n_channels: int = 1) -> b
     return buf.getvalue()
 
 
-def trim_repeat_prefix_pcm16(pcm16: bytes, *, sample_rate: int, max_prefix_seconds: float = 2.5) -> bytes:
+def wav_stream_header(sample_rate: int, *, n_channels: int = 1) -> bytes:
+    """PCM16 WAV header for a stream of unknown length.
+
+    The RIFF and data sizes are set to 0xFFFFFFFF, which players treat as
+    "read until EOF".
+    """
+    import struct
+
+    block_align = n_channels * 2
+    return (
+        b"RIFF"
+        + struct.pack("<I", 0xFFFFFFFF)
+        + b"WAVEfmt "
+        + struct.pack("<IHHIIHH", 16, 1, n_channels, int(sample_rate), int(sample_rate) * block_align, block_align, 16)
+        + b"data"
+        + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+def trim_repeat_prefix_pcm16(
+    pcm16: bytes, *, sample_rate: int, max_prefix_seconds: float = 2.5, similarity: float = 1.0
+) -> bytes:
     """Heuristic: remove an immediate repeated prefix.
 
     Detect pattern A + A + ... at the start and remove the first A.
 
-    This is conservative and only attempts exact byte equality on PCM16.
+    With the default `similarity=1.0` only exact PCM16 repeats count; see
+    `find_repeat_prefix_frames` for the tolerant mode.
     """
+    frames = find_repeat_prefix_frames(
+        pcm16, sample_rate=sample_rate, max_prefix_seconds=max_prefix_seconds, similarity=similarity
+    )
+    return pcm16[frames * 2 :] if frames else pcm16
 
-    if not pcm16:
-        return pcm16
 
-    total_frames = len(pcm16) // 2
-    max_prefix = int(sample_rate * max_prefix_seconds)
+# Windows quieter than this (RMS, int16 units; about -60 dBFS) never count as a
+# repeat in tolerant mode: leading silence correlates with anything.
+_SILENCE_RMS = 32.0
 
-    # Bail out for very short audio
-    if total_frames < int(sample_rate * 0.4):
-        return pcm16
 
-    # Scan candidate prefix lengths (frames)
-    step = max(1, int(sample_rate * 0.02))  # 20ms
+def _prefix_lengths(total_frames: int, *, sample_rate: int, max_prefix_seconds: float) -> range:
+    """Candidate prefix lengths (frames): 0.2 s up to `max_prefix_seconds`, in 20 ms steps."""
+    step = max(1, int(sample_rate * 0.02))
     start_min = int(sample_rate * 0.2)
-    start_max = min(max_prefix, total_frames // 2)
+    start_max = min(int(sample_rate * max_prefix_seconds), total_frames // 2)
+    return range(start_min, start_max, step)
+
+
+def find_repeat_prefix_frames(
+    pcm16: bytes | bytearray | memoryview,
+    *,
+    sample_rate: int,
+    max_prefix_seconds: float = 2.5,
+    similarity: float = 1.0,
+) -> int:
+    """Length in frames of a repeated leading segment (A + A + ...), or 0.
+
+    `similarity=1.0` (the default) requires the two copies to be bit-identical
+    and compares memoryview slices, without copying them. Below 1.0 the copies
+    only need a normalized cross-correlation (and energy ratio) of at least
+    `similarity`, which catches re-generated or dithered repeats; that check
+    runs in NumPy (prefix energies from one cumulative sum, one dot product
+    per candidate length) and falls back to the exact check without it. Either way only the first
+    `2 * max_prefix_seconds` of audio is looked at, so cost doesn't grow with
+    clip length.
+    """
+    if not pcm16:
+        return 0
 
-    for prefix_len in range(start_min, start_max, step):
-        a0 = 0
-        a1 = prefix_len * 2
-        a2 = (prefix_len * 2) * 2
-        if a2 > len(pcm16):
-            break
+    mv = memoryview(pcm16).cast("B")
+    total_frames = len(mv) // 2
 
-        first = pcm16[a0:a1]
-        second = pcm16[a1:a2]
-        if first and first == second:
-            return pcm16[a1:]
+    # Bail out for very short audio
+    if total_frames < int(sample_rate * 0.4):
+        return 0
 
-    return pcm16
+    lengths = _prefix_lengths(total_frames, sample_rate=sample_rate, max_prefix_seconds=max_prefix_seconds)
+    if similarity < 1.0:
+        try:
+            return _find_similar_prefix(mv, lengths, similarity)
+        except ImportError:
+            pass
 
+    for prefix_len in lengths:
+        a1 = prefix_len * 2
+        if mv[:a1] == mv[a1 : 2 * a1]:
+            return prefix_len
+
+    return 0
+
+
+def _find_similar_prefix(mv: memoryview, lengths: range, similarity: float) -> int:
+    """Tolerant check for `find_repeat_prefix_frames`, vectorized with NumPy (float64 dot products)."""
+    import numpy as np
+
+    if not lengths:
+        return 0
+    # Only the head can hold A + A; everything is a view of it from here on.
+    head = np.frombuffer(mv, dtype="<i2", count=2 * lengths[-1]).astype(np.float64)
+    # energy[k] = sum(head[:k] ** 2), so any window's energy is one subtraction.
+    energy = np.concatenate(([0.0], np.cumsum(head * head)))
+
+    floor = _SILENCE_RMS * _SILENCE_RMS
+    for n in lengths:
+        e1 = energy[n]
+        e2 = energy[2 * n] - e1
+        if min(e1, e2) < floor * n:
+            continue
+        if min(e1, e2) / max(e1, e2) < similarity:
+            continue
+        if float(np.dot(head[:n], head[n : 2 * n])) >= similarity * float(np.sqrt(e1 * e2)):
+            return n
+    return 0
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import re
+
+# Sentence enders. CJK punctuation ends a sentence on its own; Latin punctuation
+# only when followed by whitespace (so "3.14" or "e.g.x" stay intact).
+_CJK_END = "。！？；…"
+_LATIN_END = ".!?;"
+_CLOSERS = "\"'”’」』）)]》"
+
+_SENTENCE_RE = re.compile(
+    rf"""
+    .+?(?:
+        [{_CJK_END}]+[{re.escape(_CLOSERS)}]*  # 你好。 / 真的？！」
+      | [{re.escape(_LATIN_END)}]+[{re.escape(_CLOSERS)}]*(?=\s|$)  # Hello.  / "Wait!"
+      | \n+                                 # hard line breaks
+      | $
+    )
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+# Where an over-long sentence may be cut (clause boundaries).
+_CLAUSE_RE = re.compile(r"[，、,：:]\s*")
+
+
+def split_sentences(text: str, *, max_chars: int = 200) -> list[str]:
+    """Split `text` into sentence-sized segments for incremental synthesis.
+
+    Handles CJK and Latin punctuation and line breaks. Sentences longer than
+    `max_chars` are further split at clause punctuation, then hard-wrapped.
+    Whitespace-only pieces are dropped; joining the result gives back the
+    text minus surrounding whitespace of each piece.
+    """
+    out: list[str] = []
+    for m in _SENTENCE_RE.finditer(text):
+        sentence = m.group(0).strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            out.append(sentence)
+        else:
+            out.extend(_split_long(sentence, max_chars))
+    return out
+
+
+def _split_long(sentence: str, max_chars: int) -> list[str]:
+    pieces: list[str] = []
+    current = ""
+    start = 0
+    clauses: list[str] = []
+    for m in _CLAUSE_RE.finditer(sentence):
+        clauses.append(sentence[start : m.end()])
+        start = m.end()
+    clauses.append(sentence[start:])
+
+    for clause in clauses:
+        if current and len(current) + len(clause) > max_chars:
+            pieces.append(current.strip())
+            current = ""
+        current += clause
+        while len(current) > max_chars:
+            pieces.append(current[:max_chars].strip())
+            current = current[max_chars:]
+    if current.strip():
+        pieces.append(current.strip())
+    return [p for p in pieces if p]
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
+T = TypeVar("T")
+
+_current: ContextVar[Timings | None] = ContextVar("request_timings", default=None)
+
+
+class Timings:
+    """Named phase durations of one request; spans with the same name accumulate."""
+
+    def __init__(self) -> None:
+        self.spans: dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self, *, total: float | None = None) -> str:
+        """`Server-Timing` header value (durations in milliseconds)."""
+        items = list(self.spans.items())
+        if total is not None:
+            items.append(("total", total))
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in items)
+
+    def as_ms(self) -> dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, seconds in self.spans.items()}
+
+
+def current_timings() -> Timings | None:
+    return _current.get()
+
+
+@contextmanager
+def collect_timings() -> Iterator[Timings]:
+    """Collect spans recorded in this context (and contexts copied from it)."""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the `with` body as phase `name`; a no-op outside `collect_timings()`."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - t0)
+
+
+def timed_iter(items: Iterable[T], first: str, rest: str) -> Iterator[T]:
+    """Re-yield `items`, timing the wait for the first item as `first` and the remainder as `rest`.
+
+    For token streams this splits prefill (time to first token) from decode.
+    """
+    timings = _current.get()
+    if timings is None:
+        yield from items
+        return
+    it = iter(items)
+    t0 = time.perf_counter()
+    name = first
+    try:
+        for item in it:
+            timings.add(name, time.perf_counter() - t0)
+            yield item
+            name = rest
+            t0 = time.perf_counter()
+        timings.add(name, time.perf_counter() - t0)
+    finally:
+        close = getattr(it, "close", None)
+        if callable(close):
+            close()
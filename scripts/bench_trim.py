@@ -0,0 +1,95 @@
+"""Micro-benchmark for repeated-prefix trimming (`app.utils.audio_wav`).
+
+Compares the original byte-slicing scan with `find_repeat_prefix_frames` in
+exact and tolerant mode, on a clip with a repeated (and dithered) prefix and on
+one without, e.g.:
+
+    python -m scripts.bench_trim --seconds 60 --sample-rate 24000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.utils.audio_wav import find_repeat_prefix_frames
+
+
+def legacy_trim_repeat_prefix_pcm16(pcm16: bytes, *, sample_rate: int, max_prefix_seconds: float = 2.5) -> bytes:
+    """The implementation this replaced: two fresh `bytes` slices per 20 ms step."""
+    if not pcm16:
+        return pcm16
+    total_frames = len(pcm16) // 2
+    max_prefix = int(sample_rate * max_prefix_seconds)
+    if total_frames < int(sample_rate * 0.4):
+        return pcm16
+    step = max(1, int(sample_rate * 0.02))
+    start_min = int(sample_rate * 0.2)
+    start_max = min(max_prefix, total_frames // 2)
+    for prefix_len in range(start_min, start_max, step):
+        a1 = prefix_len * 2
+        a2 = a1 * 2
+        if a2 > len(pcm16):
+            break
+        first = pcm16[0:a1]
+        second = pcm16[a1:a2]
+        if first and first == second:
+            return pcm16[a1:]
+    return pcm16
+
+
+def make_clip(seconds: float, sample_rate: int, *, prefix_seconds: float | None, dither: bool) -> bytes:
+    rng = np.random.default_rng(0)
+    body = (rng.standard_normal(int(seconds * sample_rate)) * 3000).clip(-32768, 32767).astype("<i2")
+    if prefix_seconds is None:
+        return body.tobytes()
+    n = int(prefix_seconds * sample_rate)
+    copy = body[:n].copy()
+    if dither:
+        copy = (copy + rng.integers(-2, 3, n)).astype("<i2")
+    return np.concatenate([copy, body]).tobytes()
+
+
+def bench(fn, repeat: int) -> tuple[float, object]:
+    result = fn()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000, result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--seconds", type=float, default=60.0)
+    ap.add_argument("--sample-rate", type=int, default=24000)
+    ap.add_argument("--prefix-seconds", type=float, default=1.3)
+    ap.add_argument("--similarity", type=float, default=0.98)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    sr = args.sample_rate
+    clips = {
+        "no repeat": make_clip(args.seconds, sr, prefix_seconds=None, dither=False),
+        "exact repeat": make_clip(args.seconds, sr, prefix_seconds=args.prefix_seconds, dither=False),
+        "dithered repeat": make_clip(args.seconds, sr, prefix_seconds=args.prefix_seconds, dither=True),
+    }
+    impls = {
+        "legacy": lambda pcm: (len(pcm) - len(legacy_trim_repeat_prefix_pcm16(pcm, sample_rate=sr))) // 2,
+        "exact": lambda pcm: find_repeat_prefix_frames(pcm, sample_rate=sr),
+        f"similar>={args.similarity}": lambda pcm: find_repeat_prefix_frames(
+            pcm, sample_rate=sr, similarity=args.similarity
+        ),
+    }
+
+    print(f"{args.seconds:g}s clips @ {sr} Hz, repeated prefix {args.prefix_seconds:g}s, {args.repeat} runs")
+    print(f"{'clip':<16} {'impl':<16} {'ms/call':>9} {'trimmed frames':>15}")
+    for clip_name, pcm in clips.items():
+        for impl_name, impl in impls.items():
+            ms, frames = bench(lambda: impl(pcm), args.repeat)
+            print(f"{clip_name:<16} {impl_name:<16} {ms:>9.3f} {frames:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,12 +13,18 @@ def main() -> None:
         raise SystemExit("MODEL_PATH is required")
 
     settings = Settings(model_id=os.environ.get("MODEL_ID", "local-mlx"), model_path=model_path)
-    engine = MLXEngine(model_id=settings.model_id, model_path=settings.model_path)
+    # CHAT_REPROBE=1 re-detects the sampling kwargs instead of using the cached result.
+    engine = MLXEngine(
+        model_id=settings.model_id,
+        model_path=settings.model_path,
+        reprobe=os.environ.get("CHAT_REPROBE", "").lower() in {"1", "true", "yes", "on"},
+    )
 
     prompt = "user: say hello\nassistant:"
     params = GenerationParams(max_tokens=32, temperature=0.7, top_p=0.9)
 
     print("engine:", engine.__class__.__name__)
+    print("capabilities:", engine.capabilities)
     print("prompt:", prompt)
     print("--- generate() ---")
     text = engine.generate(prompt, params)
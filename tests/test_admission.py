@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from app.admission import PRIORITY_CLASSES, AdmissionController, AdmissionRejected
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.echo_engine import EchoEngine
+
+
+def test_waiters_are_served_by_priority_then_fifo():
+    async def run() -> list[str]:
+        ctl = AdmissionController(max_in_flight=1, max_queue=10, queue_timeout=5.0)
+        first = await ctl.acquire()
+        order: list[str] = []
+
+        async def waiter(name: str, prio: str) -> None:
+            slot = await ctl.acquire(PRIORITY_CLASSES[prio])
+            order.append(name)
+            slot.release()
+
+        tasks = [
+            asyncio.create_task(waiter("batch", "batch")),
+            asyncio.create_task(waiter("default-1", "default")),
+            asyncio.create_task(waiter("interactive", "interactive")),
+            asyncio.create_task(waiter("default-2", "default")),
+        ]
+        await asyncio.sleep(0.01)
+        assert ctl.stats()["queued"] == 4
+        first.release()
+        await asyncio.gather(*tasks)
+        assert ctl.in_flight == 0
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "default-1", "default-2", "batch"]
+
+
+def test_full_queue_and_timeout_are_rejected():
+    async def run() -> None:
+        ctl = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=0.05)
+        slot = await ctl.acquire()
+        waiting = asyncio.create_task(ctl.acquire())
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await ctl.acquire()
+        assert full.value.status_code == 429
+        assert full.value.retry_after >= 1
+
+        with pytest.raises(AdmissionRejected) as timeout:
+            await waiting
+        assert timeout.value.status_code == 503
+
+        slot.release()
+        assert ctl.in_flight == 0
+        assert ctl.stats()["rejected"] == 1
+        assert ctl.stats()["timed_out"] == 1
+
+    asyncio.run(run())
+
+
+def test_overloaded_model_returns_429_with_retry_after():
+    app = create_app(
+        Settings(echo_mode=True, chat_model_id="local-chat", chat_max_in_flight=1, admission_max_queue=0)
+    )
+    release = threading.Event()
+
+    class SlowEngine(EchoEngine):
+        def generate_chat(self, messages, params):  # noqa: ANN001
+            release.wait(5.0)
+            return super().generate_chat(messages, params)
+
+    app.state.registry.chat_models["local-chat"] = SlowEngine(model_id="local-chat")
+    body = {"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]}
+
+    async def run() -> None:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            busy = asyncio.create_task(client.post("/v1/chat/completions", json=body))
+            await asyncio.sleep(0.05)
+            r = await client.post("/v1/chat/completions", json=body)
+            assert r.status_code == 429
+            assert int(r.headers["retry-after"]) >= 1
+            release.set()
+            assert (await busy).status_code == 200
+
+            status = (await client.get("/")).json()
+            assert status["admission"]["local-chat"]["in_flight"] == 0
+            assert status["admission"]["local-chat"]["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_timed_out_waiters_leave_the_queue():
+    async def run() -> None:
+        ctl = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.02)
+        slot = await ctl.acquire()
+        for _ in range(3):
+            with pytest.raises(AdmissionRejected):
+                await ctl.acquire()
+        assert ctl._waiters == [] and ctl.queued == 0
+        slot.release()
+        assert ctl.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_x_priority_header_needs_priority_header_setting():
+    from starlette.requests import Request
+
+    from app.api.v1.limits import request_priority
+
+    def priority(settings: Settings) -> int:
+        app = type("App", (), {"state": type("State", (), {"settings": settings})()})()
+        scope = {"type": "http", "app": app, "headers": [(b"x-priority", b"interactive")]}
+        return request_priority(Request(scope))
+
+    assert priority(Settings()) == PRIORITY_CLASSES["default"]
+    assert priority(Settings(priority_header=True)) == PRIORITY_CLASSES["interactive"]
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.async_engine import AsyncLLMEngine, create_engine_executor, iterate_in_executor
+from app.engine.base import GenerationParams, LLMEngine
+from app.engine.cancellation import CancelToken, GenerationCancelled
+from app.engine.echo_engine import EchoEngine
+from app.engine.serial import exclusive
+
+
+def test_iterate_in_executor_yields_items_and_propagates_errors():
+    executor = create_engine_executor(2)
+
+    def gen(n: int):
+        for i in range(n):
+            yield i
+        raise RuntimeError("boom")
+
+    async def run():
+        got = []
+        with pytest.raises(RuntimeError, match="boom"):
+            async for item in iterate_in_executor(executor, gen, 3):
+                got.append(item)
+        return got
+
+    try:
+        assert asyncio.run(run()) == [0, 1, 2]
+    finally:
+        executor.shutdown()
+
+
+def test_iterate_in_executor_closes_generator_when_consumer_stops():
+    executor = create_engine_executor(1)
+    closed = threading.Event()
+
+    def gen():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+                time.sleep(0.001)
+        finally:
+            closed.set()
+
+    async def run():
+        agen = iterate_in_executor(executor, gen)
+        async for item in agen:
+            if item >= 2:
+                break
+        await agen.aclose()
+
+    try:
+        asyncio.run(run())
+        assert closed.wait(2.0)
+    finally:
+        executor.shutdown()
+
+
+def test_iterate_in_executor_pauses_the_producer_for_a_slow_consumer():
+    executor = create_engine_executor(1)
+    produced = []
+
+    def gen():
+        for i in range(100):
+            produced.append(i)
+            yield i
+
+    async def run():
+        agen = iterate_in_executor(executor, gen, max_buffered=4)
+        assert await agen.__anext__() == 0
+        await asyncio.sleep(0.2)
+        # One item handed out, four queued, one waiting for room.
+        assert len(produced) <= 6
+        assert [item async for item in agen] == list(range(1, 100))
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown()
+
+
+def test_engines_that_are_not_thread_safe_run_one_call_at_a_time():
+    executor = create_engine_executor(4)
+    running = 0
+    overlap = 0
+    lock = threading.Lock()
+
+    class Unsafe(LLMEngine):
+        model_id = "unsafe"
+
+        def _enter(self) -> None:
+            nonlocal running, overlap
+            with lock:
+                running += 1
+                overlap = max(overlap, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+
+        def generate(self, prompt, params):  # noqa: ANN001
+            self._enter()
+            return prompt
+
+        def stream_generate(self, prompt, params):  # noqa: ANN001
+            self._enter()
+            yield prompt
+
+    async def run(engine: LLMEngine) -> None:
+        llm = AsyncLLMEngine(engine, executor)
+
+        async def stream() -> str:
+            return "".join([c async for c in llm.stream_generate("b", GenerationParams())])
+
+        results = await asyncio.gather(*(llm.generate("a", GenerationParams()) for _ in range(3)), stream(), stream())
+        assert results == ["a", "a", "a", "b", "b"]
+
+    try:
+        asyncio.run(run(Unsafe()))
+        assert overlap == 1
+
+        Unsafe.thread_safe = True
+        asyncio.run(run(Unsafe()))
+        assert overlap > 1
+    finally:
+        executor.shutdown()
+
+
+def test_waiting_for_a_busy_engine_gives_up_when_cancelled():
+    engine = LLMEngine()
+    with exclusive(engine):
+        started = time.monotonic()
+        with pytest.raises(GenerationCancelled):
+            with exclusive(engine, CancelToken.with_timeout(0.1)):
+                pass
+        assert time.monotonic() - started < 1
+    with exclusive(engine, CancelToken()):
+        pass
+
+
+def test_slow_generation_does_not_block_other_routes():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat"))
+    release = threading.Event()
+
+    class SlowEngine(EchoEngine):
+        def generate_chat(self, messages, params):  # noqa: ANN001
+            release.wait(5.0)
+            return super().generate_chat(messages, params)
+
+    app.state.registry.chat_models["local-chat"] = SlowEngine(model_id="local-chat")
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            chat = asyncio.create_task(
+                client.post(
+                    "/v1/chat/completions",
+                    json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]},
+                )
+            )
+            await asyncio.sleep(0.05)
+            models = await asyncio.wait_for(client.get("/v1/models"), timeout=2.0)
+            assert models.status_code == 200
+            assert not chat.done()
+            release.set()
+            r = await chat
+            assert r.status_code == 200
+            assert "hi" in r.json()["choices"][0]["message"]["content"]
+
+    asyncio.run(run())
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import struct
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.tts_base import TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+from app.utils.audio_wav import read_wav_mono_pcm16, write_wav_pcm16
+
+
+def test_roundtrips_wav_and_pcm():
+    pcm = struct.pack("<4h", 1, -1, 300, -300)
+    buf = AudioBuffer.from_wav(write_wav_pcm16(16000, pcm))
+    assert (buf.sample_rate, buf.channels, len(buf)) == (16000, 1, 4)
+    assert buf.duration == 4 / 16000
+    assert buf.pcm16 == pcm
+    assert buf.encode("pcm") == pcm
+    assert read_wav_mono_pcm16(buf.encode("wav")) == (16000, pcm)
+
+
+def test_from_float_clips_and_scales():
+    buf = AudioBuffer.from_float([0.0, 0.5, 2.0, -2.0], 8000)
+    assert buf.samples.tolist() == [0, 16383, 32767, -32767]
+
+
+def test_trim_repeat_prefix_is_in_place():
+    sr = 1000
+    prefix = struct.pack("<200h", *range(200))
+    tail = struct.pack("<300h", *([7] * 300))
+    buf = AudioBuffer.from_pcm16(prefix + prefix + tail, sr)
+    samples = buf.samples
+    assert buf.trim_repeat_prefix(max_prefix_seconds=1.0) == 200
+    assert buf.samples is samples
+    assert buf.pcm16 == prefix + tail
+
+
+class PCMEngine(TTSEngine):
+    model_id = "local-audio"
+
+    def __init__(self) -> None:
+        self.calls: list[str] = []
+
+    def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+        raise AssertionError("wav/pcm requests should use synthesize_audio")
+
+    def synthesize_audio(self, text, params, **kwargs):  # noqa: ANN001
+        self.calls.append(text)
+        return AudioBuffer.from_samples([len(text)] * 3, 22050)
+
+
+def test_speech_endpoint_encodes_engine_pcm_once_at_the_edge():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio"))
+    engine = PCMEngine()
+    app.state.registry.tts_models["local-audio"] = engine
+    client = TestClient(app)
+
+    r = client.post("/v1/audio/speech", json={"model": "local-audio", "input": "hey"})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "audio/wav"
+    assert read_wav_mono_pcm16(r.content) == (22050, struct.pack("<3h", 3, 3, 3))
+
+    r = client.post("/v1/audio/speech", json={"model": "local-audio", "input": "hey", "format": "pcm"})
+    assert r.status_code == 200
+    assert r.content == struct.pack("<3h", 3, 3, 3)
+    assert engine.calls == ["hey", "hey"]
@@ -1,6 +1,13 @@
 from __future__ import annotations
 
-from app.utils.audio_wav import read_wav_mono_pcm16, trim_repeat_prefix_pcm16, write_wav_pcm16
+import pytest
+
+from app.utils.audio_wav import (
+    find_repeat_prefix_frames,
+    read_wav_mono_pcm16,
+    trim_repeat_prefix_pcm16,
+    write_wav_pcm16,
+)
 
 
 def test_trim_repeat_prefix_pcm16_removes_duplicated_prefix():
@@ -29,3 +36,22 @@ def test_read_write_roundtrip_wav_pcm16():
     assert sr2 == sr
     assert pcm2 == pcm
 
+
+
+def test_similarity_threshold_catches_dithered_repeats():
+    np = pytest.importorskip("numpy")
+    sr = 8000
+    rng = np.random.default_rng(1)
+    body = (rng.standard_normal(sr * 3) * 3000).astype("<i2")
+    prefix = body[: int(sr * 0.6)]
+    dithered = (prefix + rng.integers(-2, 3, prefix.size)).astype("<i2")
+    pcm = np.concatenate([dithered, body]).tobytes()
+
+    assert find_repeat_prefix_frames(pcm, sample_rate=sr) == 0
+    assert find_repeat_prefix_frames(pcm, sample_rate=sr, similarity=0.98) == prefix.size
+    assert trim_repeat_prefix_pcm16(pcm, sample_rate=sr, similarity=0.98) == body.tobytes()
+
+    # Unrelated audio and leading silence are left alone.
+    assert find_repeat_prefix_frames(body.tobytes(), sample_rate=sr, similarity=0.9) == 0
+    silent = bytes(sr * 2) + body.tobytes()
+    assert find_repeat_prefix_frames(silent, sample_rate=sr, similarity=0.9) == 0
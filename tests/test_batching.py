@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import threading
+
+from app.engine.base import GenerationParams
+from app.engine.batching import BatchScheduler, StepOutput
+
+
+class FakeStepModel:
+    """Each sequence spells out its prompt upper-cased, one character per step."""
+
+    def __init__(self) -> None:
+        self.seqs: dict[int, list[str]] = {}
+        self.batch_sizes: list[int] = []
+        self.removed: list[int] = []
+        self.step_started = threading.Event()
+
+    def add(self, seq_id: int, prompt: str, params: GenerationParams) -> None:
+        self.seqs[seq_id] = list(prompt.upper())
+
+    def step(self) -> dict[int, StepOutput]:
+        self.batch_sizes.append(len(self.seqs))
+        self.step_started.set()
+        out = {}
+        for seq_id, remaining in self.seqs.items():
+            ch = remaining.pop(0)
+            out[seq_id] = StepOutput(text=ch, finished=not remaining)
+        return out
+
+    def remove(self, seq_id: int) -> None:
+        self.seqs.pop(seq_id, None)
+        self.removed.append(seq_id)
+
+
+def test_scheduler_batches_concurrent_requests():
+    model = FakeStepModel()
+    scheduler = BatchScheduler(model, max_batch_size=4)
+    prompts = [f"request-{i}-" + "x" * (i * 3) for i in range(8)]
+    results: dict[int, str] = {}
+
+    def run(i: int) -> None:
+        results[i] = "".join(scheduler.submit(prompts[i], GenerationParams(max_tokens=1000)))
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(prompts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5.0)
+    scheduler.close()
+
+    assert results == {i: p.upper() for i, p in enumerate(prompts)}
+    assert max(model.batch_sizes) > 1
+    assert max(model.batch_sizes) <= 4
+    # Everything that joined the batch has been retired again.
+    assert not model.seqs
+
+
+def test_scheduler_enforces_max_tokens():
+    scheduler = BatchScheduler(FakeStepModel(), max_batch_size=2)
+    out = "".join(scheduler.submit("abcdef", GenerationParams(max_tokens=3)))
+    scheduler.close()
+    assert out == "ABC"
+
+
+def test_scheduler_removes_abandoned_sequences():
+    model = FakeStepModel()
+    scheduler = BatchScheduler(model, max_batch_size=2)
+
+    stream = scheduler.submit("a" * 10_000, GenerationParams(max_tokens=100_000))
+    assert next(stream) == "A"
+    stream.close()
+
+    # The sequence leaves the batch at the next token boundary; later requests still run.
+    assert "".join(scheduler.submit("ok", GenerationParams())) == "OK"
+    scheduler.close()
+    assert 0 in model.removed
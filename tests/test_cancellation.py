@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.disconnect import cancel_on_disconnect
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.base import GenerationParams
+from app.engine.batching import BatchScheduler, StepOutput
+from app.engine.cancellation import CancelToken, DeadlineExceeded, GenerationCancelled, check_cancelled
+from app.engine.echo_engine import EchoEngine
+
+
+class SlowEngine(EchoEngine):
+    def __init__(self, model_id: str) -> None:
+        super().__init__(model_id=model_id)
+        self.stopped = threading.Event()
+
+    def stream_generate_chat(self, messages, params):  # noqa: ANN001
+        try:
+            for _ in range(1000):
+                check_cancelled(params.cancel)
+                time.sleep(0.01)
+                yield "x"
+        finally:
+            self.stopped.set()
+
+    def generate_chat(self, messages, params):  # noqa: ANN001
+        return "".join(self.stream_generate_chat(messages, params))
+
+
+def _app_with(engine: EchoEngine, **settings):
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", **settings))
+    app.state.registry.chat_models["local-chat"] = engine
+    return app
+
+
+def test_cancel_token_deadline():
+    token = CancelToken.with_timeout(0.01)
+    assert not token.cancelled
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        token.raise_if_cancelled()
+
+
+def test_non_stream_deadline_returns_504_and_stops_engine():
+    engine = SlowEngine("local-chat")
+    client = TestClient(_app_with(engine))
+    r = client.post(
+        "/v1/chat/completions",
+        json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}], "timeout": 0.1},
+    )
+    assert r.status_code == 504
+    assert engine.stopped.wait(2.0)
+
+
+def test_abandoned_call_keeps_its_admission_slot_until_the_engine_returns():
+    release = threading.Event()
+
+    class StubbornEngine(EchoEngine):
+        def generate_chat(self, messages, params):  # noqa: ANN001
+            release.wait(5.0)  # ignores the cancel token
+            return "late"
+
+    with TestClient(_app_with(StubbornEngine(model_id="local-chat"))) as client:
+        admission = client.app.state.registry.admission["local-chat"]
+        r = client.post(
+            "/v1/chat/completions",
+            json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}], "timeout": 0.1},
+        )
+        assert r.status_code == 504
+        assert admission.in_flight == 1
+
+        release.set()
+        deadline = time.monotonic() + 2.0
+        while admission.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert admission.in_flight == 0
+
+
+def test_server_request_timeout_caps_stream():
+    engine = SlowEngine("local-chat")
+    client = TestClient(_app_with(engine, request_timeout=0.1))
+    with client.stream(
+        "POST",
+        "/v1/chat/completions",
+        json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}], "stream": True},
+    ) as r:
+        body = b"".join(r.iter_bytes())
+    assert b"DeadlineExceeded" in body
+    assert body.endswith(b"data: [DONE]\n\n")
+    assert engine.stopped.wait(2.0)
+
+
+def test_cancel_on_disconnect_cancels_token():
+    class FakeRequest:
+        calls = 0
+
+        async def is_disconnected(self) -> bool:
+            self.calls += 1
+            return self.calls >= 3
+
+    async def run() -> CancelToken:
+        token = CancelToken()
+        async with cancel_on_disconnect(FakeRequest(), token, interval=0.001):  # type: ignore[arg-type]
+            for _ in range(200):
+                if token.cancelled:
+                    break
+                await asyncio.sleep(0.005)
+        return token
+
+    token = asyncio.run(run())
+    assert token.cancelled
+    assert token.reason == "client disconnected"
+
+
+def test_scheduler_fails_cancelled_sequences():
+    class Forever:
+        def add(self, seq_id, prompt, params):  # noqa: ANN001
+            pass
+
+        def step(self):
+            return {0: StepOutput(text="t")}
+
+        def remove(self, seq_id):  # noqa: ANN001
+            pass
+
+    scheduler = BatchScheduler(Forever())
+    token = CancelToken()
+    stream = scheduler.submit("p", GenerationParams(max_tokens=10**9, cancel=token))
+    assert next(stream) == "t"
+    token.cancel("client disconnected")
+    with pytest.raises(GenerationCancelled):
+        for _ in stream:
+            pass
+    scheduler.close()
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.engine.cancellation import CancelToken, GenerationCancelled
+from app.engine.command_tts import CommandTTSEngine
+from app.engine.tts_base import TTSParams
+from app.utils.audio_wav import read_wav_mono_pcm16
+
+TONE_TTS = [sys.executable, str(Path(__file__).with_name("tone_tts.py"))]
+
+
+def _tone(text: str) -> bytes:
+    return struct.pack(f"<{len(text)}h", *([len(text)] * len(text)))
+
+
+def test_oneshot_prespawns_and_replaces_workers():
+    engine = CommandTTSEngine("cmd", TONE_TTS, workers=2)
+    try:
+        assert engine.spawned == 2
+        sr, pcm = read_wav_mono_pcm16(engine.synthesize("Hello.", TTSParams()))
+        assert (sr, pcm) == (8000, _tone("Hello."))
+        assert engine.synthesize_audio("你好", TTSParams()).pcm16 == _tone("你好")
+        assert engine.spawned == 4
+
+        with pytest.raises(RuntimeError, match="cannot say that"):
+            engine.synthesize_audio("fail", TTSParams())
+        assert engine.synthesize_audio("ok", TTSParams()).pcm16 == _tone("ok")
+    finally:
+        engine.close()
+
+
+def test_oneshot_template_runs_per_request_and_reads_raw_pcm():
+    engine = CommandTTSEngine(
+        "cmd", [*TONE_TTS, "--format", "pcm", "--text", "{voice}:{text}"], output="pcm", sample_rate=16000
+    )
+    try:
+        assert engine.spawned == 0
+        audio = engine.synthesize_audio("hi", TTSParams(voice="v1"))
+        assert (audio.sample_rate, audio.pcm16) == (16000, _tone("v1:hi"))
+    finally:
+        engine.close()
+
+
+def test_persistent_workers_are_reused_and_recycled():
+    engine = CommandTTSEngine("cmd", [*TONE_TTS, "--persistent"], protocol="persistent", workers=1, max_requests=2)
+    try:
+        assert engine.synthesize_audio("one", TTSParams()).pcm16 == _tone("one")
+        assert engine.synthesize_audio("two", TTSParams()).pcm16 == _tone("two")
+        assert engine.spawned == 2 and engine.recycled == 1
+        assert engine.synthesize_audio("three", TTSParams()).pcm16 == _tone("three")
+
+        with pytest.raises(RuntimeError, match="cannot say that"):
+            engine.synthesize_audio("fail", TTSParams())
+        with pytest.raises(RuntimeError, match="exited"):
+            engine.synthesize_audio("crash", TTSParams())
+        assert engine.synthesize_audio("back", TTSParams()).pcm16 == _tone("back")
+    finally:
+        engine.close()
+
+
+def test_concurrency_is_limited_to_the_pool_and_waiters_can_cancel():
+    engine = CommandTTSEngine("cmd", [*TONE_TTS, "--persistent"], protocol="persistent", workers=1)
+    try:
+        held = engine._acquire(None)
+        cancel = CancelToken()
+        errors: list[BaseException] = []
+
+        def wait() -> None:
+            try:
+                engine.synthesize_audio("queued", TTSParams(cancel=cancel))
+            except BaseException as e:  # noqa: BLE001
+                errors.append(e)
+
+        t = threading.Thread(target=wait)
+        t.start()
+        time.sleep(0.2)
+        assert t.is_alive()
+        cancel.cancel()
+        t.join(timeout=5)
+        assert errors and isinstance(errors[0], GenerationCancelled)
+
+        engine._release(held)
+        assert engine.synthesize_audio("free", TTSParams()).pcm16 == _tone("free")
+    finally:
+        engine.close()
+
+
+def test_missing_command_fails_early():
+    with pytest.raises(RuntimeError, match="not found"):
+        CommandTTSEngine("cmd", "definitely-not-a-tts-binary --x")
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+
+from app.api.v1.encoding import ChatChunkEncoder
+from app.schemas.openai import ChatCompletionChunk, ChatCompletionChunkChoice, DeltaMessage
+
+
+def _reference(delta: DeltaMessage, finish_reason: str | None = None) -> bytes:
+    chunk = ChatCompletionChunk(
+        id="chatcmpl-1",
+        created=123,
+        model='local "chat"',
+        choices=[ChatCompletionChunkChoice(index=0, delta=delta, finish_reason=finish_reason)],
+    )
+    return f"data: {chunk.model_dump_json()}\n\n".encode("utf-8")
+
+
+def test_chunk_encoder_matches_pydantic_output():
+    enc = ChatChunkEncoder(resp_id="chatcmpl-1", created=123, model='local "chat"')
+
+    assert enc.role_event == _reference(DeltaMessage(role="assistant"))
+    assert enc.stop_event == _reference(DeltaMessage(), "stop")
+    for piece in ["hello", ' "quoted" \\ ', "line\nbreak\ttab", "中文 ✓ 😀", "\x00\x1f\x7f", " "]:
+        assert enc.content_event(piece) == _reference(DeltaMessage(content=piece))
+
+
+def test_content_event_is_valid_sse_json():
+    enc = ChatChunkEncoder(resp_id="x", created=1, model="m")
+    payload = enc.content_event("hi").decode("utf-8")
+    assert payload.startswith("data: ") and payload.endswith("\n\n")
+    assert json.loads(payload[len("data: ") :])["choices"][0]["delta"]["content"] == "hi"
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import _tts_warmup, create_app
+from app.config import Settings
+from app.engine.tts_base import TTSEngine
+from app.registry import ModelDescriptor
+from app.utils.audio_buffer import AudioBuffer
+
+
+class ToneEngine(TTSEngine):
+    def __init__(self) -> None:
+        self.model_id = "tone"
+        self.texts: list[str] = []
+
+    def synthesize_audio(self, text, params, **kwargs):  # noqa: ANN001
+        self.texts.append(text)
+        return AudioBuffer.from_samples([0] * len(text), 8000)
+
+
+def _wait_ready(client: TestClient, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        r = client.get("/health/ready")
+        if r.status_code == 200 or time.monotonic() > deadline:
+            return r
+        time.sleep(0.02)
+
+
+def test_models_load_in_the_background_and_warm_up_before_ready():
+    gate = threading.Event()
+    engine = ToneEngine()
+
+    def factory() -> ToneEngine:
+        gate.wait(5)
+        return engine
+
+    app = create_app(Settings(echo_mode=True, model_load="background", model_warmup_text="Warm."))
+    registry = app.state.registry
+
+    registry.register(ModelDescriptor("tone", "tts", factory, warmup=_tts_warmup(app.state.settings, {})))
+
+    with TestClient(app) as client:
+        assert client.get("/health/live").json() == {"status": "ok"}
+        r = client.get("/health/ready")
+        assert r.status_code == 503 and r.json()["status"] == "loading"
+        assert r.json()["models"]["tone"]["state"] in {"queued", "loading"}
+
+        gate.set()
+        r = _wait_ready(client)
+        assert r.status_code == 200, r.json()
+        models = r.json()["models"]
+        assert models["local-chat"]["state"] == models["tone"]["state"] == "ready"
+        assert models["local-chat"]["warmup_seconds"] is not None
+        assert engine.texts == ["Warm."]
+
+
+def test_models_are_queued_before_the_first_request(monkeypatch):
+    import app.app_factory as app_factory
+
+    release = threading.Event()
+    load_models = app_factory._load_models
+
+    def slow_start(registry, model_ids):  # noqa: ANN001
+        release.wait(5)  # the loader thread hasn't got anywhere yet
+        load_models(registry, model_ids)
+
+    monkeypatch.setattr(app_factory, "_load_models", slow_start)
+    app = create_app(Settings(echo_mode=True, model_load="background", model_warmup=False))
+    with TestClient(app) as client:
+        r = client.get("/health/ready")
+        assert r.status_code == 503 and r.json()["models"]["local-chat"]["state"] == "queued"
+        release.set()
+        assert _wait_ready(client).status_code == 200
+
+
+def test_failed_load_keeps_the_instance_out_of_rotation():
+    def broken():
+        raise OSError("weights missing")
+
+    app = create_app(Settings(echo_mode=True, model_load="background", model_warmup=False))
+    app.state.registry.register(ModelDescriptor("broken", "chat", broken))
+
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 5
+        while app.state.registry.state("broken") != "failed" and time.monotonic() < deadline:
+            time.sleep(0.02)
+        r = client.get("/health/ready")
+        assert r.status_code == 503
+        body = r.json()
+        assert body["status"] == "failed"
+        assert body["models"]["broken"]["error"] == "weights missing"
+        assert body["models"]["local-chat"]["state"] == "ready"
+        assert body["models"]["local-chat"]["warmup_seconds"] is None
+
+
+def test_lazy_mode_is_ready_without_loading():
+    app = create_app(Settings(echo_mode=True, model_load="lazy"))
+    with TestClient(app) as client:
+        r = client.get("/health/ready")
+        assert r.status_code == 200
+        assert r.json()["models"]["local-chat"]["state"] == "unloaded"
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import shlex
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.v1.openai import _generation_params
+from app.app_factory import create_app
+from app.config import Settings
+from app.manifest import load_manifest, parse_manifest
+from app.schemas.openai import ChatCompletionRequest
+
+TONE_TTS = shlex.join([sys.executable, str(Path(__file__).with_name("tone_tts.py"))])
+
+MANIFEST = f"""
+[[chat]]
+id = "small"
+backend = "echo"
+aliases = ["gpt-4o-mini"]
+max_in_flight = 1
+max_queue = 2
+
+[chat.defaults]
+temperature = 0.2
+max_tokens = 64
+
+[[chat]]
+id = "large"
+max_batch_size = 6
+
+[[tts]]
+id = "tone"
+backend = "command"
+command = '{TONE_TTS} --format pcm --text "{{voice}}:{{text}}"'
+command_output = "pcm"
+command_sample_rate = 16000
+aliases = ["tts-1"]
+
+[tts.defaults]
+voice = "alto"
+"""
+
+
+def _app(tmp_path: Path, **kw) -> TestClient:
+    path = tmp_path / "models.toml"
+    path.write_text(MANIFEST, encoding="utf-8")
+    return TestClient(create_app(Settings(model_manifest=str(path), **kw)))
+
+
+def test_manifest_declares_several_models_with_aliases_and_limits(tmp_path: Path):
+    client = _app(tmp_path, model_load="lazy")
+    registry = client.app.state.registry
+
+    ids = [m["id"] for m in client.get("/v1/models").json()["data"]]
+    assert ids == ["gpt-4o-mini", "large", "small", "tone", "tts-1"]
+    assert registry.admission["small"].max_in_flight == 1
+    assert registry.admission["small"].max_queue == 2
+    assert registry.admission["large"].max_in_flight == 6
+    assert client.app.state.settings.chat_model_id == "small"
+
+    messages = [{"role": "user", "content": "hi"}]
+    r = client.post("/v1/chat/completions", json={"model": "gpt-4o-mini", "messages": messages})
+    assert r.status_code == 200 and r.json()["model"] == "small"
+    assert client.post("/v1/chat/completions", json={"messages": messages}).json()["model"] == "small"
+    assert registry.is_loaded("small") and not registry.is_loaded("large")
+
+
+def test_manifest_defaults_fill_missing_request_fields(tmp_path: Path):
+    client = _app(tmp_path)
+    defaults = client.app.state.registry.defaults["small"]
+
+    params = _generation_params(ChatCompletionRequest(messages=[]), defaults=defaults)
+    assert (params.temperature, params.max_tokens, params.top_p) == (0.2, 64, 0.95)
+    params = _generation_params(ChatCompletionRequest(messages=[], temperature=1.0), defaults=defaults)
+    assert params.temperature == 1.0
+
+    def speak(**body) -> bytes:
+        r = client.post("/v1/audio/speech", json={"model": "tts-1", "input": "hi", "format": "pcm", **body})
+        assert r.status_code == 200
+        return r.content
+
+    assert len(speak()) == 2 * len("alto:hi")
+    assert len(speak(voice="bass")) == 2 * len("bass:hi")
+    client.app.state.registry.unload("tone")
+
+
+def test_json_manifest_and_validation(tmp_path: Path):
+    path = tmp_path / "models.json"
+    path.write_text(json.dumps({"chat": [{"id": "a", "aliases": "b", "prefix_cache_mb": 0}]}), encoding="utf-8")
+    (spec,) = load_manifest(path)
+    assert (spec.backend, spec.aliases, spec.options) == ("echo", ["b"], {"prefix_cache_mb": 0})
+    assert spec.settings(Settings()).chat_prefix_cache_mb == 0
+
+    with pytest.raises(ValueError, match="a: invalid option"):
+        parse_manifest({"tts": [{"id": "a", "onnx_intra_op_threads": "8,4"}]})
+    (spec,) = parse_manifest({"tts": [{"id": "a", "backend": "tone", "onnx_intra_op_threads": [8, "4"]}]})
+    assert spec.settings(Settings()).audio_onnx_intra_op_threads == (8, 4)
+
+    with pytest.raises(ValueError, match="unknown option 'warp'"):
+        parse_manifest({"chat": [{"id": "a", "warp": 9}]})
+    with pytest.raises(ValueError, match="declared twice"):
+        parse_manifest({"chat": [{"id": "a"}], "tts": [{"id": "b", "aliases": ["a"]}]})
+    with pytest.raises(ValueError, match="requires `path`"):
+        parse_manifest({"chat": [{"id": "a", "backend": "mlx"}]})
+    with pytest.raises(RuntimeError, match="MODEL_MANIFEST"):
+        create_app(Settings(model_manifest=str(tmp_path / "missing.toml")))
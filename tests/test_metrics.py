@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.metrics import Counter, Histogram
+from app.utils.audio_wav import write_wav_pcm16
+
+
+def test_histogram_renders_cumulative_buckets():
+    h = Histogram("lat_seconds", "Latency.", ("model",), buckets=(0.1, 1.0))
+    h.observe("m", value=0.05)
+    h.observe("m", value=0.5)
+    h.observe("m", value=5.0)
+    lines = h.render()
+    assert 'lat_seconds_bucket{model="m",le="0.1"} 1' in lines
+    assert 'lat_seconds_bucket{model="m",le="1"} 2' in lines
+    assert 'lat_seconds_bucket{model="m",le="+Inf"} 3' in lines
+    assert 'lat_seconds_count{model="m"} 3' in lines
+    assert 'lat_seconds_sum{model="m"} 5.55' in lines
+
+
+def test_counter_escapes_label_values():
+    c = Counter("x_total", "X.", ("model",))
+    c.inc('a"b', amount=2)
+    assert c.render() == ['x_total{model="a\\"b"} 2']
+
+
+def test_chat_usage_and_metrics_endpoint():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat"))
+    client = TestClient(app)
+    body = {"model": "local-chat", "messages": [{"role": "user", "content": "hello there"}]}
+
+    r = client.post("/v1/chat/completions", json=body)
+    assert r.status_code == 200
+    usage = r.json()["usage"]
+    assert usage["prompt_tokens"] > 0
+    assert usage["completion_tokens"] > 0
+    assert usage["total_tokens"] == usage["prompt_tokens"] + usage["completion_tokens"]
+
+    r = client.post("/v1/chat/completions", json={**body, "stream": True})
+    assert r.status_code == 200
+
+    m = client.get("/metrics")
+    assert m.status_code == 200
+    assert m.headers["content-type"].startswith("text/plain")
+    text = m.text
+    assert 'macoslocalapi_requests_total{model="local-chat",endpoint="chat.completions"} 2' in text
+    assert 'macoslocalapi_chat_time_to_first_token_seconds_count{model="local-chat"} 1' in text
+    assert 'macoslocalapi_chat_request_duration_seconds_count{model="local-chat"} 2' in text
+    assert 'macoslocalapi_prompt_tokens_total{model="local-chat"}' in text
+    assert 'macoslocalapi_in_flight{model="local-chat"} 0' in text
+    assert 'macoslocalapi_queue_depth{model="local-chat"} 0' in text
+
+
+def test_tts_latency_and_real_time_factor():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio"))
+
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            return write_wav_pcm16(16000, b"\x00\x00" * 16000)
+
+    app.state.registry.tts_models["local-audio"] = DummyEngine()  # type: ignore[assignment]
+    client = TestClient(app)
+
+    r = client.post("/v1/audio/speech", json={"model": "local-audio", "input": "hello"})
+    assert r.status_code == 200
+
+    metrics = app.state.metrics
+    assert metrics.tts_latency.count("local-audio") == 1
+    assert metrics.tts_rtf.count("local-audio") == 1
+    assert metrics.tts_audio_seconds.value("local-audio") == 1.0
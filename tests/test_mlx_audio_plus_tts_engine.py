@@ -1,74 +1,121 @@
 from __future__ import annotations
 
+import importlib
 from pathlib import Path
 
 import pytest
 
+from app.utils.audio_wav import read_wav_mono_pcm16
 
-def test_mlx_audio_plus_engine_calls_generate_audio(monkeypatch, tmp_path: Path):
-    # Import lazily to allow running tests even if mlx_audio isn't installed.
-    from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
 
-    calls = {}
+class FakeResult:
+    def __init__(self, audio, sample_rate=24000):
+        self.audio = audio
+        self.sample_rate = sample_rate
+
 
-    def fake_generate_audio(*, text, model, ref_audio=None, source_audio=None, ref_text=None, instruct_text=None, file_prefix, audio_format="wav", join_audio=False, verbose=True, **kw):
-        calls["text"] = text
-        calls["model"] = model
-        calls["ref_audio"] = ref_audio
-        calls["source_audio"] = source_audio
-        calls["ref_text"] = ref_text
-        calls["instruct_text"] = instruct_text
-        calls["file_prefix"] = file_prefix
-        calls["audio_format"] = audio_format
-        calls["join_audio"] = join_audio
-        calls["verbose"] = verbose
+class FakeModel:
+    sample_rate = 24000
 
-        # join_audio=True -> write single output file
-        out = Path(f"{file_prefix}.{audio_format}")
-        out.write_bytes(b"RIFF....WAVE")
+    def __init__(self):
+        self.calls = []
 
-    # Patch the underlying import target function
-    import importlib
+    def generate(self, text="", ref_audio=None, ref_text=None, instruct_text=None, source_audio=None, verbose=True):
+        self.calls.append(
+            dict(text=text, ref_audio=ref_audio, ref_text=ref_text, instruct_text=instruct_text, verbose=verbose)
+        )
+        # Two segments, like a long input split by the model.
+        yield FakeResult([0.0, 0.5] * 100)
+        yield FakeResult([-0.5, 1.5] * 100)
 
+
+@pytest.fixture
+def fake_mlx_audio(monkeypatch):
+    # Patch the underlying import targets; skip where mlx_audio isn't installed.
     try:
+        utils_mod = importlib.import_module("mlx_audio.tts.utils")
         gen_mod = importlib.import_module("mlx_audio.tts.generate")
     except Exception:
         pytest.skip("mlx_audio not importable in this environment")
 
-    monkeypatch.setattr(gen_mod, "generate_audio", fake_generate_audio, raising=True)
+    state = {"loads": 0, "model": FakeModel(), "audio_loads": []}
+
+    def fake_load_model(model_path, **kw):
+        state["loads"] += 1
+        state["model_path"] = model_path
+        return state["model"]
+
+    def fake_load_audio(path, sample_rate=24000, **kw):
+        state["audio_loads"].append((path, sample_rate))
+        return [0.0] * 10
+
+    monkeypatch.setattr(utils_mod, "load_model", fake_load_model, raising=True)
+    monkeypatch.setattr(gen_mod, "load_audio", fake_load_audio, raising=True)
+    return state
+
+
+def test_mlx_audio_plus_engine_loads_model_once(fake_mlx_audio):
+    from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
 
     engine = MLXAudioPlusTTSEngine(model_id="local-audio", model_path="mlx-community/fake")
-    audio = engine.synthesize("hello", params=None, format="wav", ref_text="x")  # type: ignore[arg-type]
+    a = engine.synthesize("hello", params=None, format="wav", ref_text="x")  # type: ignore[arg-type]
+    b = engine.synthesize("again", params=None, format="wav")  # type: ignore[arg-type]
 
-    assert audio.startswith(b"RIFF")
-    assert calls["text"] == "hello"
-    assert calls["model"] == "mlx-community/fake"
-    assert calls["audio_format"] == "wav"
-    assert calls["join_audio"] is True
-    assert calls["verbose"] is False
+    assert fake_mlx_audio["loads"] == 1
+    assert fake_mlx_audio["model_path"] == "mlx-community/fake"
+    calls = fake_mlx_audio["model"].calls
+    assert [c["text"] for c in calls] == ["hello", "again"]
+    assert calls[0]["ref_text"] == "x"
+    assert calls[0]["verbose"] is False
+    assert a == b
 
 
-def test_mlx_audio_plus_engine_picks_numbered_output(monkeypatch, tmp_path: Path):
-    # With join_audio=True, numbered outputs shouldn't matter, but keep fallback behavior.
+def test_mlx_audio_plus_engine_joins_segments_in_memory(fake_mlx_audio, tmp_path: Path):
     from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
 
-    def fake_generate_audio(*, file_prefix, audio_format="wav", join_audio=False, **kwargs):
-        parent = Path(file_prefix).parent
-        if join_audio:
-            (parent / f"speech.{audio_format}").write_bytes(b"JOINED")
-        else:
-            (parent / f"speech_000.{audio_format}").write_bytes(b"FIRST")
-            (parent / f"speech_001.{audio_format}").write_bytes(b"SECOND")
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"RIFF")
 
-    import importlib
+    engine = MLXAudioPlusTTSEngine(model_id="local-audio", model_path="mlx-community/fake")
+    audio = engine.synthesize("hello", params=None, format="wav", ref_audio=str(ref))  # type: ignore[arg-type]
+
+    assert fake_mlx_audio["audio_loads"] == [(str(ref), 24000)]
+    sr, pcm = read_wav_mono_pcm16(audio)
+    assert sr == 24000
+    # Both segments, clipped to int16.
+    assert len(pcm) == 400 * 2
+    assert pcm[:4] == b"\x00\x00\xff\x3f"
+    assert pcm[-2:] == (32767).to_bytes(2, "little")
 
-    try:
-        gen_mod = importlib.import_module("mlx_audio.tts.generate")
-    except Exception:
-        pytest.skip("mlx_audio not importable in this environment")
 
-    monkeypatch.setattr(gen_mod, "generate_audio", fake_generate_audio, raising=True)
+def test_mlx_audio_plus_engine_missing_ref_audio_is_value_error(fake_mlx_audio):
+    from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
 
     engine = MLXAudioPlusTTSEngine(model_id="local-audio", model_path="mlx-community/fake")
-    audio = engine.synthesize("hello", params=None, format="wav")  # type: ignore[arg-type]
-    assert audio == b"JOINED"
+    with pytest.raises(ValueError):
+        engine.synthesize("hello", params=None, ref_audio="/nope/missing.wav")  # type: ignore[arg-type]
+
+
+def test_mlx_audio_plus_engine_caches_reference_audio(fake_mlx_audio, tmp_path: Path):
+    from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
+
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"RIFF")
+
+    engine = MLXAudioPlusTTSEngine(model_id="local-audio", model_path="mlx-community/fake", ref_cache_bytes=1 << 20)
+    for _ in range(3):
+        engine.synthesize("hello", params=None, ref_audio=str(ref), ref_text="hi")  # type: ignore[arg-type]
+    engine.synthesize("hello", params=None, ref_audio=b"RIFF-bytes", ref_text="hi")  # type: ignore[arg-type]
+    engine.synthesize("hello", params=None, ref_audio=b"RIFF-bytes", ref_text="hi")  # type: ignore[arg-type]
+
+    assert len(fake_mlx_audio["audio_loads"]) == 2
+    assert engine.stats()["ref_cache"]["hits"] == 3
+
+
+def test_mlx_audio_plus_engine_rejects_aac_explicitly():
+    from app.engine.mlx_audio_plus_tts import MLXAudioPlusTTSEngine
+    from app.utils.audio_buffer import AudioBuffer
+
+    assert MLXAudioPlusTTSEngine._guess_audio_format("AAC") == "aac"
+    with pytest.raises(ValueError, match="aac"):
+        MLXAudioPlusTTSEngine._encode(AudioBuffer.from_samples([0] * 10, 24000), "aac")
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from app.engine.mlx_capabilities import MLXCapabilities, introspect, load_capabilities
+
+
+# Signatures shaped like two generations of mlx-lm.
+def old_stream_generate(model, tokenizer, prompt, max_tokens=100, **kwargs): ...  # noqa: ANN001
+
+
+def old_generate_step(prompt, model, temp=0.0, repetition_penalty=None, top_p=1.0, logit_bias=None): ...  # noqa: ANN001
+
+
+def new_stream_generate(model, tokenizer, prompt, max_tokens=256, draft_model=None, **kwargs): ...  # noqa: ANN001
+
+
+def new_generate_step(prompt, model, *, max_tokens=256, sampler=None, logits_processors=None): ...  # noqa: ANN001
+
+
+def make_sampler(temp=0.0, top_p=0.0, min_p=0.0, top_k=-1): ...  # noqa: ANN001
+
+
+def test_introspection_follows_kwargs_into_generate_step():
+    old = introspect(old_stream_generate, old_generate_step)
+    assert old == MLXCapabilities(kwargs=("temp", "top_p"))
+    assert old.temp_kw == "temp"
+    assert old.generation_kwargs(0.3, 0.9) == {"temp": 0.3, "top_p": 0.9}
+
+    new = introspect(new_stream_generate, new_generate_step, make_sampler)
+    assert new == MLXCapabilities(kwargs=("sampler",), sampler_kwargs=("temp", "top_p"))
+    assert new.temp_kw is None
+
+    # Without **kwargs nothing reaches generate_step; without a signature nothing is assumed.
+    assert introspect(lambda model, tokenizer, prompt: None, old_generate_step).kwargs == ()
+    assert introspect(new_stream_generate, None).kwargs == ()
+
+
+def test_capabilities_are_cached_per_version_and_model(tmp_path: Path):
+    cache = tmp_path / "caps.json"
+    calls = []
+
+    def detect() -> MLXCapabilities:
+        calls.append(1)
+        return MLXCapabilities(kwargs=("temp", "top_p"))
+
+    caps, cached = load_capabilities("m1", cache_path=cache, detect=detect, version="0.20.0")
+    assert (caps.kwargs, cached) == (("temp", "top_p"), False)
+    caps, cached = load_capabilities("m1", cache_path=cache, detect=detect, version="0.20.0")
+    assert (caps.kwargs, cached) == (("temp", "top_p"), True)
+    assert len(calls) == 1
+
+    load_capabilities("m1", cache_path=cache, detect=detect, version="0.21.0")
+    load_capabilities("m2", cache_path=cache, detect=detect, version="0.20.0")
+    assert len(calls) == 3
+    assert sorted(json.loads(cache.read_text())) == ["0.20.0|m1", "0.20.0|m2", "0.21.0|m1"]
+
+    _, cached = load_capabilities("m1", cache_path=cache, detect=detect, version="0.20.0", force=True)
+    assert not cached and len(calls) == 4
+
+
+def test_unreadable_cache_only_costs_a_detection(tmp_path: Path):
+    cache = tmp_path / "caps.json"
+    cache.write_text("{not json", encoding="utf-8")
+    caps, cached = load_capabilities(
+        "m", cache_path=cache, detect=lambda: MLXCapabilities(("sampler",), ("temp",)), version="1"
+    )
+    assert not cached and caps.sampler_kwargs == ("temp",)
+    assert json.loads(cache.read_text())["1|m"] == {"kwargs": ["sampler"], "sampler_kwargs": ["temp"]}
@@ -1,3 +1,5 @@
+import json
+
 from fastapi.testclient import TestClient
 
 from app.app_factory import create_app
@@ -50,3 +52,33 @@ def test_chat_completions_stream():
         assert r.status_code == 200
         body = b"".join(list(r.iter_bytes()))
     assert b"data: [DONE]" in body
+
+
+def test_chat_completions_stream_usage():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat"))
+    client = TestClient(app)
+    admission = app.state.registry.admission["local-chat"]
+    engine = app.state.registry.chat_models["local-chat"]
+    in_flight_while_counting: list[int] = []
+    count_tokens = engine.count_tokens
+
+    def counting(text):  # noqa: ANN001
+        in_flight_while_counting.append(admission.in_flight)
+        return count_tokens(text)
+
+    engine.count_tokens = counting
+    request = {"model": "local-chat", "messages": [{"role": "user", "content": "hi"}], "stream": True}
+    with client.stream("POST", "/v1/chat/completions", json=request) as r:
+        events = [line for line in r.iter_lines() if line.startswith("data: ")]
+    assert not any('"usage"' in e for e in events)
+
+    request["stream_options"] = {"include_usage": True}
+    with client.stream("POST", "/v1/chat/completions", json=request) as r:
+        events = [line for line in r.iter_lines() if line.startswith("data: ")]
+    assert events[-1] == "data: [DONE]"
+    last = json.loads(events[-2][len("data: "):])
+    assert last["choices"] == []
+    usage = client.post("/v1/chat/completions", json={**request, "stream": False}).json()["usage"]
+    assert last["usage"] == usage and usage["total_tokens"] > 0
+    # Token counting happens after the admission slot is given back.
+    assert in_flight_while_counting[:2] == [0, 0]
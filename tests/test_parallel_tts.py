@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import functools
+import struct
+import time
+
+import pytest
+
+from app.app_factory import _build_tts_engine
+from app.config import Settings
+from app.engine.parallel_tts import ParallelTTSEngine
+from app.engine.tts_base import TTSEngine, TTSParams
+from app.utils.audio_buffer import AudioBuffer
+from app.utils.audio_wav import read_wav_mono_pcm16, write_wav_pcm16
+
+SENTENCES = ["One two three.", "Four five!", "Six?", "Seven eight nine ten.", "Eleven."]
+TEXT = " ".join(SENTENCES)
+
+
+class SlowToneEngine(TTSEngine):
+    """One sample per character, valued by sentence length; sleeps per call."""
+
+    thread_safe = True
+
+    def __init__(self, model_id: str = "tone", delay: float = 0.0) -> None:
+        self.model_id = model_id
+        self.delay = delay
+        self.calls: list[str] = []
+
+    def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+        self.calls.append(text)
+        time.sleep(self.delay)
+        return write_wav_pcm16(8000, _tone(text))
+
+
+def _tone(text: str) -> bytes:
+    return struct.pack(f"<{len(text)}h", *([len(text)] * len(text)))
+
+
+def test_crossfade_blends_seams_and_shortens_output():
+    a = AudioBuffer.from_samples([1000] * 4, 1000)
+    b = AudioBuffer.from_samples([0] * 4, 1000)
+    out = AudioBuffer.concat([a, b], crossfade_ms=3)
+    assert out.samples.tolist() == [1000, 1000, 500, 0, 0]
+    assert AudioBuffer.concat([a, b]).samples.tolist() == [1000] * 4 + [0] * 4
+    assert a.samples.tolist() == [1000] * 4
+
+
+def test_long_text_is_synthesized_in_parallel_and_in_order():
+    inner = SlowToneEngine(delay=0.2)
+    engine = ParallelTTSEngine(inner, workers=len(SENTENCES), min_chars=10, crossfade_ms=0)
+    try:
+        t0 = time.perf_counter()
+        wav = engine.synthesize(TEXT, TTSParams())
+        elapsed = time.perf_counter() - t0
+    finally:
+        engine.close()
+
+    assert sorted(inner.calls) == sorted(SENTENCES)
+    assert elapsed < 0.2 * len(SENTENCES) * 0.6
+    _, pcm = read_wav_mono_pcm16(wav)
+    assert pcm == b"".join(_tone(s) for s in SENTENCES)
+
+
+def test_short_text_and_streaming_fall_through():
+    inner = SlowToneEngine()
+    engine = ParallelTTSEngine(inner, workers=2, min_chars=1000)
+    try:
+        engine.synthesize(TEXT, TTSParams())
+        assert inner.calls == [TEXT]
+
+        engine.min_chars = 10
+        chunks = list(engine.stream_synthesize(TEXT, TTSParams()))
+        assert [bytes(c.pcm16) for c in chunks] == [_tone(s) for s in SENTENCES]
+    finally:
+        engine.close()
+
+
+def test_process_mode_builds_engines_in_workers():
+    factory = functools.partial(SlowToneEngine, model_id="tone")
+    engine = ParallelTTSEngine(factory(), workers=2, mode="process", factory=factory, min_chars=10, crossfade_ms=0)
+    try:
+        wav = engine.synthesize(TEXT, TTSParams())
+    finally:
+        engine.close()
+    _, pcm = read_wav_mono_pcm16(wav)
+    assert pcm == b"".join(_tone(s) for s in SENTENCES)
+
+
+class UnsafeToneEngine(SlowToneEngine):
+    thread_safe = False
+
+
+def test_thread_mode_needs_a_thread_safe_engine():
+    with pytest.raises(ValueError, match="thread-safe"):
+        ParallelTTSEngine(UnsafeToneEngine(), workers=2)
+
+    settings = Settings(audio_parallel_workers=2, audio_parallel_mode="thread", audio_parallel_min_chars=10)
+    engine = _build_tts_engine(settings, functools.partial(UnsafeToneEngine, model_id="tone"))
+    try:
+        assert isinstance(engine, ParallelTTSEngine) and engine.mode == "process"
+    finally:
+        engine.close()
+
+    settings = Settings(audio_parallel_workers=2, audio_parallel_mode="thread", engine_processes=True)
+    assert isinstance(_build_tts_engine(settings, functools.partial(UnsafeToneEngine, model_id="tone")), UnsafeToneEngine)
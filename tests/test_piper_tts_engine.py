@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import sys
+import types
+from dataclasses import dataclass
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.engine.tts_base import TTSParams
+from app.utils.audio_wav import read_wav_mono_pcm16
+
+
+@dataclass
+class SynthesisConfig:
+    """The fields of piper-tts 1.4's `SynthesisConfig` the engine uses."""
+
+    speaker_id: int | None = None
+    length_scale: float | None = None
+    normalize_audio: bool = True
+    volume: float = 1.0
+
+
+class FakeVoice:
+    """piper-tts 1.2-style voice: one "phoneme" per character, one sample per phoneme id."""
+
+    config = SimpleNamespace(sample_rate=16000, length_scale=1.0)
+
+    def __init__(self) -> None:
+        self.phonemized: list[str] = []
+        self.inferred: list[list[int]] = []
+
+    def phonemize(self, text: str) -> list[list[str]]:
+        self.phonemized.append(text)
+        return [list(text)]
+
+    def phonemes_to_ids(self, phonemes: list[str]) -> list[int]:
+        return [ord(p) for p in phonemes]
+
+    def synthesize(self, text):  # noqa: ANN001
+        for phonemes in self.phonemize(text):
+            ids = self.phonemes_to_ids(phonemes)
+            self.inferred.append(ids)
+            yield ids, self.config.sample_rate
+
+
+class FakeVoice13(FakeVoice):
+    """piper-tts >= 1.3-style voice: float samples, normalized by `synthesize` (as piper does)."""
+
+    def phoneme_ids_to_audio(self, ids, syn_config=None):  # noqa: ANN001
+        self.inferred.append(list(ids))
+        audio = np.array(ids, dtype=np.float32) * 1e-4
+        if syn_config is not None and syn_config.speaker_id:
+            audio = audio + syn_config.speaker_id * 1e-3
+        if syn_config is not None and syn_config.length_scale:
+            audio = np.resize(audio, round(len(audio) * syn_config.length_scale))
+        return audio
+
+    def synthesize(self, text, syn_config=None):  # noqa: ANN001
+        syn_config = syn_config or SynthesisConfig()
+        for phonemes in self.phonemize(text):
+            audio = self.phoneme_ids_to_audio(self.phonemes_to_ids(phonemes), syn_config)
+            if syn_config.normalize_audio:
+                audio = audio / np.max(np.abs(audio))
+            audio = np.clip(audio * syn_config.volume, -1.0, 1.0)
+            pcm = (audio * 32767).astype("<i2").tobytes()
+            yield SimpleNamespace(audio_int16_bytes=pcm, sample_rate=self.config.sample_rate)
+
+
+def _install_fake_piper(monkeypatch, voice) -> None:  # noqa: ANN001
+    # A stand-in `piper` package, so these tests run without piper-tts installed.
+    piper = types.ModuleType("piper")
+    piper_voice = types.ModuleType("piper.voice")
+    piper_voice.PiperVoice = SimpleNamespace(load=lambda path, *a, **k: voice)
+    piper.voice = piper_voice
+    piper.SynthesisConfig = SynthesisConfig
+    monkeypatch.setitem(sys.modules, "piper", piper)
+    monkeypatch.setitem(sys.modules, "piper.voice", piper_voice)
+
+
+@pytest.fixture
+def voice(monkeypatch, tmp_path):
+    voice = FakeVoice()
+    _install_fake_piper(monkeypatch, voice)
+    (tmp_path / "voice.onnx").write_bytes(b"")
+    return voice
+
+
+def _expected(text: str) -> bytes:
+    return b"".join(ord(c).to_bytes(2, "little", signed=True) for c in text)
+
+
+def test_sentences_are_memoized_across_requests(voice, tmp_path):
+    from app.engine.piper_tts import PiperTTSEngine
+
+    engine = PiperTTSEngine("piper", str(tmp_path / "voice.onnx"), segment_cache_bytes=1 << 20)
+    params = TTSParams()
+
+    sr, pcm = read_wav_mono_pcm16(engine.synthesize("Hello there. Thanks for calling!", params))
+    assert sr == 16000
+    assert pcm == _expected("Hello there.") + _expected("Thanks for calling!")
+
+    _, pcm = read_wav_mono_pcm16(engine.synthesize("Bye now.  Thanks  for calling!", params))
+    assert pcm == _expected("Bye now.") + _expected("Thanks for calling!")
+    assert voice.phonemized == ["Hello there.", "Thanks for calling!", "Bye now."]
+
+    # Speed is part of the key.
+    engine.synthesize("Bye now.", TTSParams(speed=1.5))
+    assert voice.phonemized[-1] == "Bye now."
+
+    stats = engine.stats()["segment_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+
+    # Streaming reuses the same memo and hands out copies.
+    chunks = list(engine.stream_synthesize("Hello there.", params))
+    chunks[0].samples[0] = 0
+    assert engine.synthesize_audio("Hello there.", params).pcm16 == _expected("Hello there.")
+
+
+def test_memoized_sentences_are_normalized_like_piper(monkeypatch, tmp_path):
+    from app.engine.piper_tts import PiperTTSEngine
+
+    voice = FakeVoice13()
+    _install_fake_piper(monkeypatch, voice)
+    (tmp_path / "voice.onnx").write_bytes(b"")
+    params = TTSParams()
+    text = "Thanks for calling!"  # one sentence, so piper and the memo split it alike
+
+    plain = PiperTTSEngine("piper", str(tmp_path / "voice.onnx")).synthesize_audio(text, params)
+    memo = PiperTTSEngine("piper", str(tmp_path / "voice.onnx"), segment_cache_bytes=1 << 20)
+    assert memo.synthesize_audio(text, params) == plain
+    assert max(plain.samples) == 32767
+
+
+def test_memoized_sentences_match_piper_at_other_speeds_and_speakers(monkeypatch, tmp_path):
+    from app.engine.piper_tts import PiperTTSEngine
+
+    voice = FakeVoice13()
+    _install_fake_piper(monkeypatch, voice)
+    (tmp_path / "voice.onnx").write_bytes(b"")
+    text = "Thanks for calling!"
+    plain = PiperTTSEngine("piper", str(tmp_path / "voice.onnx"))
+    memo = PiperTTSEngine("piper", str(tmp_path / "voice.onnx"), segment_cache_bytes=1 << 20)
+
+    default = plain.synthesize_audio(text, TTSParams())
+    for params in (TTSParams(speed=1.5), TTSParams(speaker_id=3), TTSParams(speed=0.8, speaker_id=1)):
+        expected = plain.synthesize_audio(text, params)
+        assert expected != default
+        assert memo.synthesize_audio(text, params) == expected
+        assert memo.synthesize_audio(text, params) == expected  # from the memo
+    assert memo.stats()["segment_cache"]["hits"] == 3
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from app.engine.prefix_cache import PrefixCache
+
+
+def test_lookup_returns_longest_stored_prefix():
+    cache: PrefixCache[str] = PrefixCache(max_bytes=1000)
+    cache.insert([1, 2, 3], "turn1", 10)
+    cache.insert([1, 2, 3, 4, 5, 6], "turn2", 10)
+
+    m = cache.lookup([1, 2, 3, 4, 5, 6, 7, 8])
+    assert m is not None
+    assert (m.value, m.matched, m.tokens) == ("turn2", 6, (1, 2, 3, 4, 5, 6))
+
+    m = cache.lookup([1, 2, 3, 9])
+    assert m is not None
+    assert m.matched == 3
+
+    assert cache.lookup([7, 8]) is None
+
+
+def test_partial_match_requires_trimming():
+    cache: PrefixCache[str] = PrefixCache(max_bytes=1000)
+    # e.g. shared system prompt [1, 2, 3] followed by a different user turn.
+    cache.insert([1, 2, 3, 10, 11], "a", 10)
+
+    m = cache.lookup([1, 2, 3, 20, 21])
+    assert m is not None
+    assert m.value == "a"
+    assert m.matched == 3
+    assert len(m.tokens) - m.matched == 2
+
+    assert cache.lookup([1, 2, 3, 20, 21], allow_partial=False) is None
+
+
+def test_lru_eviction_respects_byte_budget_and_stats():
+    cache: PrefixCache[str] = PrefixCache(max_bytes=25)
+    cache.insert([1, 1], "a", 10)
+    cache.insert([2, 2], "b", 10)
+    assert cache.lookup([1, 1, 5]) is not None  # refresh "a"
+    cache.insert([3, 3], "c", 10)  # evicts "b"
+
+    assert cache.nbytes == 20
+    assert cache.lookup([2, 2, 5]) is None
+    assert cache.lookup([3, 3, 5]).value == "c"  # type: ignore[union-attr]
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["reused_tokens"] == 4
+
+
+def test_eviction_keeps_remaining_branches_reachable():
+    cache: PrefixCache[str] = PrefixCache(max_bytes=20)
+    cache.insert([1, 2, 3], "a", 10)
+    cache.insert([1, 2, 4], "b", 10)
+    cache.insert([9], "c", 10)  # evicts "a"
+
+    m = cache.lookup([1, 2, 4, 7])
+    assert m is not None
+    assert (m.value, m.matched) == ("b", 3)
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import functools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.base import GenerationParams
+from app.engine.cancellation import CancelToken, DeadlineExceeded, GenerationCancelled
+from app.engine.echo_engine import EchoEngine
+from app.engine.process_engine import EngineWorkerCrashed, ProcessLLMEngine, ProcessTTSEngine, _WorkerChannel
+from app.engine.tone_tts import ToneTTSEngine
+from app.engine.tts_base import TTSParams
+from app.schemas.openai import ChatMessage
+
+
+@pytest.fixture
+def chat():
+    engine = ProcessLLMEngine(functools.partial(EchoEngine, model_id="echo"), channels=2)
+    try:
+        yield engine
+    finally:
+        engine.close()
+
+
+@pytest.fixture
+def tts():
+    engine = ProcessTTSEngine(functools.partial(ToneTTSEngine, model_id="tone"), channels=2)
+    try:
+        yield engine
+    finally:
+        engine.close()
+
+
+def test_chat_calls_and_streams_cross_the_process(chat: ProcessLLMEngine):
+    local = EchoEngine(model_id="echo")
+    messages = [ChatMessage(role="user", content="hello there")]
+    params = GenerationParams(max_tokens=32)
+
+    assert chat.model_id == "echo" and chat.pid != os.getpid()
+    assert chat.generate_chat(messages, params) == local.generate_chat(messages, params)
+    assert "".join(chat.stream_generate_chat(messages, params)) == local.generate_chat(messages, params)
+    assert chat.count_chat_tokens(messages) == local.count_chat_tokens(messages)
+    assert chat.stats()["process"] == {"pid": chat.pid, "restarts": 0}
+
+
+def test_audio_comes_back_through_shared_memory(tts: ProcessTTSEngine):
+    local = ToneTTSEngine(model_id="tone")
+    params = TTSParams()
+
+    assert tts.synthesize_audio("hi", params) == local.synthesize_audio("hi", params)
+    # Long enough to outgrow the initial segment.
+    text = "x" * 2000
+    audio = tts.synthesize_audio(text, params)
+    assert len(audio.pcm16) > 1 << 20 and audio == local.synthesize_audio(text, params)
+    assert tts.synthesize("hi", params, format="pcm") == local.synthesize("hi", params, format="pcm")
+
+    chunks = list(tts.stream_synthesize("abc.", params))
+    assert b"".join(bytes(c.pcm16) for c in chunks) == bytes(local.synthesize_audio("abc.", params).pcm16)
+
+
+def test_cancel_reaches_the_worker_mid_call(tts: ProcessTTSEngine):
+    cancel = CancelToken()
+    threading.Timer(0.2, cancel.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(GenerationCancelled):
+        tts.synthesize_audio("x" * 100_000, TTSParams(cancel=cancel))
+    assert time.monotonic() - started < 5
+    # The channel is reusable afterwards.
+    assert len(tts.synthesize_audio("hi", TTSParams())) == 2 * ToneTTSEngine(model_id="tone").frames_per_char
+
+
+def test_engine_errors_and_early_closed_streams_keep_the_channel():
+    engine = ProcessTTSEngine(functools.partial(ToneTTSEngine, model_id="tone"), channels=1)
+    try:
+        for _ in range(3):
+            with pytest.raises(ValueError):
+                engine.synthesize("hi", TTSParams(), format="bogus")
+        for _ in range(3):
+            chunks = engine.stream_synthesize("One. Two. Three.", TTSParams())
+            next(chunks)
+            chunks.close()
+        assert engine._free.qsize() == 1
+        assert len(engine.synthesize_audio("hi", TTSParams())) == 2 * ToneTTSEngine(model_id="tone").frames_per_char
+    finally:
+        engine.close()
+
+
+def test_waiting_for_a_channel_honours_the_deadline():
+    engine = ProcessTTSEngine(functools.partial(ToneTTSEngine, model_id="tone"), channels=1)
+    busy = CancelToken()
+
+    def hog_the_channel() -> None:
+        with pytest.raises(GenerationCancelled):
+            engine.synthesize_audio("x" * 100_000, TTSParams(cancel=busy))
+
+    hog = threading.Thread(target=hog_the_channel)
+    hog.start()
+    try:
+        time.sleep(0.2)
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            engine.synthesize_audio("hi", TTSParams(cancel=CancelToken.with_timeout(0.2)))
+        assert time.monotonic() - started < 2
+    finally:
+        busy.cancel()
+        hog.join()
+        engine.close()
+
+
+def test_worker_channels_take_turns_on_engines_that_are_not_thread_safe():
+    running = 0
+    overlap = 0
+    lock = threading.Lock()
+
+    class Unsafe(ToneTTSEngine):
+        thread_safe = False
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            nonlocal running, overlap
+            with lock:
+                running += 1
+                overlap = max(overlap, running)
+            time.sleep(0.05)
+            with lock:
+                running -= 1
+            return super().synthesize(text, params, format=format, **kwargs)
+
+    engine = Unsafe(model_id="tone")
+    pipes = [multiprocessing.Pipe() for _ in range(3)]
+    for _, child in pipes:
+        channel = _WorkerChannel(child, multiprocessing.RawValue("b", 0))
+        threading.Thread(target=channel.serve, args=(engine, {"synthesize"}), daemon=True).start()
+    for parent, _ in pipes:
+        parent.send(("call", "synthesize", ("hi", TTSParams()), {"format": "pcm"}, None))
+    replies = [parent.recv() for parent, _ in pipes]
+    for parent, child in pipes:
+        parent.close()
+        child.close()
+
+    assert [op for op, _ in replies] == ["value"] * 3
+    assert overlap == 1
+
+
+def test_restart_messages_are_rate_limited(tts: ProcessTTSEngine, capsys):
+    for i in range(3):
+        tts._log(f"[process] restart {i}")
+    tts._logged_at -= 60
+    tts._log("[process] restart 3")
+    assert capsys.readouterr().out.splitlines() == [
+        "[process] restart 0",
+        "[process] restart 3 (2 similar messages suppressed)",
+    ]
+
+
+def test_crashed_worker_is_restarted(chat: ProcessLLMEngine):
+    messages = [ChatMessage(role="user", content="hi")]
+    old_pid = chat.pid
+    os.kill(old_pid, signal.SIGKILL)
+    with pytest.raises(EngineWorkerCrashed):
+        for _ in range(3):  # a free channel may not have noticed yet
+            chat.generate_chat(messages, GenerationParams())
+            time.sleep(0.05)
+
+    deadline = time.monotonic() + 30
+    while chat.restarts == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert chat.restarts == 1 and chat.pid != old_pid
+    assert chat.generate_chat(messages, GenerationParams())
+
+
+def test_app_serves_models_from_worker_processes():
+    settings = Settings(echo_mode=True, audio_backend="tone", engine_processes=True, model_load="lazy")
+    with TestClient(create_app(settings)) as client:
+        r = client.post(
+            "/v1/chat/completions",
+            json={"model": settings.chat_model_id, "messages": [{"role": "user", "content": "ping"}]},
+        )
+        assert r.status_code == 200, r.text
+        assert "ping" in r.json()["choices"][0]["message"]["content"]
+
+        r = client.post(
+            "/v1/audio/speech",
+            json={"model": settings.audio_model_id, "input": "hi", "format": "pcm"},
+        )
+        assert r.status_code == 200, r.text
+        assert len(r.content) == 2 * len("hi") * ToneTTSEngine(model_id="tone").frames_per_char
+
+        registry = client.app.state.registry
+        assert isinstance(registry.chat_models[settings.chat_model_id], ProcessLLMEngine)
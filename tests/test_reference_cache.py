@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import base64
+import os
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.reference_cache import ReferenceAudioCache, reference_key
+
+
+def test_lru_eviction_by_bytes():
+    cache = ReferenceAudioCache(max_bytes=100)
+    cache.put("a", "A", 40)
+    cache.put("b", "B", 40)
+    assert cache.get("a") == "A"  # a is now most recent
+    cache.put("c", "C", 40)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    cache.put("huge", "H", 101)
+    assert cache.get("huge") is None
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["bytes"] == 80
+    assert stats["evictions"] == 1
+
+
+def test_get_or_load_decodes_once():
+    cache = ReferenceAudioCache(max_bytes=1 << 20)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [0.0] * 4, 16
+
+    key = reference_key(b"RIFF-audio", ref_text="hello")
+    assert cache.get_or_load(key, load) == cache.get_or_load(key, load)
+    assert len(loads) == 1
+    assert reference_key(b"RIFF-audio", ref_text="other") != key
+
+
+def test_file_key_changes_when_file_changes(tmp_path):
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"one")
+    k1 = reference_key(ref)
+    assert reference_key(str(ref)) == k1
+    ref.write_bytes(b"three")
+    os.utime(ref, ns=(1, 1))
+    assert reference_key(ref) != k1
+
+
+def test_base64_ref_audio_reaches_engine_as_bytes():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio"))
+    called = {}
+
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            called.update(kwargs)
+            return b"RIFF....WAVE"
+
+    app.state.registry.tts_models["local-audio"] = DummyEngine()  # type: ignore[assignment]
+    client = TestClient(app)
+
+    payload = base64.b64encode(b"RIFF-reference").decode()
+    r = client.post(
+        "/v1/audio/speech",
+        json={"model": "local-audio", "input": "hi", "ref_audio": f"data:audio/wav;base64,{payload}"},
+    )
+    assert r.status_code == 200
+    assert called["ref_audio"] == b"RIFF-reference"
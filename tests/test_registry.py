@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.admission import AdmissionController
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.echo_engine import EchoEngine
+from app.registry import ModelDescriptor, ModelLoadError, ModelRegistry
+
+
+class SizedEngine(EchoEngine):
+    def __init__(self, model_id: str, nbytes: int) -> None:
+        super().__init__(model_id=model_id)
+        self.nbytes = nbytes
+        self.closed = False
+
+    def memory_bytes(self) -> int:
+        return self.nbytes
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def _registry(budget: int = 0) -> ModelRegistry:
+    return ModelRegistry(chat_models={}, tts_models={}, memory_budget_bytes=budget)
+
+
+def test_models_load_on_first_use_and_concurrent_callers_share_one_load():
+    calls = []
+
+    def factory() -> SizedEngine:
+        calls.append(1)
+        time.sleep(0.2)
+        return SizedEngine("m", 10)
+
+    registry = _registry()
+    registry.register(ModelDescriptor("m", "chat", factory))
+    assert registry.list_model_ids() == ["m"]
+    assert not registry.is_loaded("m")
+
+    with ThreadPoolExecutor(4) as ex:
+        engines = list(ex.map(lambda _: registry.get_chat("m"), range(4)))
+
+    assert len(calls) == 1
+    assert all(e is engines[0] for e in engines)
+    assert registry.is_loaded("m") and registry.memory_bytes == 10
+    with pytest.raises(KeyError):
+        registry.get_tts("m")
+    with pytest.raises(KeyError):
+        registry.get_chat("nope")
+
+
+def test_least_recently_used_idle_model_is_evicted_over_budget():
+    registry = _registry(budget=25)
+    for name in ("a", "b", "c"):
+        registry.register(ModelDescriptor(name, "chat", lambda name=name: SizedEngine(name, 10)))
+        registry.admission[name] = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1.0)
+
+    a = registry.get_chat("a")
+    b = registry.get_chat("b")
+    registry.get_chat("a")  # "b" is now the least recently used
+    registry.get_chat("c")
+    assert b.closed and not a.closed
+    assert sorted(registry.chat_models) == ["a", "c"]
+
+    # A model serving a request is never unloaded under it.
+    registry.admission["a"].in_flight = 1
+    registry.get_chat("b")
+    assert sorted(registry.chat_models) == ["a", "b"]
+    assert registry.stats()["evictions"] == 2
+
+
+def test_failed_load_raises_model_load_error():
+    def broken() -> SizedEngine:
+        raise OSError("no such file")
+
+    registry = _registry()
+    registry.register(ModelDescriptor("m", "tts", broken))
+    with pytest.raises(ModelLoadError, match="no such file"):
+        registry.get_tts("m")
+    assert not registry.is_loaded("m")
+
+
+def test_states_and_stats_can_be_read_while_models_load_and_unload():
+    registry = _registry(budget=25)
+    for i in range(8):
+        registry.register(ModelDescriptor(f"m{i}", "chat", lambda i=i: SizedEngine(f"m{i}", 10)))
+    stop = threading.Event()
+
+    def churn() -> None:
+        while not stop.is_set():
+            for i in range(8):
+                registry.get_chat(f"m{i}")
+
+    worker = threading.Thread(target=churn)
+    worker.start()
+    try:
+        deadline = time.monotonic() + 0.5
+        while time.monotonic() < deadline:
+            assert len(registry.load_states()) == 8
+            assert len(registry.stats()["models"]) == 8
+            registry.list_model_ids()
+    finally:
+        stop.set()
+        worker.join()
+    assert registry.evictions > 0
+
+
+def test_api_loads_the_chat_model_on_first_request():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", model_load="lazy"))
+    registry = app.state.registry
+    assert not registry.is_loaded("local-chat")
+
+    client = TestClient(app)
+    assert "local-chat" in [m["id"] for m in client.get("/v1/models").json()["data"]]
+    r = client.post("/v1/chat/completions", json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]})
+    assert r.status_code == 200
+    assert registry.is_loaded("local-chat")
+    assert client.get("/").json()["registry"]["models"]["local-chat"]["loaded"] is True
+
+    r = client.post("/v1/chat/completions", json={"model": "missing", "messages": [{"role": "user", "content": "hi"}]})
+    assert r.status_code == 404
+
+
+def test_api_holds_a_slot_while_fetching_the_engine():
+    # Eviction skips models with requests in flight, so the slot must be held
+    # from before the engine is fetched until the response is done.
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", model_load="lazy"))
+    registry = app.state.registry
+    in_flight_at_get: list[int] = []
+    get_chat = registry.get_chat
+
+    def spy(model_id: str):  # noqa: ANN202
+        in_flight_at_get.append(registry.admission[model_id].in_flight)
+        return get_chat(model_id)
+
+    registry.get_chat = spy
+    client = TestClient(app)
+    r = client.post("/v1/chat/completions", json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]})
+    assert r.status_code == 200
+    assert in_flight_at_get == [1]
+    assert registry.admission["local-chat"].in_flight == 0
+
+
+def test_eager_mode_loads_at_startup():
+    app = create_app(Settings(echo_mode=True, model_load="eager"))
+    assert app.state.registry.is_loaded("local-chat")
+    with pytest.raises(RuntimeError, match="MODEL_LOAD"):
+        create_app(Settings(echo_mode=True, model_load="sometimes"))
+
+
+def test_a_bad_model_path_fails_startup_by_default(tmp_path):
+    with pytest.raises(ModelLoadError, match="not found"):
+        create_app(Settings(echo_mode=True, audio_backend="piper", audio_model_path=str(tmp_path / "missing.onnx")))
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.app_factory import _onnx_threads
+from app.config import Settings
+from app.engine.replica_pool import ReplicaPoolTTSEngine
+from app.engine.tts_base import TTSEngine, TTSParams
+from app.utils.audio_buffer import AudioBuffer
+
+
+class SlowEngine(TTSEngine):
+    def __init__(self, name: str, delay: float = 0.0) -> None:
+        self.model_id = "tts"
+        self.name = name
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def synthesize_audio(self, text, params, **kwargs):  # noqa: ANN001
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return AudioBuffer.from_samples([1], 8000)
+
+    def stream_synthesize(self, text, params, **kwargs):  # noqa: ANN001
+        yield AudioBuffer.from_samples([1], 8000)
+        yield AudioBuffer.from_samples([2], 8000)
+
+
+def test_concurrent_requests_spread_over_replicas():
+    replicas = [SlowEngine(str(i), delay=0.2) for i in range(3)]
+    pool = ReplicaPoolTTSEngine(replicas)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(3) as ex:
+        list(ex.map(lambda _: pool.synthesize_audio("x", TTSParams()), range(3)))
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.45
+    assert [r.calls for r in replicas] == [1, 1, 1]
+    assert all(r.max_active == 1 for r in replicas)
+    assert pool.in_flight == [0, 0, 0]
+
+
+def test_idle_requests_rotate_and_streams_hold_their_replica():
+    replicas = [SlowEngine("a"), SlowEngine("b")]
+    pool = ReplicaPoolTTSEngine(replicas)
+    for _ in range(4):
+        pool.synthesize_audio("x", TTSParams())
+    assert [r.calls for r in replicas] == [2, 2]
+
+    stream = pool.stream_synthesize("x", TTSParams())
+    next(stream)
+    assert sorted(pool.in_flight) == [0, 1]
+    busy = pool.in_flight.index(1)
+    pool.synthesize_audio("y", TTSParams())
+    assert replicas[1 - busy].calls == 3
+    stream.close()
+    assert pool.in_flight == [0, 0]
+
+    stats = pool.stats()["replicas"]
+    assert [s["requests"] for s in stats] == [3, 3]
+
+
+def test_onnx_threads_cycle_over_replicas():
+    settings = Settings(audio_onnx_intra_op_threads=(8, 4), audio_onnx_inter_op_threads=(1,))
+    assert [_onnx_threads(settings, i) for i in range(3)] == [
+        {"intra_op_threads": 8, "inter_op_threads": 1},
+        {"intra_op_threads": 4, "inter_op_threads": 1},
+        {"intra_op_threads": 8, "inter_op_threads": 1},
+    ]
+    assert _onnx_threads(Settings(), 5) == {"intra_op_threads": 0, "inter_op_threads": 0}
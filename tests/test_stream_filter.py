@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import random
+
+from app.engine.base import GenerationParams
+from app.engine.mlx_engine import MLXEngine
+from app.engine.stream_filter import ChatStreamFilter
+
+
+def _chunks(text: str, rng: random.Random) -> list[str]:
+    out, i = [], 0
+    while i < len(text):
+        k = rng.randint(1, 5)
+        out.append(text[i : i + k])
+        i += k
+    return out
+
+
+def _run(prompt: str, chunks: list[str]) -> str:
+    filt = ChatStreamFilter(prompt)
+    return "".join(filt.feed(c) for c in chunks) + filt.flush()
+
+
+def test_stream_filter_matches_post_process():
+    pieces = ["\n", "u", "s", "e", "r", ":", "U", "S", "y", "t", "m", " ", "hi", "\nuser:", "\nSys", "\nUse"]
+    rng = random.Random(0)
+    for _ in range(5000):
+        prompt = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 4)))
+        generated = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 12)))
+        if rng.random() < 0.3:
+            generated = prompt[: rng.randint(0, len(prompt))] + generated
+        assert _run(prompt, _chunks(generated, rng)) == MLXEngine._post_process(prompt, generated)
+
+
+def test_stream_filter_holds_back_only_possible_markers():
+    filt = ChatStreamFilter("PROMPT")
+    assert filt.feed("Hello") == "Hello"
+    assert filt.feed(" there\nus") == " there"
+    assert filt.feed("eful") == "\nuseful"
+    assert filt.feed("\nuser: again") == ""
+    assert filt.done
+    assert filt.flush() == ""
+
+
+def test_mlx_stream_generate_chat_uses_filter_and_stops_early():
+    engine = MLXEngine.__new__(MLXEngine)
+    consumed = []
+
+    def fake_stream_generate(prompt, params):  # noqa: ANN001
+        for piece in ["\nSure", ", here", " it is.", "\nUs", "er: more", " never", " reached"]:
+            consumed.append(piece)
+            yield piece
+
+    engine._render_chat = lambda messages: "PROMPT"  # type: ignore[method-assign]
+    engine.stream_generate = fake_stream_generate  # type: ignore[method-assign]
+
+    out = "".join(engine.stream_generate_chat([], GenerationParams()))
+    assert out == "Sure, here it is."
+    assert " reached" not in consumed
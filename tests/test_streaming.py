@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.api.v1.streaming import coalesce
+
+
+async def _source(items: list[tuple[float, str]]):
+    for delay, piece in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield piece
+
+
+def _collect(items: list[tuple[float, str]], **kwargs) -> list[str]:
+    async def run():
+        return [p async for p in coalesce(_source(items), **kwargs)]
+
+    return asyncio.run(run())
+
+
+def test_first_piece_is_not_delayed_and_rest_is_merged():
+    items = [(0, "a")] + [(0, "b")] * 10
+    assert _collect(items, max_bytes=1024, max_delay=0.05) == ["a", "b" * 10]
+
+
+def test_flushes_on_byte_threshold():
+    items = [(0, "x")] + [(0, "yy")] * 6
+    assert _collect(items, max_bytes=4, max_delay=10.0) == ["x", "yyyy", "yyyy", "yyyy"]
+
+
+def test_flushes_when_latency_budget_is_spent():
+    items = [(0, "a"), (0, "b"), (0, "c"), (0.2, "d")]
+    assert _collect(items, max_bytes=1024, max_delay=0.02) == ["a", "bc", "d"]
+
+
+def test_disabled_passes_pieces_through():
+    items = [(0, "a"), (0, "b"), (0, "c")]
+    assert _collect(items, max_bytes=1024, max_delay=0) == ["a", "b", "c"]
+
+
+def test_buffered_text_is_flushed_before_errors():
+    async def failing():
+        yield "a"
+        yield "b"
+        raise RuntimeError("boom")
+
+    async def run():
+        got = []
+        with pytest.raises(RuntimeError):
+            async for p in coalesce(failing(), max_bytes=1024, max_delay=1.0):
+                got.append(p)
+        return got
+
+    assert asyncio.run(run()) == ["a", "b"]
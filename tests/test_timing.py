@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import time
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.echo_engine import EchoEngine
+from app.utils.timing import collect_timings, current_timings, span, timed_iter
+
+
+def test_span_is_noop_without_collector():
+    assert current_timings() is None
+    with span("x"):
+        pass
+    assert current_timings() is None
+
+
+def test_spans_accumulate_and_timed_iter_splits_first_item():
+    def slow():
+        time.sleep(0.02)
+        yield 1
+        yield 2
+
+    with collect_timings() as timings:
+        with span("a"):
+            pass
+        with span("a"):
+            pass
+        assert list(timed_iter(slow(), "prefill", "decode")) == [1, 2]
+
+    assert set(timings.spans) == {"a", "prefill", "decode"}
+    assert timings.spans["prefill"] >= 0.015
+    assert timings.spans["decode"] < timings.spans["prefill"]
+    assert "prefill;dur=" in timings.server_timing(total=0.1)
+    assert timings.server_timing(total=0.1).endswith("total;dur=100.0")
+
+
+def test_server_timing_header_includes_engine_thread_spans():
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", profile_history=100))
+
+    class TimedEngine(EchoEngine):
+        def generate_chat(self, messages, params):  # noqa: ANN001
+            # Runs on an executor thread; the request's timings must follow it there.
+            with span("render"):
+                pass
+            return super().generate_chat(messages, params)
+
+    app.state.registry.chat_models["local-chat"] = TimedEngine(model_id="local-chat")
+    client = TestClient(app)
+
+    r = client.post("/v1/chat/completions", json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]})
+    assert r.status_code == 200
+    header = r.headers["server-timing"]
+    for name in ("admission", "render", "serialize", "total"):
+        assert f"{name};dur=" in header
+
+    prof = client.get("/debug/profile").json()
+    entry = prof["requests"][0]
+    assert entry["path"] == "/v1/chat/completions"
+    assert entry["status"] == 200
+    assert "render" in entry["spans_ms"]
+
+
+def test_debug_profile_sampling_and_disabled():
+    settings = Settings(echo_mode=True, chat_model_id="local-chat", profile_history=100)
+    client = TestClient(create_app(settings))
+    assert client.get("/debug/profile", params={"sample_seconds": 0.05}).status_code == 403
+
+    client = TestClient(create_app(settings.model_copy(update={"profile_sample_max_seconds": 1.0})))
+    r = client.get("/debug/profile", params={"sample_seconds": 0.05})
+    assert r.status_code == 200
+    assert r.json()["profile"]["samples"] > 0
+    assert client.get("/debug/profile", params={"sample_seconds": 2}).status_code == 400
+
+    off = TestClient(
+        create_app(Settings(echo_mode=True, chat_model_id="local-chat", server_timing=False, profile_history=0))
+    )
+    assert off.get("/debug/profile").status_code == 404
+    r = off.post("/v1/chat/completions", json={"model": "local-chat", "messages": [{"role": "user", "content": "hi"}]})
+    assert "server-timing" not in r.headers
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import os
+
+from fastapi.testclient import TestClient
+
+from app.api.v1.ranges import parse_range
+from app.app_factory import create_app
+from app.config import Settings
+from app.registry import ModelDescriptor
+from app.tts_cache import TTSResponseCache, speech_cache_key
+
+
+def _key(text: str, **extra) -> str:  # noqa: ANN003
+    return speech_cache_key("m", text, voice="default", speed=1.0, speaker_id=None, format="wav", extra=extra)
+
+
+def test_cache_key_covers_request_and_reference_audio(tmp_path):
+    assert _key("hi") == _key("hi")
+    assert _key("hi") != _key("hello")
+    assert _key("hi", instruct_text="calm") != _key("hi")
+    assert _key("hi", ref_audio=b"aaa") == _key("hi", ref_audio=b"aaa")
+    assert _key("hi", ref_audio=b"aaa") != _key("hi", ref_audio=b"bbb")
+
+    ref = tmp_path / "ref.wav"
+    ref.write_bytes(b"one")
+    before = _key("hi", ref_audio=str(ref))
+    ref.write_bytes(b"three")
+    os.utime(ref, ns=(1, 1))
+    assert _key("hi", ref_audio=str(ref)) != before
+
+
+def test_cache_key_covers_backend_and_model_weights(tmp_path):
+    weights = tmp_path / "voice.onnx"
+    weights.write_bytes(b"v1")
+
+    def key(backend: str) -> str:
+        source = {"backend": backend, "path": str(weights)}
+        return speech_cache_key(
+            "m", "hi", voice="default", speed=1.0, speaker_id=None, format="wav", extra={}, source=source
+        )
+
+    before = key("piper")
+    assert key("piper") == before
+    assert key("mlx-audio-plus") != before
+    weights.write_bytes(b"v2 retrained")
+    assert key("piper") != before
+
+
+def test_lru_eviction_and_persistence(tmp_path):
+    cache = TTSResponseCache(tmp_path, max_bytes=10)
+    cache.put("aa1", b"1234")
+    cache.put("bb2", b"5678")
+    assert bytes(cache.get("aa1")) == b"1234"
+    cache.put("cc3", b"9012")  # evicts bb2, the least recently used
+    assert cache.get("bb2") is None
+    assert cache.stats()["evictions"] == 1
+    assert not (tmp_path / "bb" / "bb2").exists()
+
+    # A write interrupted by a crash leaves a temp file; reopening removes it.
+    stale = tmp_path / "cc" / ".tmp-abc"
+    stale.write_bytes(b"partial")
+
+    reopened = TTSResponseCache(tmp_path, max_bytes=10)
+    assert len(reopened) == 2
+    assert bytes(reopened.get("cc3")) == b"9012"
+    assert not stale.exists()
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=100-", 100) is False
+    assert parse_range("bytes=0-1,5-6", 100) is None
+
+
+def test_speech_responses_are_cached_with_etag_and_ranges(tmp_path):
+    calls: list[str] = []
+
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            calls.append(text)
+            return b"RIFF" + bytes(range(60)) + b"WAVE"
+
+    settings = Settings(
+        echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio", audio_cache_dir=str(tmp_path)
+    )
+    app = create_app(settings)
+    app.state.registry.tts_models["local-audio"] = DummyEngine()
+    client = TestClient(app)
+    body = {"model": "local-audio", "input": "Press one for sales."}
+
+    first = client.post("/v1/audio/speech", json=body)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.headers["accept-ranges"] == "bytes"
+
+    second = client.post("/v1/audio/speech", json=body)
+    assert second.content == first.content
+    assert second.headers["etag"] == etag
+    assert calls == ["Press one for sales."]
+
+    assert client.post("/v1/audio/speech", json=body, headers={"If-None-Match": etag}).status_code == 304
+
+    part = client.post("/v1/audio/speech", json=body, headers={"Range": "bytes=4-9"})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 4-9/{len(first.content)}"
+    assert part.content == first.content[4:10]
+
+    assert client.post("/v1/audio/speech", json=body, headers={"Range": "bytes=999-"}).status_code == 416
+
+    client.post("/v1/audio/speech", json={**body, "voice": "other"})
+    assert len(calls) == 2
+
+    stats = client.get("/").json()["tts_cache"]
+    assert stats["hits"] == 4
+    assert stats["misses"] == 2
+    assert stats["bytes_saved"] == 4 * len(first.content)
+    assert 'macoslocalapi_tts_cache_requests_total{model="local-audio",result="hit"} 4' in client.get("/metrics").text
+
+
+def test_cache_hits_do_not_load_the_model(tmp_path):
+    loads: list[int] = []
+
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            return b"RIFF" + text.encode() + b"WAVE"
+
+    def factory() -> DummyEngine:
+        loads.append(1)
+        return DummyEngine()
+
+    settings = Settings(
+        echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio", audio_cache_dir=str(tmp_path)
+    )
+    app = create_app(settings)
+    app.state.registry.register(ModelDescriptor("local-audio", "tts", factory))
+    client = TestClient(app)
+    body = {"model": "local-audio", "input": "Press one for sales."}
+
+    first = client.post("/v1/audio/speech", json=body)
+    assert first.status_code == 200 and loads == [1]
+    app.state.registry.unload("local-audio")
+
+    again = client.post("/v1/audio/speech", json=body)
+    assert again.content == first.content
+    assert loads == [1] and not app.state.registry.is_loaded("local-audio")
+
+    assert client.post("/v1/audio/speech", json={**body, "model": "nope"}).status_code == 404
+
+
+def test_cache_hits_close_their_mmap(tmp_path):
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            return b"RIFF" + text.encode() + b"WAVE"
+
+    settings = Settings(
+        echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio", audio_cache_dir=str(tmp_path)
+    )
+    app = create_app(settings)
+    app.state.registry.tts_models["local-audio"] = DummyEngine()
+    cache = app.state.tts_cache
+    served = []
+    get = cache.get
+    cache.get = lambda key: served.append(get(key)) or served[-1]
+    client = TestClient(app)
+    body = {"model": "local-audio", "input": "Press one for sales."}
+
+    first = client.post("/v1/audio/speech", json=body)
+    etag = first.headers["etag"]
+    assert client.post("/v1/audio/speech", json=body).content == first.content
+    assert client.post("/v1/audio/speech", json=body, headers={"If-None-Match": etag}).status_code == 304
+    assert client.post("/v1/audio/speech", json=body, headers={"Range": "bytes=999-"}).status_code == 416
+    hits = [m for m in served if m is not None]
+    assert len(hits) == 3 and all(m.closed for m in hits)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import io
+import struct
+import wave
+
+from fastapi.testclient import TestClient
+
+from app.app_factory import create_app
+from app.config import Settings
+from app.engine.tts_base import TTSEngine
+from app.utils.audio_buffer import AudioBuffer
+from app.utils.audio_wav import wav_stream_header, write_wav_pcm16
+from app.utils.text_segment import split_sentences
+
+
+def test_split_sentences_cjk_and_latin():
+    assert split_sentences("你好。今天天气怎么样？我很好！」谢谢……好的") == [
+        "你好。",
+        "今天天气怎么样？",
+        "我很好！」",
+        "谢谢……",
+        "好的",
+    ]
+    assert split_sentences('Hello world. Pi is 3.14 today!\nNew "line?" ok') == [
+        "Hello world.",
+        "Pi is 3.14 today!",
+        'New "line?"',
+        "ok",
+    ]
+    assert split_sentences("  \n ") == []
+
+
+def test_split_sentences_wraps_long_sentences_at_clauses():
+    text = "一二三，四五六，七八九，" * 4 + "十。"
+    parts = split_sentences(text, max_chars=10)
+    assert all(len(p) <= 10 for p in parts)
+    assert "".join(parts) == text
+
+
+def test_streaming_wav_header_is_readable():
+    pcm = struct.pack("<4h", 1, -1, 2, -2)
+    with wave.open(io.BytesIO(wav_stream_header(22050) + pcm), "rb") as wf:
+        assert wf.getframerate() == 22050
+        assert wf.getnchannels() == 1
+        assert wf.getsampwidth() == 2
+        assert wf.readframes(10) == pcm
+
+
+def _sentence_tone(text: str) -> bytes:
+    # One sample per character, value = sentence length, so order is checkable.
+    return struct.pack(f"<{len(text)}h", *([len(text)] * len(text)))
+
+
+def _app(engine) -> TestClient:  # noqa: ANN001
+    app = create_app(Settings(echo_mode=True, chat_model_id="local-chat", audio_model_id="local-audio"))
+    app.state.registry.tts_models["local-audio"] = engine
+    return TestClient(app)
+
+
+def test_stream_wav_synthesizes_sentence_by_sentence():
+    calls: list[str] = []
+
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            calls.append(text)
+            return write_wav_pcm16(16000, _sentence_tone(text))
+
+    client = _app(DummyEngine())
+    r = client.post(
+        "/v1/audio/speech",
+        json={"model": "local-audio", "input": "Hi. Longer one! 第三句。", "stream": True},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "audio/wav"
+    assert r.headers["x-audio-sample-rate"] == "16000"
+    assert calls == ["Hi.", "Longer one!", "第三句。"]
+    assert r.content == wav_stream_header(16000) + b"".join(_sentence_tone(t) for t in calls)
+
+
+def test_stream_pcm_uses_engine_native_chunks():
+    class NativeEngine(TTSEngine):
+        model_id = "local-audio"
+
+        def stream_synthesize(self, text, params, **kwargs):  # noqa: ANN001
+            yield AudioBuffer.from_samples([1], 24000)
+            yield AudioBuffer.from_samples([2, 3], 24000)
+
+    client = _app(NativeEngine())
+    r = client.post(
+        "/v1/audio/speech", json={"model": "local-audio", "input": "x", "format": "pcm", "stream": True}
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "audio/pcm"
+    assert r.content == b"\x01\x00\x02\x00\x03\x00"
+
+
+def test_stream_of_empty_chunks_ends_cleanly(capsys):
+    class SilentEngine(TTSEngine):
+        model_id = "local-audio"
+
+        def stream_synthesize(self, text, params, **kwargs):  # noqa: ANN001
+            yield AudioBuffer.from_samples([], 24000)
+            yield AudioBuffer.from_samples([], 24000)
+
+    client = _app(SilentEngine())
+    r = client.post(
+        "/v1/audio/speech", json={"model": "local-audio", "input": "x", "format": "pcm", "stream": True}
+    )
+    assert r.status_code == 200
+    assert r.content == b""
+    # Completed normally: no zero-duration real-time factor, no traceback.
+    assert "Traceback" not in capsys.readouterr().err
+    metrics = client.app.state.metrics
+    assert metrics.tts_latency.count("local-audio") == 1
+    assert metrics.tts_rtf.count("local-audio") == 0
+
+
+def test_stream_errors_before_first_chunk_keep_status_codes():
+    class DummyEngine:
+        model_id = "local-audio"
+
+        def synthesize(self, text, params, *, format="wav", **kwargs):  # noqa: ANN001
+            raise ValueError("ref_audio is required for this model")
+
+    client = _app(DummyEngine())
+    body = {"model": "local-audio", "input": "Hi.", "stream": True}
+    r = client.post("/v1/audio/speech", json=body)
+    assert r.status_code == 400
+    assert "ref_audio" in r.text
+
+    r = client.post("/v1/audio/speech", json={**body, "format": "mp3"})
+    assert r.status_code == 400
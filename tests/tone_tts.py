@@ -0,0 +1,65 @@
+"""Stand-in command-line synthesizer for `CommandTTSEngine` tests.
+
+Renders one int16 sample per character, valued by the text length, so output
+is checkable. `--persistent` speaks the JSON-lines protocol; otherwise it reads
+the whole of stdin (or `--text`) and writes one clip to stdout and exits.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import struct
+import sys
+import wave
+
+SAMPLE_RATE = 8000
+
+
+def render(text: str) -> bytes:
+    return struct.pack(f"<{len(text)}h", *([len(text)] * len(text)))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--persistent", action="store_true")
+    ap.add_argument("--format", choices=["wav", "pcm"], default="wav")
+    ap.add_argument("--text")
+    args = ap.parse_args()
+    out = sys.stdout.buffer
+
+    if args.persistent:
+        for line in sys.stdin:
+            request = json.loads(line)
+            text = request["text"]
+            if text == "fail":
+                out.write(b"ERR cannot say that\n")
+            elif text == "crash":
+                os._exit(3)
+            else:
+                pcm = render(f"{text}@{os.getpid()}" if request.get("voice") == "pid" else text)
+                out.write(f"OK {SAMPLE_RATE} {len(pcm)}\n".encode() + pcm)
+            out.flush()
+        return
+
+    text = args.text if args.text is not None else sys.stdin.read()
+    if text == "fail":
+        sys.stderr.write("cannot say that\n")
+        sys.exit(2)
+    pcm = render(text)
+    if args.format == "pcm":
+        out.write(pcm)
+        return
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm)
+    out.write(buf.getvalue())
+
+
+if __name__ == "__main__":
+    main()